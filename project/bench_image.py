@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк образа postgres-1c: сборка, размер и холодный старт.
+
+Для каждого dockerfile измеряются:
+  build_cold    - сборка без кэша (docker build --no-cache);
+  build_warm    - повторная сборка без изменений (должна браться из кэша);
+  image_size    - размер образа и число слоёв;
+  first_boot    - от docker run с пустым томом до первого успешного
+                  запроса (initdb + init-scripts + запуск);
+  restart       - docker stop/start с уже инициализированным томом
+                  до первого успешного запроса.
+
+Готовность проверяется запросом SELECT 1 через psql по TCP внутри
+контейнера (docker exec), поэтому в замер входит и накладной расход
+docker exec (обычно 50-100 мс). Результат сохраняется в JSON;
+--compare показывает изменение относительно предыдущего прогона.
+
+Примеры:
+    python3 bench_image.py
+    git show HEAD~1:project/dockerfile > /tmp/dockerfile.old
+    python3 bench_image.py --dockerfile /tmp/dockerfile.old --dockerfile dockerfile
+    python3 bench_image.py --skip-build --repeat 5 --output new.json --compare old.json
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from docker_common import BenchError, docker
+
+# ==============================
+# Настройки
+# ==============================
+SCRIPT_DIR = Path(__file__).resolve().parent
+DEFAULT_DOCKERFILE = SCRIPT_DIR / 'dockerfile'
+DEFAULT_TAG = 'postgres-1c-bench'
+DEFAULT_OUTPUT = 'bench_image.json'
+PASSWORD = 'benchpassword'
+READY_TIMEOUT = 600
+POLL_INTERVAL = 0.1
+
+METRICS = ('build_cold', 'build_warm', 'first_boot', 'restart')
+
+
+
+# ==============================
+# Сборка
+# ==============================
+def build(dockerfile, context, tag, no_cache):
+    """Время сборки образа, с"""
+    args = ['build', '-f', str(dockerfile), '-t', tag]
+    if no_cache:
+        args.append('--no-cache')
+    started = time.perf_counter()
+    docker(*args, str(context))
+    return time.perf_counter() - started
+
+
+def image_info(tag):
+    size = int(docker('image', 'inspect', '-f', '{{.Size}}', tag).stdout.strip())
+    layers = len(docker('history', '-q', tag).stdout.split())
+    return {'image_bytes': size, 'image_layers': layers}
+
+
+# ==============================
+# Запуск
+# ==============================
+def wait_ready(container, started, timeout=READY_TIMEOUT):
+    """Ждёт первого успешного запроса и возвращает время от started, с"""
+    deadline = started + timeout
+    while time.perf_counter() < deadline:
+        result = docker('exec', '-e', f'PGPASSWORD={PASSWORD}', container,
+                        'psql', '-X', '-h', '127.0.0.1', '-U', 'postgres', '-d', 'postgres',
+                        '-Atc', 'SELECT 1', check=False, timeout=30)
+        if result.returncode == 0 and result.stdout.strip() == '1':
+            return time.perf_counter() - started
+        state = docker('inspect', '-f', '{{.State.Running}}', container, check=False).stdout.strip()
+        if state == 'false':
+            logs = docker('logs', '--tail', '20', container, check=False)
+            raise BenchError(f"контейнер остановился:\n{logs.stdout}{logs.stderr}")
+        time.sleep(POLL_INTERVAL)
+    raise BenchError(f"сервер не ответил за {timeout} с")
+
+
+def measure_start(tag, name):
+    """Холодный старт с пустым томом и перезапуск с инициализированным"""
+    volume = f"{name}-data"
+    docker('rm', '-f', name, check=False)
+    docker('volume', 'rm', '-f', volume, check=False)
+    try:
+        started = time.perf_counter()
+        docker('run', '-d', '--name', name,
+               '-e', f'POSTGRES_PASSWORD={PASSWORD}',
+               '-v', f'{volume}:/var/lib/postgresql/data', tag)
+        first_boot = wait_ready(name, started)
+
+        docker('stop', '-t', '60', name)
+        started = time.perf_counter()
+        docker('start', name)
+        restart = wait_ready(name, started)
+        return {'first_boot': first_boot, 'restart': restart}
+    finally:
+        docker('rm', '-f', name, check=False)
+        docker('volume', 'rm', '-f', volume, check=False)
+
+
+# ==============================
+# Отчёт
+# ==============================
+def median(values):
+    values = [v for v in values if v is not None]
+    return round(statistics.median(values), 3) if values else None
+
+
+def print_table(results, baseline=None):
+    previous = {}
+    if baseline:
+        previous = {r['dockerfile']: r for r in baseline['results']}
+
+    for r in results:
+        print(f"\n🐳 {r['dockerfile']}")
+        if r.get('image_bytes') is not None:
+            print(f"   {'размер образа':<22} {r['image_bytes'] / 1024 / 1024:>10.1f} МБ, "
+                  f"слоёв: {r['image_layers']}")
+        old = previous.get(r['dockerfile'], {})
+        for metric in METRICS:
+            value = r.get(metric)
+            line = f"   {metric:<22} {'-' if value is None else f'{value:.3f}':>10} с"
+            if value and old.get(metric):
+                ratio = value / old[metric]
+                mark = '🟢' if ratio < 0.95 else ('🔴' if ratio > 1.05 else '  ')
+                line += f"  {mark} x{ratio:.2f}"
+            print(line)
+        for error in r['errors']:
+            print(f"   ❌ {error}")
+
+
+# ==============================
+# Основной скрипт
+# ==============================
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк сборки и запуска образа postgres-1c")
+    parser.add_argument('--dockerfile', action='append', type=Path,
+                        help="dockerfile для сравнения (можно несколько; по умолчанию project/dockerfile)")
+    parser.add_argument('--context', type=Path, default=SCRIPT_DIR, help="контекст сборки")
+    parser.add_argument('--tag', default=DEFAULT_TAG, help="префикс тега собираемых образов")
+    parser.add_argument('--skip-build', action='store_true',
+                        help="не собирать, использовать уже собранные образы")
+    parser.add_argument('--repeat', type=int, default=3, help="повторов замера запуска (берётся медиана)")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help="файл результатов JSON")
+    parser.add_argument('--compare', metavar='FILE', help="сравнить с предыдущим JSON")
+    args = parser.parse_args()
+
+    dockerfiles = [p.resolve() for p in (args.dockerfile or [DEFAULT_DOCKERFILE])]
+    try:
+        docker_version = docker('version', '-f', '{{.Server.Version}}').stdout.strip()
+    except BenchError as e:
+        print(f"❌ Docker недоступен: {e}")
+        return 1
+
+    results = []
+    for i, dockerfile in enumerate(dockerfiles):
+        tag = args.tag if len(dockerfiles) == 1 else f"{args.tag}-{i + 1}"
+        result = {'dockerfile': str(dockerfile), 'tag': tag, 'errors': []}
+        results.append(result)
+        try:
+            if not args.skip_build:
+                print(f"▶ {dockerfile.name}: сборка без кэша...", flush=True)
+                result['build_cold'] = round(build(dockerfile, args.context, tag, no_cache=True), 3)
+                print(f"▶ {dockerfile.name}: повторная сборка...", flush=True)
+                result['build_warm'] = round(build(dockerfile, args.context, tag, no_cache=False), 3)
+            result.update(image_info(tag))
+        except BenchError as e:
+            result['errors'].append(str(e))
+            continue
+
+        runs = []
+        for n in range(args.repeat):
+            print(f"▶ {dockerfile.name}: запуск {n + 1}/{args.repeat}...", flush=True)
+            try:
+                runs.append(measure_start(tag, f"{tag}-run"))
+            except BenchError as e:
+                result['errors'].append(str(e))
+                break
+        result['first_boot'] = median(r['first_boot'] for r in runs)
+        result['restart'] = median(r['restart'] for r in runs)
+        result['runs'] = runs
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_table(results, baseline)
+
+    report = {
+        'generated': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'platform': platform.platform(),
+        'docker': docker_version,
+        'repeat': args.repeat,
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n📄 Результаты сохранены: {args.output}")
+    return 1 if any(r['errors'] for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
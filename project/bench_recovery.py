@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк восстановления после сбоя и перезапуска контейнера postgres-1c.
+
+Для каждой комбинации настроек из матрицы (max_wal_size x
+checkpoint_timeout x момент остановки x способ остановки) создаётся
+отдельный контейнер с чистым томом, после чего:
+  1. несколько клиентов (pgwire.py) пишут в таблицу пачками строк,
+     каждая пачка - отдельная транзакция; подтверждённые коммиты
+     запоминаются;
+  2. через --kill-after секунд нагрузки контейнер останавливается:
+     kill - SIGKILL (сбой, при запуске - восстановление по WAL),
+     stop - docker stop (быстрая остановка с контрольной точкой);
+  3. контейнер запускается снова, измеряется время до первого
+     успешного запроса и, по журналу сервера, объём и время
+     применения WAL (redo) и контрольной точки конца восстановления;
+  4. проверяется, что все подтверждённые строки на месте, и, если
+     есть расширение amcheck, - целостность индекса.
+
+Перед остановкой запоминается, сколько WAL записано с начала последней
+контрольной точки (pg_current_wal_insert_lsn - redo_lsn): это оценка
+того, что придётся применить. Скорость записи (коммитов/с, МБ WAL/с)
+показывает цену более частых контрольных точек, время готовности -
+их выигрыш.
+
+Используется образ, собранный из project/dockerfile (docker compose build).
+postgresql.conf не меняется: значения-кандидаты передаются серверу
+параметрами postgres -c (матрица и --set), а в конфиг переносятся
+только по итогам замеров.
+Рабочие контейнеры и тома бенчмарк создаёт и удаляет сам, основной
+контейнер postgres-1c не затрагивается.
+
+Примеры:
+    python3 bench_recovery.py --kill-after 60
+    python3 bench_recovery.py --max-wal-size 1GB,4GB,16GB --checkpoint-timeout 5min,15min \\
+        --mode kill --kill-after 30,120 --clients 16 --output recovery.json
+    python3 bench_recovery.py --max-wal-size 4GB --checkpoint-timeout 15min \\
+        --set min_wal_size=1GB --set checkpoint_completion_target=0.9
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import platform
+import re
+import statistics
+import sys
+import time
+
+import pgwire
+from docker_common import BenchError, docker
+
+# ==============================
+# Настройки
+# ==============================
+DEFAULT_IMAGE = 'project-postgres-1c'
+DEFAULT_OUTPUT = 'bench_recovery.json'
+CONTAINER_PREFIX = 'postgres-1c-recovery-bench'
+PASSWORD = 'benchpassword'
+READY_TIMEOUT = 3600
+POLL_INTERVAL = 0.05
+MODES = ('kill', 'stop')
+
+# Журнал в stderr на английском: его разбирает parse_recovery_log
+BENCH_SETTINGS = {
+    'logging_collector': 'off',
+    'log_destination': 'stderr',
+    'lc_messages': 'C',
+    'log_checkpoints': 'on',
+}
+
+TABLE_SQL = """
+CREATE TABLE bench_recovery (
+    client int,
+    seq bigint,
+    payload text,
+    PRIMARY KEY (client, seq)
+)
+"""
+
+INSERT_SQL = """
+INSERT INTO bench_recovery
+SELECT $1::int, g, repeat('x', $3::int)
+FROM generate_series($2::bigint, $2::bigint + $4::int - 1) g
+"""
+
+LSN_SQL = """
+SELECT pg_current_wal_insert_lsn()::text AS insert_lsn,
+       (SELECT redo_lsn::text FROM pg_control_checkpoint()) AS redo_lsn
+"""
+
+REDO_START_RE = re.compile(r'redo starts at ([0-9A-F]+/[0-9A-F]+)')
+REDO_DONE_RE = re.compile(r'redo done at ([0-9A-F]+/[0-9A-F]+).*?elapsed: ([\d.]+) s')
+CHECKPOINT_DONE_RE = re.compile(r'checkpoint complete: .*?total=([\d.]+) s')
+
+
+def lsn_to_int(lsn):
+    """'16/B374D848' -> позиция в байтах"""
+    high, low = lsn.split('/')
+    return (int(high, 16) << 32) + int(low, 16)
+
+
+def parse_recovery_log(text):
+    """Объём и время применения WAL и контрольной точки конца восстановления"""
+    result = {'replayed_bytes': 0, 'redo_seconds': 0.0, 'end_checkpoint_seconds': None}
+    start = REDO_START_RE.findall(text)
+    done = REDO_DONE_RE.findall(text)
+    if start and done:
+        result['replayed_bytes'] = lsn_to_int(done[-1][0]) - lsn_to_int(start[-1])
+        result['redo_seconds'] = float(done[-1][1])
+    # Контрольная точка после восстановления идёт до приёма подключений
+    tail = text[text.rfind('end-of-recovery'):] if 'end-of-recovery' in text else ''
+    match = CHECKPOINT_DONE_RE.search(tail)
+    if match:
+        result['end_checkpoint_seconds'] = float(match[1])
+    return result
+
+
+# ==============================
+# Контейнер
+# ==============================
+class Container:
+    """Рабочий контейнер с собственным томом"""
+
+    def __init__(self, image, name, settings):
+        self.image = image
+        self.name = name
+        self.volume = f"{name}-data"
+        self.settings = settings
+
+    def create(self):
+        self.remove()
+        command = ['postgres']
+        for key, value in self.settings.items():
+            command += ['-c', f"{key}={value}"]
+        docker('run', '-d', '--name', self.name,
+               '-e', f'POSTGRES_PASSWORD={PASSWORD}',
+               '-p', '127.0.0.1::5432',
+               '-v', f'{self.volume}:/var/lib/postgresql/data',
+               self.image, *command)
+
+    def port(self):
+        """Порт на хосте (после docker start назначается заново)"""
+        output = docker('port', self.name, '5432/tcp', check=False).stdout.split()
+        return int(output[0].rsplit(':', 1)[1]) if output else None
+
+    def remove(self):
+        docker('rm', '-f', self.name, check=False)
+        docker('volume', 'rm', '-f', self.volume, check=False)
+
+
+async def connect(port):
+    return await pgwire.connect('127.0.0.1', port, user='postgres', password=PASSWORD,
+                                database='postgres', application_name='bench_recovery', timeout=5)
+
+
+async def wait_ready(container, started, timeout=READY_TIMEOUT):
+    """Время от started до первого успешного SELECT 1, с"""
+    while time.perf_counter() - started < timeout:
+        port = await asyncio.to_thread(container.port)
+        if port:
+            try:
+                conn = await connect(port)
+                try:
+                    if await asyncio.wait_for(conn.fetchval("SELECT 1"), 5) == 1:
+                        return time.perf_counter() - started
+                finally:
+                    await conn.close()
+            except (pgwire.PgError, pgwire.ProtocolError, asyncio.TimeoutError):
+                # 57P03: the database system is starting up; пока сервер запускается,
+                # соединение может оборваться и после входа, уже на SELECT 1
+                pass
+        await asyncio.sleep(POLL_INTERVAL)
+    raise BenchError(f"сервер не ответил за {timeout} с")
+
+
+# ==============================
+# Нагрузка
+# ==============================
+async def run_load(port, args, stop):
+    """Пишет пачки строк до остановки сервера; возвращает подтверждённые seq по клиентам"""
+    acked = dict.fromkeys(range(args.clients), 0)
+    commits = 0
+    errors = []
+
+    async def client(number):
+        nonlocal commits
+        try:
+            conn = await connect(port)
+        except (pgwire.PgError, pgwire.ProtocolError) as e:
+            errors.append(str(e))
+            return
+        try:
+            while True:
+                seq = acked[number] + 1
+                await conn.execute(INSERT_SQL, number, seq, args.row_size, args.batch)
+                # Коммит подтверждён сервером: эти строки обязаны пережить сбой
+                acked[number] = seq + args.batch - 1
+                commits += 1
+        except (pgwire.PgError, pgwire.ProtocolError) as e:
+            if not stop.is_set():
+                errors.append(str(e))
+        finally:
+            await conn.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(n) for n in range(args.clients)))
+    return {
+        'acked': acked,
+        'commits': commits,
+        'seconds': time.perf_counter() - started,
+        'errors': errors,
+    }
+
+
+async def verify(port, acked):
+    """Все подтверждённые строки на месте; amcheck индекса, если расширение есть"""
+    conn = await connect(port)
+    try:
+        lost = unacked = 0
+        for number, last in acked.items():
+            present = await conn.fetchval(
+                "SELECT count(*) FROM bench_recovery WHERE client = $1 AND seq <= $2", number, last)
+            lost += last - present
+            # Закоммиченные, но не успевшие получить подтверждение пачки
+            unacked += await conn.fetchval(
+                "SELECT count(*) FROM bench_recovery WHERE client = $1 AND seq > $2", number, last)
+        result = {'lost_rows': lost, 'unacked_rows': unacked, 'amcheck': None}
+        try:
+            await conn.execute("CREATE EXTENSION IF NOT EXISTS amcheck")
+        except pgwire.PgError:
+            return result
+        try:
+            await conn.execute("SELECT bt_index_check('bench_recovery_pkey', true)")
+            result['amcheck'] = True
+        except pgwire.PgError as e:
+            result['amcheck'] = False
+            result['amcheck_error'] = str(e)
+        return result
+    finally:
+        await conn.close()
+
+
+# ==============================
+# Один прогон
+# ==============================
+async def run_case(args, case, name):
+    settings = dict(BENCH_SETTINGS)
+    settings.update(args.set)
+    settings['max_wal_size'] = case['max_wal_size']
+    settings['checkpoint_timeout'] = case['checkpoint_timeout']
+    container = Container(args.image, name, settings)
+    result = dict(case)
+    try:
+        await asyncio.to_thread(container.create)
+        await wait_ready(container, time.perf_counter())
+        port = await asyncio.to_thread(container.port)
+
+        conn = await connect(port)
+        await conn.execute(TABLE_SQL)
+        start_lsn = (await conn.fetch(LSN_SQL))[0][0]
+
+        stop = asyncio.Event()
+        load = asyncio.ensure_future(run_load(port, args, stop))
+        await asyncio.sleep(case['kill_after'])
+
+        insert_lsn, redo_lsn = (await conn.fetch(LSN_SQL))[0]
+        result['wal_written_bytes'] = lsn_to_int(insert_lsn) - lsn_to_int(start_lsn)
+        result['wal_since_redo_bytes'] = lsn_to_int(insert_lsn) - lsn_to_int(redo_lsn)
+        await conn.close()
+
+        stop.set()
+        started = time.perf_counter()
+        if case['mode'] == 'kill':
+            await asyncio.to_thread(docker, 'kill', '-s', 'KILL', name)
+        else:
+            await asyncio.to_thread(docker, 'stop', '-t', '3600', name)
+        result['stop_seconds'] = round(time.perf_counter() - started, 3)
+
+        load = await load
+        if load['errors']:
+            raise BenchError(f"ошибка нагрузки: {load['errors'][0]}")
+        result['commits'] = load['commits']
+        result['commits_per_s'] = round(load['commits'] / case['kill_after'], 1)
+        result['wal_mb_per_s'] = round(result['wal_written_bytes'] / case['kill_after'] / 1024 / 1024, 2)
+
+        started = time.perf_counter()
+        await asyncio.to_thread(docker, 'start', name)
+        result['ready_seconds'] = round(await wait_ready(container, started), 3)
+
+        logs = await asyncio.to_thread(docker, 'logs', name)
+        result.update(parse_recovery_log(logs.stdout + logs.stderr))
+        result.update(await verify(await asyncio.to_thread(container.port), load['acked']))
+        result['acked_rows'] = sum(load['acked'].values())
+    except (BenchError, pgwire.PgError, pgwire.ProtocolError) as e:
+        result['error'] = str(e)
+    finally:
+        await asyncio.to_thread(container.remove)
+    return result
+
+
+# ==============================
+# Отчёт
+# ==============================
+def summarize(case, runs):
+    ok = [r for r in runs if 'error' not in r]
+    summary = dict(case)
+    summary['runs'] = runs
+    summary['errors'] = [r['error'] for r in runs if 'error' in r]
+    for key in ('commits_per_s', 'wal_mb_per_s', 'wal_since_redo_bytes', 'stop_seconds',
+                'replayed_bytes', 'redo_seconds', 'end_checkpoint_seconds', 'ready_seconds'):
+        values = [r[key] for r in ok if r.get(key) is not None]
+        summary[key] = round(statistics.median(values), 3) if values else None
+    summary['lost_rows'] = sum(r['lost_rows'] for r in ok)
+    summary['amcheck'] = None if any(r['amcheck'] is None for r in ok) else all(r['amcheck'] for r in ok)
+    summary['intact'] = bool(ok) and summary['lost_rows'] == 0 and summary['amcheck'] is not False
+    return summary
+
+
+def megabytes(value):
+    return '-' if value is None else f"{value / 1024 / 1024:.0f}"
+
+
+def print_table(results):
+    print(f"\n{'остановка':<9} {'max_wal':>8} {'ckpt_tmo':>9} {'через, с':>8} {'ком/с':>8} "
+          f"{'WAL МБ/с':>8} {'к redo МБ':>9} {'redo МБ':>8} {'redo, с':>8} {'готов, с':>9} целостность")
+    for r in results:
+        if len(r['errors']) == len(r['runs']):
+            print(f"{r['mode']:<9} {r['max_wal_size']:>8} {r['checkpoint_timeout']:>9} "
+                  f"{r['kill_after']:>8} ❌ {r['errors'][0][:80]}")
+            continue
+        mark = '✅' if r['intact'] else f"❌ потеряно строк: {r['lost_rows']}"
+        if r['amcheck'] is None and r['intact']:
+            mark += ' (без amcheck)'
+        print(f"{r['mode']:<9} {r['max_wal_size']:>8} {r['checkpoint_timeout']:>9} {r['kill_after']:>8} "
+              f"{r['commits_per_s'] or '-':>8} {r['wal_mb_per_s'] or '-':>8} "
+              f"{megabytes(r['wal_since_redo_bytes']):>9} {megabytes(r['replayed_bytes']):>8} "
+              f"{r['redo_seconds'] if r['redo_seconds'] is not None else '-':>8} "
+              f"{r['ready_seconds'] if r['ready_seconds'] is not None else '-':>9} {mark}")
+
+
+# ==============================
+# Основной скрипт
+# ==============================
+def split_list(value):
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def parse_setting(value):
+    if '=' not in value:
+        raise argparse.ArgumentTypeError("ожидается ПАРАМЕТР=ЗНАЧЕНИЕ")
+    return tuple(item.strip() for item in value.split('=', 1))
+
+
+async def run(args, cases):
+    results = []
+    for n, case in enumerate(cases, 1):
+        print(f"▶ [{n}/{len(cases)}] {case['mode']}, max_wal_size={case['max_wal_size']}, "
+              f"checkpoint_timeout={case['checkpoint_timeout']}, через {case['kill_after']} с", flush=True)
+        runs = [await run_case(args, case, f"{CONTAINER_PREFIX}-{n}") for _ in range(args.repeat)]
+        for r in runs:
+            if 'error' in r:
+                print(f"   ❌ {r['error']}")
+        results.append(summarize(case, runs))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк восстановления postgres-1c после сбоя")
+    parser.add_argument('--image', default=DEFAULT_IMAGE,
+                        help=f"образ сервера (по умолчанию {DEFAULT_IMAGE} из docker compose build)")
+    parser.add_argument('--max-wal-size', type=split_list, default=['1GB', '4GB'],
+                        help="значения max_wal_size через запятую")
+    parser.add_argument('--checkpoint-timeout', type=split_list, default=['5min', '15min'],
+                        help="значения checkpoint_timeout через запятую")
+    parser.add_argument('--mode', action='append', choices=MODES,
+                        help="способ остановки (можно несколько; по умолчанию kill и stop)")
+    parser.add_argument('--kill-after', type=lambda v: [float(x) for x in split_list(v)], default=[60.0],
+                        help="секунд нагрузки перед остановкой, через запятую")
+    parser.add_argument('--clients', type=int, default=8, help="число пишущих клиентов")
+    parser.add_argument('--batch', type=int, default=100, help="строк в одной транзакции")
+    parser.add_argument('--row-size', type=int, default=200, help="размер строки, байт")
+    parser.add_argument('--set', type=parse_setting, action='append', default=[], metavar='NAME=VALUE',
+                        help="дополнительный параметр сервера (например shared_buffers=1GB)")
+    parser.add_argument('--repeat', type=int, default=1, help="повторов каждой комбинации (берётся медиана)")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help="файл результатов JSON")
+    args = parser.parse_args()
+    args.set = dict(args.set)
+
+    try:
+        docker_version = docker('version', '-f', '{{.Server.Version}}').stdout.strip()
+        docker('image', 'inspect', args.image)
+    except BenchError as e:
+        print(f"❌ Docker или образ {args.image} недоступен: {e}")
+        return 1
+
+    cases = [{'mode': mode, 'max_wal_size': wal, 'checkpoint_timeout': timeout, 'kill_after': after}
+             for mode, wal, timeout, after in itertools.product(
+                 args.mode or list(MODES), args.max_wal_size, args.checkpoint_timeout, args.kill_after)]
+    try:
+        results = asyncio.run(run(args, cases))
+    except KeyboardInterrupt:
+        print("\nПрервано")
+        return 1
+    print_table(results)
+
+    report = {
+        'generated': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'platform': platform.platform(),
+        'docker': docker_version,
+        'image': args.image,
+        'load': {'clients': args.clients, 'batch': args.batch, 'row_size': args.row_size},
+        'settings': {**BENCH_SETTINGS, **args.set},
+        'repeat': args.repeat,
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n📄 Результаты сохранены: {args.output}")
+    return 0 if all(r['intact'] for r in results) else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк скриптов save_toAI.py и save_toAI2.py.
+
+Генерирует воспроизводимые синтетические деревья файлов (число файлов,
+глубина, доля бинарных, огромные файлы, тяжёлые игнорируемые каталоги
+вроде node_modules) и отдельно измеряет фазы:
+  walk     - os.walk с отсечением игнорируемых каталогов;
+  classify - is_archive_or_binary (расширение, MIME, поиск NUL-байтов);
+  read     - read_file_content для текстовых файлов;
+  render   - полный проход collect_files() (всё вместе плюс сборка markdown).
+             Оба скрипта прекращают сбор после 1000 строк, поэтому на
+             больших деревьях render измеряет время до срабатывания лимита,
+             а не обработку всего дерева: для него сохраняется только время
+             и признак обрезки (truncated, в таблице - "render*").
+
+Каждая фаза запускается в отдельном процессе, поэтому пиковый RSS
+относится только к ней. Результат (время, файлов/с, МБ/с, пиковый RSS)
+сохраняется в JSON; --compare показывает изменение относительно
+предыдущего прогона.
+
+Примеры:
+    python3 bench_save_toAI.py
+    python3 bench_save_toAI.py --scenario many_files --scenario huge_files --repeat 5
+    python3 bench_save_toAI.py --output new.json --compare old.json
+"""
+
+import argparse
+import hashlib
+import importlib.util
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# ==============================
+# Настройки
+# ==============================
+SCRIPT_DIR = Path(__file__).resolve().parent
+DEFAULT_SCRIPTS = [SCRIPT_DIR / 'save_toAI.py', SCRIPT_DIR / 'save_toAI2.py']
+DEFAULT_WORKDIR = Path(tempfile.gettempdir()) / 'bench_save_toAI'
+DEFAULT_OUTPUT = 'bench_save_toAI.json'
+
+PHASES = ('walk', 'classify', 'read', 'render')
+
+# Параметры синтетических деревьев
+SCENARIOS = {
+    'small': dict(files=200, depth=3, binary_ratio=0.1, huge_files=0, huge_mb=0, ignored_files=0),
+    'many_files': dict(files=20000, depth=4, binary_ratio=0.1, huge_files=0, huge_mb=0, ignored_files=0),
+    'deep': dict(files=5000, depth=25, binary_ratio=0.1, huge_files=0, huge_mb=0, ignored_files=0),
+    'binary_heavy': dict(files=5000, depth=4, binary_ratio=0.7, huge_files=0, huge_mb=0, ignored_files=0),
+    'huge_files': dict(files=200, depth=3, binary_ratio=0.1, huge_files=3, huge_mb=20, ignored_files=0),
+    'ignored_dirs': dict(files=500, depth=3, binary_ratio=0.1, huge_files=0, huge_mb=0, ignored_files=50000),
+}
+
+TEXT_EXTENSIONS = ['.py', '.md', '.txt', '.json', '.yml', '.sql', '.sh', '.conf']
+# .dat не входит в списки расширений - такие файлы распознаются только по NUL-байтам
+BINARY_EXTENSIONS = ['.dat', '.png', '.zip', '.so']
+IGNORED_DIRS = ['node_modules', '.git', '__pycache__', 'venv']
+
+WORDS = ('select from where insert update delete table index value result config '
+         'return import def class self data file path name count total line').split()
+
+
+# ==============================
+# Генерация деревьев
+# ==============================
+def params_hash(params, seed):
+    # Списки расширений тоже влияют на генерацию: при их изменении дерево пересоздаётся
+    raw = json.dumps({'params': params, 'seed': seed,
+                      'extensions': [TEXT_EXTENSIONS, BINARY_EXTENSIONS]}, sort_keys=True)
+    return hashlib.sha1(raw.encode()).hexdigest()[:10]
+
+
+def text_block(rng, size):
+    """Псевдокод заданного размера"""
+    lines = []
+    length = 0
+    while length < size:
+        line = '    ' * rng.randint(0, 3) + ' '.join(rng.choice(WORDS) for _ in range(rng.randint(2, 12))) + '\n'
+        lines.append(line)
+        length += len(line)
+    return ''.join(lines)
+
+
+def random_dir(rng, root, depth):
+    parts = [f"d{rng.randint(0, 9)}" for _ in range(rng.randint(0, depth))]
+    return root.joinpath(*parts)
+
+
+def generate_tree(root, params, seed):
+    """Создаёт синтетическое дерево; одинаковые параметры дают одинаковое дерево"""
+    rng = random.Random(seed)
+    root.mkdir(parents=True)
+    # Общий блок текста: генерировать каждый файл с нуля слишком долго
+    corpus = text_block(rng, 256 * 1024)
+
+    for number in range(params['files']):
+        directory = random_dir(rng, root, params['depth'])
+        directory.mkdir(parents=True, exist_ok=True)
+        size = min(int(rng.lognormvariate(8, 1.2)), 200_000)
+        if rng.random() < params['binary_ratio']:
+            path = directory / f"file{number}{rng.choice(BINARY_EXTENSIONS)}"
+            path.write_bytes(rng.randbytes(size) + b'\x00')
+        else:
+            start = rng.randint(0, len(corpus) - size)
+            path = directory / f"file{number}{rng.choice(TEXT_EXTENSIONS)}"
+            path.write_text(corpus[start:start + size], encoding='utf-8')
+
+    chunk = (corpus * (1024 * 1024 // len(corpus) + 1))[:1024 * 1024]
+    for number in range(params['huge_files']):
+        path = random_dir(rng, root, params['depth']) / f"huge{number}.log"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            for _ in range(params['huge_mb']):
+                f.write(chunk)
+
+    for number in range(params['ignored_files']):
+        ignored = rng.choice(IGNORED_DIRS)
+        directory = root / ignored / random_dir(rng, Path('.'), 8)
+        directory.mkdir(parents=True, exist_ok=True)
+        (directory / f"module{number}.js").write_text(corpus[:rng.randint(100, 4000)], encoding='utf-8')
+
+
+def ensure_tree(workdir, name, params, seed):
+    """Возвращает путь к дереву сценария, создавая его при необходимости"""
+    base = workdir / f"{name}-{params_hash(params, seed)}"
+    tree = base / 'tree'
+    marker = base / 'params.json'
+    if not marker.exists():
+        shutil.rmtree(base, ignore_errors=True)
+        print(f"  генерация дерева '{name}'...", flush=True)
+        generate_tree(tree, params, seed)
+        marker.write_text(json.dumps({'params': params, 'seed': seed}), encoding='utf-8')
+    return tree
+
+
+# ==============================
+# Измерение одной фазы (в дочернем процессе)
+# ==============================
+def load_script(path):
+    spec = importlib.util.spec_from_file_location(Path(path).stem, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def walk_files(module):
+    """Обход дерева по правилам скрипта"""
+    result = []
+    for root, dirs, files in os.walk('.'):
+        dirs[:] = [d for d in dirs if d not in module.IGNORED_ITEMS]
+        for filename in files:
+            if filename not in module.IGNORED_ITEMS:
+                result.append(Path(root) / filename)
+    return result
+
+
+def measure_phase(script, tree, phase):
+    """Выполняет фазу и возвращает метрики"""
+    module = load_script(script)
+    os.chdir(tree)
+
+    files = walk_files(module) if phase != 'walk' else None
+    text_files = [p for p in files if not module.is_archive_or_binary(p)] if phase == 'read' else None
+
+    count = 0
+    size = 0
+    truncated = None
+    started = time.perf_counter()
+    if phase == 'walk':
+        files = walk_files(module)
+        count = len(files)
+    elif phase == 'classify':
+        for path in files:
+            module.is_archive_or_binary(path)
+        count = len(files)
+    elif phase == 'read':
+        for path in text_files:
+            size += len(module.read_file_content(path).encode('utf-8'))
+        count = len(text_files)
+    elif phase == 'render':
+        # Объём вывода ограничен лимитом строк и не годится для МБ/с
+        _, _, truncated = module.collect_files()
+    elapsed = time.perf_counter() - started
+
+    # ru_maxrss в Linux - в килобайтах, в macOS - в байтах
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        peak //= 1024
+    return {'seconds': elapsed, 'files': count, 'bytes': size, 'truncated': truncated, 'peak_rss_kb': peak}
+
+
+def run_worker(script, tree, phase):
+    """Запускает фазу в отдельном процессе"""
+    result = subprocess.run(
+        [sys.executable, __file__, '--worker', str(script), str(tree), phase],
+        capture_output=True,
+        text=True,
+        check=False
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip())
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+# ==============================
+# Отчёт
+# ==============================
+def summarize(script, scenario, params, phase, runs):
+    seconds = statistics.median(r['seconds'] for r in runs)
+    files = runs[0]['files']
+    size = runs[0]['bytes']
+    return {
+        'script': Path(script).name,
+        'scenario': scenario,
+        'params': params,
+        'phase': phase,
+        'runs': len(runs),
+        'seconds': round(seconds, 6),
+        'seconds_min': round(min(r['seconds'] for r in runs), 6),
+        'files': files,
+        'bytes': size,
+        'files_per_s': round(files / seconds, 1) if files and seconds else None,
+        'mb_per_s': round(size / seconds / 1024 / 1024, 2) if size and seconds else None,
+        'truncated': runs[0].get('truncated'),
+        'peak_rss_kb': max(r['peak_rss_kb'] for r in runs),
+    }
+
+
+def print_table(results, baseline=None):
+    previous = {}
+    if baseline:
+        previous = {(r['script'], r['scenario'], r['phase']): r for r in baseline['results']}
+
+    print(f"\n{'скрипт':<14} {'сценарий':<14} {'фаза':<9} {'время, с':>10} {'файлов/с':>10} "
+          f"{'МБ/с':>8} {'RSS, МБ':>8}" + (f" {'изменение':>10}" if baseline else ''))
+    for r in results:
+        phase = r['phase'] + ('*' if r.get('truncated') else '')
+        line = (f"{r['script']:<14} {r['scenario']:<14} {phase:<9} {r['seconds']:>10.4f} "
+                f"{r['files_per_s'] or '-':>10} {r['mb_per_s'] or '-':>8} {r['peak_rss_kb'] / 1024:>8.1f}")
+        old = previous.get((r['script'], r['scenario'], r['phase']))
+        if old and old['seconds']:
+            ratio = r['seconds'] / old['seconds']
+            mark = '🟢' if ratio < 0.95 else ('🔴' if ratio > 1.05 else '  ')
+            line += f" {mark} x{ratio:.2f}"
+        print(line)
+    if any(r.get('truncated') for r in results):
+        print("* вывод обрезан лимитом 1000 строк: время до срабатывания лимита, а не всего дерева")
+
+
+# ==============================
+# Основной скрипт
+# ==============================
+def main():
+    if len(sys.argv) == 5 and sys.argv[1] == '--worker':
+        print(json.dumps(measure_phase(sys.argv[2], sys.argv[3], sys.argv[4])))
+        return 0
+
+    parser = argparse.ArgumentParser(description="Бенчмарк save_toAI.py / save_toAI2.py")
+    parser.add_argument('--script', action='append', type=Path,
+                        help="скрипт для измерения (можно несколько; по умолчанию оба)")
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                        help="сценарий (можно несколько; по умолчанию все)")
+    parser.add_argument('--phase', action='append', choices=PHASES, help="фаза (по умолчанию все)")
+    parser.add_argument('--repeat', type=int, default=3, help="повторов каждой фазы (берётся медиана)")
+    parser.add_argument('--seed', type=int, default=42, help="зерно генератора деревьев")
+    parser.add_argument('--workdir', type=Path, default=DEFAULT_WORKDIR, help="каталог для деревьев")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help="файл результатов JSON")
+    parser.add_argument('--compare', metavar='FILE', help="сравнить с предыдущим JSON")
+    args = parser.parse_args()
+
+    scripts = [p.resolve() for p in (args.script or DEFAULT_SCRIPTS)]
+    scenarios = args.scenario or list(SCENARIOS)
+    phases = args.phase or list(PHASES)
+
+    print("Подготовка деревьев...")
+    trees = {name: ensure_tree(args.workdir, name, SCENARIOS[name], args.seed) for name in scenarios}
+
+    results = []
+    for script in scripts:
+        for name in scenarios:
+            for phase in phases:
+                print(f"▶ {script.name} / {name} / {phase}", flush=True)
+                # Первый запуск прогревает кэш страниц и не учитывается
+                run_worker(script, trees[name], phase)
+                runs = [run_worker(script, trees[name], phase) for _ in range(args.repeat)]
+                results.append(summarize(script, name, SCENARIOS[name], phase, runs))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_table(results, baseline)
+
+    report = {
+        'generated': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'seed': args.seed,
+        'repeat': args.repeat,
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n📄 Результаты сохранены: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,49 @@
+#!/bin/bash
+# Запуск основного сервера postgres-1c.
+# При первом старте (пустой PGDATA) выполняются initdb и скрипты из
+# /docker-entrypoint-initdb.d, при следующих сервер стартует сразу.
+# Конфиги берутся из /etc/postgresql: в PGDATA их монтировать нельзя,
+# initdb требует пустой каталог.
+set -euo pipefail
+
+PGDATA="${PGDATA:-/var/lib/postgresql/data}"
+INIT_DIR="${INIT_DIR:-/docker-entrypoint-initdb.d}"
+CONFIG_FILE="${CONFIG_FILE:-/etc/postgresql/postgresql.conf}"
+HBA_FILE="${HBA_FILE:-/etc/postgresql/pg_hba.conf}"
+POSTGRES_USER="${POSTGRES_USER:-postgres}"
+POSTGRES_DB="${POSTGRES_DB:-postgres}"
+
+. "$(dirname "$0")/pg-functions.sh"
+
+# Без аргументов или только с параметрами сервера (-c ...) запускается postgres,
+# любые другие команды (bash, psql) выполняются как есть
+first="${1:-}"
+if [ -z "$first" ] || [ "${first:0:1}" = "-" ]; then
+    set -- postgres "$@"
+fi
+if [ "$1" != "postgres" ]; then
+    exec "$@"
+fi
+
+# Запуск от root (например, user: root в docker-compose.yml): отдаём каталоги postgres
+if [ "$(id -u)" = "0" ]; then
+    mkdir -p "$PGDATA" /var/run/postgresql
+    chown postgres:postgres "$PGDATA" /var/run/postgresql
+    chmod 700 "$PGDATA"
+    exec setpriv --reuid=postgres --regid=postgres --init-groups "$0" "$@"
+fi
+
+pg_find_bin
+
+config_opts=()
+[ -f "$CONFIG_FILE" ] && config_opts+=(-c "config_file=$CONFIG_FILE")
+[ -f "$HBA_FILE" ] && config_opts+=(-c "hba_file=$HBA_FILE")
+
+if [ ! -s "$PGDATA/PG_VERSION" ]; then
+    echo "Первый запуск: initdb в $PGDATA..."
+    pg_init_cluster "${config_opts[@]}"
+    echo "Инициализация завершена"
+fi
+
+shift
+exec postgres -D "$PGDATA" "${config_opts[@]}" "$@"
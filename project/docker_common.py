@@ -0,0 +1,22 @@
+"""
+Общие функции для бенчмарков образа postgres-1c (bench_image.py,
+bench_recovery.py): запуск команд docker с понятной ошибкой.
+"""
+
+import subprocess
+
+
+class BenchError(Exception):
+    """Ошибка docker во время замера"""
+
+
+def docker(*args, check=True, timeout=None):
+    """Выполняет docker с аргументами args и возвращает CompletedProcess"""
+    try:
+        result = subprocess.run(['docker', *args], capture_output=True, text=True,
+                                timeout=timeout, check=False)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        raise BenchError(f"docker {args[0]}: {e}") from e
+    if check and result.returncode != 0:
+        raise BenchError(f"docker {' '.join(args[:2])}: {result.stderr.strip()[-500:]}")
+    return result
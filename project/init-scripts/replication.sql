@@ -0,0 +1,10 @@
+-- Пользователь для потоковой репликации (реплика postgres-1c-replica).
+-- init-scripts выполняются только при первом запуске с пустым томом;
+-- на уже инициализированном томе роль создаётся один раз вручную:
+--   docker exec -i postgres-1c psql -U postgres < init-scripts/replication.sql
+--   docker exec postgres-1c psql -U postgres -c 'SELECT pg_reload_conf()'
+CREATE ROLE replicator
+    WITH
+    REPLICATION
+    LOGIN
+    PASSWORD 'replicatorpassword';
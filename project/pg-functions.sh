@@ -0,0 +1,44 @@
+# Общие функции entrypoint-скриптов postgres-1c.
+# Подключается через source из docker-entrypoint.sh, test-entrypoint.sh
+# и replica-entrypoint.sh; в образе лежит рядом с ними в /usr/local/bin.
+
+# Каталог с бинарными файлами PostgreSQL: PG_BIN из образа или первый найденный
+pg_find_bin() {
+    local dir
+    if [ -z "${PG_BIN:-}" ]; then
+        for dir in /opt/1C/postgres/*/bin /usr/lib/postgresql/*/bin; do
+            if [ -x "$dir/postgres" ]; then
+                PG_BIN="$dir"
+                break
+            fi
+        done
+    fi
+    export PATH="${PG_BIN:-/usr/bin}:$PATH"
+}
+
+# initdb в пустой PGDATA, создание POSTGRES_DB и init-scripts из INIT_DIR.
+# Аргументы - параметры временного сервера (-c config_file=... -c hba_file=...)
+pg_init_cluster() {
+    local pwfile script
+    pwfile="$(mktemp)"
+    echo "${POSTGRES_PASSWORD:-postgres}" > "$pwfile"
+    initdb -D "$PGDATA" -U "$POSTGRES_USER" --pwfile="$pwfile" \
+        --encoding=UTF8 --locale="${LANG:-ru_RU.UTF-8}" \
+        --auth-local=trust --auth-host=md5
+    rm -f "$pwfile"
+
+    # Временный сервер только на unix-сокете: healthcheck (pg_isready -h 127.0.0.1)
+    # не считает контейнер готовым, пока не выполнены init-scripts
+    pg_ctl -D "$PGDATA" -w start -o "$* -c listen_addresses=''"
+    if [ "$POSTGRES_DB" != "postgres" ]; then
+        psql -v ON_ERROR_STOP=1 -U "$POSTGRES_USER" -d postgres \
+            -c "CREATE DATABASE \"$POSTGRES_DB\""
+    fi
+    for script in "$INIT_DIR"/*; do
+        case "$script" in
+            *.sql) echo "  $script"; psql -v ON_ERROR_STOP=1 -U "$POSTGRES_USER" -d postgres -f "$script" ;;
+            *.sh)  echo "  $script"; . "$script" ;;
+        esac
+    done
+    pg_ctl -D "$PGDATA" -m fast -w stop
+}
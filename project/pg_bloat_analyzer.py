@@ -0,0 +1,554 @@
+#!/usr/bin/env python3
+"""
+Анализ раздувания (bloat) таблиц и индексов и здоровья автовакуума.
+
+Оценка раздувания строится по pg_class и pg_stats: ожидаемое число страниц
+считается из числа строк и средней ширины строки. Если установлено
+расширение pgstattuple, для самых подозрительных объектов можно получить
+точные значения (--exact). По каждой таблице выводятся мёртвые строки,
+время последнего автовакуума и рекомендации вида
+ALTER TABLE ... SET (autovacuum_*).
+
+Режим --maintain выполняет VACUUM и REINDEX CONCURRENTLY с ограничением
+нагрузки: задержка vacuum_cost_delay, пауза между операциями, окно времени
+и ожидание при большом числе активных сеансов. Без --execute только
+печатает план работ.
+
+Примеры:
+    python3 pg_bloat_analyzer.py --container
+    python3 pg_bloat_analyzer.py --exact --sql autovacuum.sql
+    # ночное обслуживание из cron:
+    # 0 2 * * * python3 pg_bloat_analyzer.py --maintain --execute --window 02:00-05:00
+"""
+
+import argparse
+import json
+import math
+import sys
+import time
+from datetime import datetime, timezone
+
+from pg_common import (
+    PsqlError, add_connection_arguments, query, execute,
+    quote_ident, format_bytes
+)
+
+# ==============================
+# Настройки
+# ==============================
+# Размеры служебных структур страницы PostgreSQL, байт
+PAGE_HEADER = 24
+TUPLE_HEADER = 23
+ITEM_POINTER = 4
+INDEX_TUPLE_HEADER = 8
+BTREE_SPECIAL = 16
+MAXALIGN = 8
+BTREE_FILLFACTOR = 90
+
+# Пороги отчёта
+MIN_TABLE_SIZE = 8 * 1024 * 1024
+BLOAT_WARNING_RATIO = 0.3
+DEAD_WARNING_RATIO = 0.1
+STALE_AUTOVACUUM_HOURS = 24
+
+# Пороги обслуживания по умолчанию
+VACUUM_BLOAT_RATIO = 0.2
+VACUUM_DEAD_RATIO = 0.1
+REINDEX_BLOAT_RATIO = 0.4
+
+# Сколько объектов проверять через pgstattuple
+EXACT_LIMIT = 20
+
+# ==============================
+# SQL
+# ==============================
+TABLES_SQL = """
+SELECT c.oid::bigint AS relid,
+       n.nspname AS schema,
+       c.relname AS table,
+       c.relpages::bigint AS relpages,
+       greatest(c.reltuples, 0)::bigint AS reltuples,
+       pg_relation_size(c.oid) AS size,
+       coalesce(c.reloptions, '{}') AS reloptions,
+       (SELECT count(*) FROM pg_attribute a
+        WHERE a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped) AS columns,
+       (SELECT count(*) FROM pg_stats st
+        WHERE st.schemaname = n.nspname AND st.tablename = c.relname) AS columns_with_stats,
+       (SELECT coalesce(sum((1 - st.null_frac) * st.avg_width), 0) FROM pg_stats st
+        WHERE st.schemaname = n.nspname AND st.tablename = c.relname) AS data_width,
+       (SELECT coalesce(max(st.null_frac), 0) > 0 FROM pg_stats st
+        WHERE st.schemaname = n.nspname AND st.tablename = c.relname) AS has_nulls,
+       s.n_live_tup,
+       s.n_dead_tup,
+       s.n_mod_since_analyze,
+       s.n_ins_since_vacuum,
+       s.n_tup_upd,
+       s.n_tup_hot_upd,
+       s.n_tup_del,
+       s.last_vacuum::text AS last_vacuum,
+       s.last_autovacuum::text AS last_autovacuum,
+       s.last_autoanalyze::text AS last_autoanalyze,
+       s.autovacuum_count,
+       extract(epoch FROM now() - greatest(s.last_vacuum, s.last_autovacuum)) AS vacuum_age
+FROM pg_class c
+JOIN pg_namespace n ON n.oid = c.relnamespace
+JOIN pg_stat_user_tables s ON s.relid = c.oid
+WHERE c.relkind IN ('r', 'm')
+"""
+
+INDEXES_SQL = """
+SELECT i.indexrelid::bigint AS indexrelid,
+       i.indrelid::bigint AS relid,
+       n.nspname AS schema,
+       t.relname AS table,
+       c.relname AS index,
+       c.relpages::bigint AS relpages,
+       greatest(c.reltuples, 0)::bigint AS reltuples,
+       pg_relation_size(c.oid) AS size,
+       am.amname AS method,
+       i.indisvalid AS is_valid,
+       (SELECT coalesce(sum((1 - st.null_frac) * st.avg_width), 0)
+        FROM unnest(i.indkey) k(attnum)
+        JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = k.attnum
+        JOIN pg_stats st ON st.schemaname = n.nspname AND st.tablename = t.relname
+                        AND st.attname = a.attname) AS data_width,
+       (SELECT count(*) FROM unnest(i.indkey) k(attnum) WHERE k.attnum = 0) AS expressions
+FROM pg_index i
+JOIN pg_class c ON c.oid = i.indexrelid
+JOIN pg_class t ON t.oid = i.indrelid
+JOIN pg_namespace n ON n.oid = t.relnamespace
+JOIN pg_am am ON am.oid = c.relam
+JOIN pg_stat_user_tables s ON s.relid = i.indrelid
+"""
+
+SETTINGS_SQL = """
+SELECT name, setting
+FROM pg_settings
+WHERE name IN ('block_size', 'autovacuum', 'autovacuum_vacuum_scale_factor',
+               'autovacuum_vacuum_threshold', 'autovacuum_analyze_scale_factor',
+               'autovacuum_vacuum_insert_scale_factor', 'autovacuum_vacuum_cost_limit',
+               'vacuum_cost_limit', 'autovacuum_max_workers')
+"""
+
+PGSTATTUPLE_SQL = "SELECT extversion FROM pg_extension WHERE extname = 'pgstattuple'"
+
+EXACT_TABLE_SQL = """
+SELECT {relid}::bigint AS relid, approx_free_percent AS free_percent, dead_tuple_percent
+FROM pgstattuple_approx({relid}::regclass)
+"""
+
+EXACT_INDEX_SQL = """
+SELECT {indexrelid}::bigint AS indexrelid, avg_leaf_density, leaf_fragmentation
+FROM pgstatindex({indexrelid}::regclass)
+"""
+
+ACTIVE_SESSIONS_SQL = """
+SELECT count(*) AS active
+FROM pg_stat_activity
+WHERE state = 'active' AND backend_type = 'client backend' AND pid <> pg_backend_pid()
+"""
+
+
+# ==============================
+# Оценка раздувания
+# ==============================
+def align(size, alignment=MAXALIGN):
+    return int(math.ceil(size / alignment) * alignment)
+
+
+def reloption(table, name, default=None):
+    """Значение параметра хранения таблицы из reloptions"""
+    for option in table['reloptions']:
+        key, _, value = option.partition('=')
+        if key == name:
+            return value
+    return default
+
+
+def table_tuple_size(table):
+    """Средний размер строки таблицы на странице вместе с указателем"""
+    null_bitmap = math.ceil(table['columns'] / 8) if table['has_nulls'] else 0
+    return align(TUPLE_HEADER + null_bitmap) + align(table['data_width']) + ITEM_POINTER
+
+
+def estimate_table_bloat(table, block_size):
+    """Ожидаемое число страниц таблицы и доля лишнего места"""
+    if not table['relpages'] or not table['columns_with_stats']:
+        return None
+    tuple_size = table_tuple_size(table)
+    fillfactor = int(reloption(table, 'fillfactor', 100))
+    usable = (block_size - PAGE_HEADER) * fillfactor / 100
+    tuples_per_page = max(math.floor(usable / tuple_size), 1)
+    expected = math.ceil(table['reltuples'] / tuples_per_page)
+    bloat_pages = max(table['relpages'] - expected, 0)
+    return {
+        'expected_pages': expected,
+        'bloat_bytes': bloat_pages * block_size,
+        'bloat_ratio': bloat_pages / table['relpages'],
+        'complete_stats': table['columns_with_stats'] >= table['columns'],
+    }
+
+
+def estimate_index_bloat(index, block_size):
+    """Оценка раздувания B-tree индекса"""
+    if index['method'] != 'btree' or index['relpages'] < 2 or index['expressions']:
+        return None
+    tuple_size = align(INDEX_TUPLE_HEADER + index['data_width']) + ITEM_POINTER
+    usable = (block_size - PAGE_HEADER - BTREE_SPECIAL) * BTREE_FILLFACTOR / 100
+    tuples_per_page = max(math.floor(usable / tuple_size), 1)
+    # +1 метастраница
+    expected = math.ceil(index['reltuples'] / tuples_per_page) + 1
+    bloat_pages = max(index['relpages'] - expected, 0)
+    return {
+        'expected_pages': expected,
+        'bloat_bytes': bloat_pages * block_size,
+        'bloat_ratio': bloat_pages / index['relpages'],
+    }
+
+
+def apply_exact(args, tables, indexes):
+    """Уточняет оценки через pgstattuple для самых раздутых объектов"""
+    tables = sorted(tables, key=lambda t: t['bloat']['bloat_bytes'] if t['bloat'] else 0, reverse=True)
+    for table in tables[:EXACT_LIMIT]:
+        try:
+            row = query(args, EXACT_TABLE_SQL.format(relid=table['relid']))[0]
+        except PsqlError:
+            continue
+        waste = (row['free_percent'] + row['dead_tuple_percent']) / 100
+        table['bloat'] = {
+            'expected_pages': math.ceil(table['relpages'] * (1 - waste)),
+            'bloat_bytes': int(table['size'] * waste),
+            'bloat_ratio': waste,
+            'complete_stats': True,
+            'exact': True,
+        }
+
+    indexes = sorted(indexes, key=lambda i: i['bloat']['bloat_bytes'] if i['bloat'] else 0, reverse=True)
+    for index in indexes[:EXACT_LIMIT]:
+        if index['method'] != 'btree':
+            continue
+        try:
+            row = query(args, EXACT_INDEX_SQL.format(indexrelid=index['indexrelid']))[0]
+        except PsqlError:
+            continue
+        density = (row['avg_leaf_density'] or 0) / 100
+        if not density:
+            continue
+        waste = max(BTREE_FILLFACTOR / 100 - density, 0) / (BTREE_FILLFACTOR / 100)
+        index['bloat'] = {
+            'expected_pages': math.ceil(index['relpages'] * (1 - waste)),
+            'bloat_bytes': int(index['size'] * waste),
+            'bloat_ratio': waste,
+            'exact': True,
+        }
+
+
+# ==============================
+# Рекомендации по автовакууму
+# ==============================
+def target_scale_factor(rows):
+    """Чем больше таблица, тем меньше доля изменений до запуска автовакуума"""
+    if rows < 100_000:
+        return 0.2
+    if rows < 1_000_000:
+        return 0.05
+    if rows < 10_000_000:
+        return 0.02
+    return 0.01
+
+
+def autovacuum_recommendations(table, settings):
+    """Параметры autovacuum_* для таблицы, отличающиеся от текущих"""
+    rows = table['n_live_tup']
+    dead = table['n_dead_tup']
+    dead_ratio = dead / max(rows + dead, 1)
+    options = {}
+
+    scale_factor = target_scale_factor(rows)
+    current = float(reloption(table, 'autovacuum_vacuum_scale_factor',
+                              settings['autovacuum_vacuum_scale_factor']))
+    if scale_factor < current:
+        options['autovacuum_vacuum_scale_factor'] = scale_factor
+        options['autovacuum_analyze_scale_factor'] = round(scale_factor / 2, 4)
+        options['autovacuum_vacuum_insert_scale_factor'] = scale_factor
+
+    # Автовакуум не успевает: мёртвых строк много или он давно не приходил
+    stale = table['vacuum_age'] is None or table['vacuum_age'] > STALE_AUTOVACUUM_HOURS * 3600
+    if dead_ratio > DEAD_WARNING_RATIO and (stale or table['bloat_ratio'] > BLOAT_WARNING_RATIO):
+        cost_limit = int(reloption(table, 'autovacuum_vacuum_cost_limit', 0) or 0)
+        global_limit = int(settings['autovacuum_vacuum_cost_limit'])
+        if global_limit < 0:
+            global_limit = int(settings['vacuum_cost_limit'])
+        if max(cost_limit, global_limit) < 2000:
+            options['autovacuum_vacuum_cost_limit'] = 2000
+            options['autovacuum_vacuum_cost_delay'] = 1
+
+    # Частые UPDATE без HOT: запас места на странице позволит обновлять строку на месте
+    updates = table['n_tup_upd']
+    if updates > rows and updates and table['n_tup_hot_upd'] / updates < 0.5 \
+            and int(reloption(table, 'fillfactor', 100)) == 100 and rows >= 10_000:
+        options['fillfactor'] = 90
+
+    return options
+
+
+def alter_table_sql(table, options):
+    settings = ', '.join(f"{key} = {value}" for key, value in options.items())
+    return f"ALTER TABLE {quote_ident(table['schema'])}.{quote_ident(table['table'])} SET ({settings});"
+
+
+# ==============================
+# Обслуживание
+# ==============================
+def parse_window(window):
+    """Окно 'ЧЧ:ММ-ЧЧ:ММ' -> пара минут от полуночи"""
+    def to_minutes(value):
+        hours, _, minutes = value.strip().partition(':')
+        return int(hours) * 60 + int(minutes or 0)
+
+    start, _, end = window.partition('-')
+    return to_minutes(start), to_minutes(end)
+
+
+def in_window(window):
+    if not window:
+        return True
+    start, end = window
+    now = datetime.now()
+    minutes = now.hour * 60 + now.minute
+    if start <= end:
+        return start <= minutes < end
+    return minutes >= start or minutes < end
+
+
+def dead_tuple_bytes(table):
+    """Место, занятое мёртвыми строками: n_dead_tup x средний размер строки"""
+    return table['n_dead_tup'] * table_tuple_size(table)
+
+
+def maintenance_plan(tables, indexes, args):
+    """Список операций обслуживания, самые выгодные (по освобождаемым байтам) - первыми"""
+    plan = []
+    for table in tables:
+        dead_ratio = table['n_dead_tup'] / max(table['n_live_tup'] + table['n_dead_tup'], 1)
+        if table['bloat_ratio'] >= args.vacuum_bloat or dead_ratio >= args.vacuum_dead:
+            name = f"{quote_ident(table['schema'])}.{quote_ident(table['table'])}"
+            plan.append({
+                'kind': 'vacuum',
+                'object': f"{table['schema']}.{table['table']}",
+                'sql': f"VACUUM (ANALYZE) {name}",
+                # Мёртвые строки уже входят в оценку раздувания по страницам,
+                # поэтому берём большее из двух, а не сумму
+                'gain': max(table['bloat_bytes'], dead_tuple_bytes(table)),
+            })
+    for index in indexes:
+        if index['bloat'] and index['bloat']['bloat_ratio'] >= args.reindex_bloat and index['is_valid']:
+            name = f"{quote_ident(index['schema'])}.{quote_ident(index['index'])}"
+            plan.append({
+                'kind': 'reindex',
+                'object': f"{index['schema']}.{index['index']}",
+                'sql': f"REINDEX INDEX CONCURRENTLY {name}",
+                'gain': index['bloat']['bloat_bytes'],
+            })
+    plan.sort(key=lambda op: op['gain'], reverse=True)
+    return plan[:args.max_ops] if args.max_ops else plan
+
+
+def wait_for_quiet(args, stop_reason):
+    """
+    Ждёт, пока число активных сеансов не опустится ниже порога.
+    Возвращает причину остановки, если за время ожидания закрылось окно
+    обслуживания или истёк лимит времени, иначе None.
+    """
+    while True:
+        reason = stop_reason()
+        if reason:
+            return reason
+        active = query(args, ACTIVE_SESSIONS_SQL)[0]['active']
+        if active <= args.max_active:
+            return None
+        print(f"  ⏸  активных сеансов {active} > {args.max_active}, ожидание {args.pause} с")
+        time.sleep(args.pause)
+
+
+def run_maintenance(args, plan):
+    window = parse_window(args.window) if args.window else None
+    deadline = time.monotonic() + args.max_duration * 60 if args.max_duration else None
+
+    def stop_reason():
+        if not in_window(window):
+            return f"Вне окна обслуживания {args.window}"
+        if deadline and time.monotonic() >= deadline:
+            return "Превышено время обслуживания"
+        return None
+
+    done = 0
+    for number, op in enumerate(plan, 1):
+        # Окно и лимит проверяются непосредственно перед каждой операцией,
+        # после ожидания пауз и затишья
+        reason = wait_for_quiet(args, stop_reason)
+        if reason:
+            print(f"⏹  {reason}, остановка")
+            break
+
+        print(f"▶ [{number}/{len(plan)}] {op['sql']}")
+        # Ручной VACUUM по умолчанию не ограничен (vacuum_cost_delay = 0)
+        script = (
+            f"SET vacuum_cost_delay = {args.cost_delay};\n"
+            f"SET vacuum_cost_limit = {args.cost_limit};\n"
+            f"SET maintenance_work_mem = '{args.maintenance_work_mem}';\n"
+            f"{op['sql']}"
+        )
+        started = time.monotonic()
+        try:
+            execute(args, script)
+        except PsqlError as e:
+            print(f"  ❌ Ошибка: {e}")
+        else:
+            done += 1
+            print(f"  ✅ Выполнено за {time.monotonic() - started:.1f} с")
+        if number < len(plan):
+            time.sleep(args.pause)
+    return done
+
+
+# ==============================
+# Отчёт
+# ==============================
+def format_age(seconds):
+    if seconds is None:
+        return "никогда"
+    hours = seconds / 3600
+    return f"{hours:.0f} ч назад" if hours < 48 else f"{hours / 24:.0f} дн назад"
+
+
+def print_report(tables, indexes, recommendations, limit):
+    print("=" * 60)
+    print("РАЗДУВАНИЕ ТАБЛИЦ И ЗДОРОВЬЕ АВТОВАКУУМА")
+    print("=" * 60)
+    print(f"{'таблица':<45} {'размер':>10} {'лишнее':>10} {'%':>5} {'мёртвых':>10} {'автовакуум':>14}")
+    for table in tables[:limit]:
+        warning = '⚠️ ' if table['bloat_ratio'] > BLOAT_WARNING_RATIO else '   '
+        print(f"{warning}{table['schema'] + '.' + table['table']:<42} {format_bytes(table['size']):>10} "
+              f"{format_bytes(table['bloat_bytes']):>10} {table['bloat_ratio'] * 100:>4.0f}% "
+              f"{table['n_dead_tup']:>10} {format_age(table['vacuum_age']):>14}")
+
+    bloated = [i for i in indexes if i['bloat'] and i['bloat']['bloat_ratio'] > BLOAT_WARNING_RATIO]
+    if bloated:
+        print("\nРаздутые индексы:")
+        for index in bloated[:limit]:
+            print(f"  {index['schema'] + '.' + index['index']:<55} {format_bytes(index['size']):>10} "
+                  f"лишнее {format_bytes(index['bloat']['bloat_bytes'])} "
+                  f"({index['bloat']['bloat_ratio'] * 100:.0f}%)")
+
+    print("\nРекомендации по автовакууму:")
+    if not recommendations:
+        print("  ✓ Рекомендаций нет")
+    for item in recommendations[:limit]:
+        print(f"  {item['sql']}")
+
+
+# ==============================
+# Основной скрипт
+# ==============================
+def main():
+    parser = argparse.ArgumentParser(description="Анализ раздувания и настройка автовакуума")
+    add_connection_arguments(parser)
+    parser.add_argument('--exact', action='store_true', help="уточнить оценки через pgstattuple")
+    parser.add_argument('--top', type=int, default=30, help="сколько объектов показать")
+    parser.add_argument('--json', metavar='FILE', help="сохранить результат в JSON")
+    parser.add_argument('--sql', metavar='FILE', help="сохранить ALTER TABLE в SQL-скрипт")
+
+    maintain = parser.add_argument_group("обслуживание")
+    maintain.add_argument('--maintain', action='store_true', help="составить план VACUUM / REINDEX")
+    maintain.add_argument('--execute', action='store_true', help="выполнить план (иначе только показать)")
+    maintain.add_argument('--vacuum-bloat', type=float, default=VACUUM_BLOAT_RATIO, help="порог раздувания для VACUUM")
+    maintain.add_argument('--vacuum-dead', type=float, default=VACUUM_DEAD_RATIO, help="порог доли мёртвых строк для VACUUM")
+    maintain.add_argument('--reindex-bloat', type=float, default=REINDEX_BLOAT_RATIO, help="порог раздувания для REINDEX")
+    maintain.add_argument('--max-ops', type=int, default=0, help="не больше N операций за запуск")
+    maintain.add_argument('--max-duration', type=float, default=0, help="ограничение времени, мин")
+    maintain.add_argument('--window', help="окно обслуживания, например 02:00-05:00")
+    maintain.add_argument('--pause', type=float, default=10.0, help="пауза между операциями, с")
+    maintain.add_argument('--max-active', type=int, default=5, help="ждать, если активных сеансов больше")
+    maintain.add_argument('--cost-delay', type=int, default=10, help="vacuum_cost_delay для ручного VACUUM, мс")
+    maintain.add_argument('--cost-limit', type=int, default=200, help="vacuum_cost_limit для ручного VACUUM")
+    maintain.add_argument('--maintenance-work-mem', default='256MB', help="maintenance_work_mem для операций")
+    args = parser.parse_args()
+
+    try:
+        settings = {row['name']: row['setting'] for row in query(args, SETTINGS_SQL)}
+        block_size = int(settings['block_size'])
+        tables = query(args, TABLES_SQL)
+        indexes = query(args, INDEXES_SQL)
+
+        for table in tables:
+            table['bloat'] = estimate_table_bloat(table, block_size)
+        for index in indexes:
+            index['bloat'] = estimate_index_bloat(index, block_size)
+
+        if args.exact:
+            if query(args, PGSTATTUPLE_SQL):
+                apply_exact(args, tables, indexes)
+            else:
+                print("ℹ️  Расширение pgstattuple не установлено, используются оценки по pg_stats")
+    except PsqlError as e:
+        print(f"❌ Ошибка запроса к базе: {e}", file=sys.stderr)
+        return 1
+
+    for table in tables:
+        bloat = table['bloat'] or {}
+        table['bloat_bytes'] = bloat.get('bloat_bytes', 0)
+        table['bloat_ratio'] = bloat.get('bloat_ratio', 0.0)
+
+    tables.sort(key=lambda t: (t['bloat_bytes'], t['n_dead_tup']), reverse=True)
+    indexes.sort(key=lambda i: i['bloat']['bloat_bytes'] if i['bloat'] else 0, reverse=True)
+
+    recommendations = []
+    for table in tables:
+        if table['size'] < MIN_TABLE_SIZE:
+            continue
+        options = autovacuum_recommendations(table, settings)
+        if options:
+            recommendations.append({
+                'table': f"{table['schema']}.{table['table']}",
+                'options': options,
+                'sql': alter_table_sql(table, options),
+            })
+
+    print_report(tables, indexes, recommendations, args.top)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({
+                'generated': datetime.now(timezone.utc).isoformat(),
+                'tables': tables,
+                'indexes': indexes,
+                'recommendations': recommendations,
+            }, f, ensure_ascii=False, indent=2)
+        print(f"\n📄 Результат сохранён: {args.json}")
+    if args.sql:
+        with open(args.sql, 'w', encoding='utf-8') as f:
+            f.write("-- Рекомендации pg_bloat_analyzer.py по автовакууму\n\n")
+            for item in recommendations:
+                f.write(item['sql'] + "\n")
+        print(f"📄 SQL-скрипт сохранён: {args.sql}")
+
+    if args.maintain:
+        plan = maintenance_plan(tables, indexes, args)
+        print(f"\nПлан обслуживания: {len(plan)} операций")
+        for op in plan:
+            print(f"  {op['sql']};  -- освободит ~{format_bytes(op['gain'])}")
+        if args.execute and plan:
+            try:
+                done = run_maintenance(args, plan)
+            except PsqlError as e:
+                print(f"❌ Ошибка запроса к базе: {e}", file=sys.stderr)
+                return 1
+            print(f"\nВыполнено операций: {done} из {len(plan)}")
+        elif plan:
+            print("ℹ️  Для выполнения добавьте --execute")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
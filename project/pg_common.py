@@ -0,0 +1,101 @@
+"""
+Общие функции для утилит обслуживания PostgreSQL.
+Запросы выполняются через psql (локально или внутри контейнера через
+docker exec), результаты возвращаются в виде JSON.
+"""
+
+import json
+import os
+import subprocess
+
+# ==============================
+# Настройки по умолчанию
+# ==============================
+DEFAULT_DATABASE = "1C_DB"
+DEFAULT_CONTAINER = "postgres-1c"
+
+
+class PsqlError(Exception):
+    """Ошибка выполнения psql"""
+
+
+def add_connection_arguments(parser):
+    """Добавляет в argparse общие параметры подключения"""
+    group = parser.add_argument_group("подключение")
+    group.add_argument('-d', '--dbname', default=DEFAULT_DATABASE, help="имя базы данных")
+    group.add_argument('-H', '--host', help="адрес сервера (по умолчанию - сокет)")
+    group.add_argument('-p', '--port', type=int, help="порт сервера")
+    group.add_argument('-U', '--user', default=os.environ.get('PGUSER', 'postgres'), help="пользователь")
+    group.add_argument('--container', nargs='?', const=DEFAULT_CONTAINER,
+                       help=f"выполнять psql внутри контейнера (по умолчанию {DEFAULT_CONTAINER})")
+    return group
+
+
+def psql_command(args, dbname=None):
+    """Формирует командную строку psql по параметрам подключения"""
+    cmd = []
+    if getattr(args, 'container', None):
+        cmd += ['docker', 'exec', '-i']
+        if os.environ.get('PGPASSWORD'):
+            cmd += ['-e', 'PGPASSWORD']
+        cmd += [args.container]
+    cmd += ['psql', '-X', '-q', '-A', '-t', '-v', 'ON_ERROR_STOP=1']
+    if args.host:
+        cmd += ['-h', args.host]
+    if args.port:
+        cmd += ['-p', str(args.port)]
+    if args.user:
+        cmd += ['-U', args.user]
+    cmd += ['-d', dbname or args.dbname]
+    return cmd
+
+
+def run_script(args, script, dbname=None, timeout=None):
+    """Выполняет SQL-скрипт через psql и возвращает stdout"""
+    try:
+        result = subprocess.run(
+            psql_command(args, dbname),
+            input=script,
+            capture_output=True,
+            text=True,
+            timeout=timeout,
+            check=False
+        )
+    except (OSError, subprocess.TimeoutExpired) as e:
+        raise PsqlError(f"Не удалось выполнить psql: {e}") from e
+    if result.returncode != 0:
+        raise PsqlError(result.stderr.strip() or f"psql завершился с кодом {result.returncode}")
+    return result.stdout
+
+
+def query(args, sql, dbname=None, timeout=None):
+    """Выполняет SELECT и возвращает строки в виде списка словарей"""
+    sql = sql.strip().rstrip(';')
+    wrapped = f"SELECT coalesce(json_agg(q), '[]'::json) FROM ({sql}) q;\n"
+    output = run_script(args, wrapped, dbname, timeout)
+    return json.loads(output)
+
+
+def execute(args, sql, dbname=None, timeout=None):
+    """Выполняет команду без результата (VACUUM, ALTER и т.п.)"""
+    return run_script(args, sql.strip().rstrip(';') + ';\n', dbname, timeout)
+
+
+def quote_ident(name):
+    """Экранирует идентификатор для подстановки в SQL"""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def quote_literal(value):
+    """Экранирует строковый литерал для подстановки в SQL"""
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def format_bytes(size):
+    """Человекочитаемый размер"""
+    size = float(size or 0)
+    for unit in ('Б', 'КБ', 'МБ', 'ГБ'):
+        if abs(size) < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} ТБ"
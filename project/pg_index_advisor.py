@@ -0,0 +1,558 @@
+#!/usr/bin/env python3
+"""
+Советник по индексам для базы "1C_DB".
+
+Источники данных:
+  - pg_stat_user_tables   - таблицы с тяжёлыми последовательными чтениями;
+  - pg_stat_user_indexes  - неиспользуемые индексы;
+  - JSON из pg_log_analyzer.py - отпечатки медленных запросов.
+
+По предикатам медленных запросов строятся кандидаты в индексы. Если в базе
+установлено расширение hypopg, каждый кандидат проверяется через EXPLAIN
+с гипотетическим индексом. Дублирующие и неиспользуемые индексы, которые
+только замедляют запись, предлагаются к удалению. Итоговый список
+отсортирован по оценке выигрыша.
+
+Примечание: индексы таблиц 1С создаёт платформа. Удалённый вручную индекс
+вернётся при реструктуризации, поэтому для таблиц 1С предложения лучше
+реализовывать через свойство "Индексировать" реквизитов конфигурации.
+
+Примеры:
+    python3 pg_index_advisor.py --queries slow_queries.json
+    python3 pg_index_advisor.py --container --queries slow_queries.json --sql advice.sql
+"""
+
+import argparse
+import json
+import re
+import sys
+
+from pg_common import (
+    PsqlError, add_connection_arguments, query, run_script,
+    quote_ident, quote_literal, format_bytes
+)
+from pg_log_analyzer import normalize_query, MAX_EXAMPLE_LENGTH
+
+# ==============================
+# Настройки
+# ==============================
+# Таблица считается кандидатом, если в среднем за seq scan читает больше строк
+MIN_ROWS_PER_SEQ_SCAN = 1000
+MIN_TABLE_ROWS = 10000
+
+# Неиспользуемые индексы меньше этого размера не показываем
+MIN_UNUSED_INDEX_SIZE = 1024 * 1024
+
+# Максимальное число колонок в предлагаемом индексе
+MAX_INDEX_COLUMNS = 3
+
+# Условная стоимость обновления одного индекса при изменении строки, мс.
+# Нужна, чтобы ранжировать удаление индексов вместе с созданием.
+INDEX_MAINTENANCE_MS = 0.02
+
+# Ограничение времени на EXPLAIN одного запроса
+EXPLAIN_TIMEOUT = 30
+
+# ==============================
+# SQL
+# ==============================
+TABLES_SQL = """
+SELECT s.relid::bigint AS relid,
+       s.schemaname AS schema,
+       s.relname AS table,
+       s.seq_scan,
+       s.seq_tup_read,
+       coalesce(s.idx_scan, 0) AS idx_scan,
+       s.n_live_tup,
+       s.n_tup_ins + s.n_tup_upd + s.n_tup_del AS writes,
+       pg_relation_size(s.relid) AS size
+FROM pg_stat_user_tables s
+"""
+
+INDEXES_SQL = """
+SELECT i.indexrelid::bigint AS indexrelid,
+       i.indrelid::bigint AS relid,
+       s.schemaname AS schema,
+       s.relname AS table,
+       s.indexrelname AS index,
+       s.idx_scan,
+       pg_relation_size(i.indexrelid) AS size,
+       i.indisunique AS is_unique,
+       i.indisprimary AS is_primary,
+       i.indisvalid AS is_valid,
+       EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = i.indexrelid) AS is_constraint,
+       ARRAY(SELECT a.attname
+             FROM unnest(i.indkey) WITH ORDINALITY k(attnum, ord)
+             LEFT JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = k.attnum
+             WHERE k.ord <= i.indnkeyatts
+             ORDER BY k.ord) AS columns,
+       i.indkey::text AS indkey,
+       i.indclass::text AS indclass,
+       pg_get_expr(i.indexprs, i.indrelid) AS expressions,
+       pg_get_expr(i.indpred, i.indrelid) AS predicate,
+       am.amname AS method,
+       pg_get_indexdef(i.indexrelid) AS definition
+FROM pg_index i
+JOIN pg_stat_user_indexes s ON s.indexrelid = i.indexrelid
+JOIN pg_class c ON c.oid = i.indexrelid
+JOIN pg_am am ON am.oid = c.relam
+"""
+
+COLUMNS_SQL = """
+SELECT a.attrelid::bigint AS relid, a.attname AS column
+FROM pg_attribute a
+JOIN pg_stat_user_tables s ON s.relid = a.attrelid
+WHERE a.attnum > 0 AND NOT a.attisdropped
+"""
+
+STATS_RESET_SQL = """
+SELECT stats_reset::text AS stats_reset
+FROM pg_stat_database
+WHERE datname = current_database()
+"""
+
+HYPOPG_SQL = "SELECT extversion FROM pg_extension WHERE extname = 'hypopg'"
+
+# ==============================
+# Разбор нормализованных запросов
+# ==============================
+NOT_ALIAS = {
+    'where', 'on', 'join', 'inner', 'left', 'right', 'full', 'cross', 'group', 'order',
+    'limit', 'offset', 'union', 'using', 'natural', 'lateral', 'set', 'having', 'for',
+    'window', 'except', 'intersect', 'returning', 'values', 'select',
+}
+TABLE_REF_RE = re.compile(
+    r'\b(?:from|join|update|into)\s+(?:only\s+)?((?:"[^"]+"|\w+)(?:\.(?:"[^"]+"|\w+))?)'
+    r'(?:\s+(?:as\s+)?(?!(?:' + '|'.join(sorted(NOT_ALIAS)) + r')\b)("[^"]+"|\w+))?'
+)
+PREDICATE_RE = re.compile(
+    r'(?<![\w.])(?:("[^"]+"|\w+)\.)?("[^"]+"|\w+)\s*'
+    r'(=|in|>=|<=|>|<|between|like)\s*(?:\?|\(\.\.\.\))'
+)
+EQUALITY_OPERATORS = {'=', 'in'}
+# Границы предложений: условия ищутся только после WHERE и ON, чтобы не
+# принять присваивание SET или выражение списка выборки за фильтр
+CLAUSE_RE = re.compile(
+    r'"(?:[^"]|"")*"|[()]|\b(where|on|set|select|from|join|using|having|group|order|limit|'
+    r'offset|returning|values|union|intersect|except|window|for|conflict)\b'
+)
+PREDICATE_CLAUSES = {'where', 'on'}
+
+
+def unquote(name):
+    if name.startswith('"') and name.endswith('"'):
+        return name[1:-1].replace('""', '"')
+    return name
+
+
+def predicate_text(normalized):
+    """
+    Текст предложений WHERE и ON нормализованного запроса, включая
+    вложенные подзапросы; остальные части запроса отбрасываются.
+    """
+    parts = []
+    stack = []
+    clause = None
+    position = 0
+    for match in CLAUSE_RE.finditer(normalized):
+        token = match.group()
+        if token.startswith('"'):
+            continue
+        if clause in PREDICATE_CLAUSES:
+            parts.append(normalized[position:match.start()])
+        position = match.end()
+        if token == '(':
+            # Скобка не меняет предложение: и "in (...)", и "(a = ? or b = ?)"
+            stack.append(clause)
+            if clause in PREDICATE_CLAUSES:
+                parts.append('(')
+        elif token == ')':
+            inner = clause
+            clause = stack.pop() if stack else None
+            if inner in PREDICATE_CLAUSES or clause in PREDICATE_CLAUSES:
+                parts.append(')')
+        else:
+            clause = match.group(1)
+            parts.append(' ')
+    if clause in PREDICATE_CLAUSES:
+        parts.append(normalized[position:])
+    return ''.join(parts)
+
+
+def extract_predicates(normalized):
+    """
+    Находит в условиях WHERE/ON нормализованного запроса сравнения вида
+    "алиас.колонка = ?". Возвращает словарь {таблица: [(колонка, оператор), ...]}
+    в порядке появления.
+    """
+    aliases = {}
+    tables = []
+    for match in TABLE_REF_RE.finditer(normalized):
+        table = '.'.join(unquote(part) for part in re.findall(r'"[^"]+"|\w+', match.group(1)))
+        alias = match.group(2)
+        tables.append(table)
+        aliases[table.split('.')[-1]] = table
+        if alias:
+            aliases[unquote(alias)] = table
+
+    result = {}
+    for match in PREDICATE_RE.finditer(predicate_text(normalized)):
+        alias, column, operator = match.group(1), unquote(match.group(2)), match.group(3)
+        if alias:
+            table = aliases.get(unquote(alias))
+        elif len(set(tables)) == 1:
+            table = tables[0]
+        else:
+            table = None
+        if table is None:
+            continue
+        predicates = result.setdefault(table, [])
+        if all(column != c for c, _ in predicates):
+            predicates.append((column, operator))
+    return result
+
+
+def candidate_columns(predicates):
+    """Колонки равенства идут первыми, затем одна колонка диапазона"""
+    equality = [c for c, op in predicates if op in EQUALITY_OPERATORS]
+    ranges = [c for c, op in predicates if op not in EQUALITY_OPERATORS]
+    columns = equality[:MAX_INDEX_COLUMNS]
+    if ranges and len(columns) < MAX_INDEX_COLUMNS:
+        columns.append(ranges[0])
+    return columns
+
+
+def is_covered(columns, indexes):
+    """Проверяет, покрывает ли существующий индекс набор колонок"""
+    for index in indexes:
+        if index['method'] != 'btree' or index['expressions'] or index['predicate']:
+            continue
+        existing = index['columns']
+        if len(existing) < len(columns):
+            continue
+        # Колонки равенства могут идти в любом порядке
+        head = existing[:len(columns)]
+        if head == columns or (set(head) == set(columns) and head[-1] == columns[-1]):
+            return True
+    return False
+
+
+# ==============================
+# Проверка через hypopg
+# ==============================
+def explain_script(example, create_sql):
+    """SQL-скрипт: план без индекса, затем с гипотетическим индексом"""
+    options = 'FORMAT JSON, GENERIC_PLAN' if re.search(r'\$\d', example) else 'FORMAT JSON'
+    statement = example.strip().rstrip(';')
+    return (
+        "SET default_transaction_read_only = on;\n"
+        "\\o /dev/null\n"
+        "SELECT hypopg_reset();\n"
+        "\\o\n"
+        f"EXPLAIN ({options}) {statement}\n;\n"
+        "\\echo ---hypopg---\n"
+        f"SELECT indexname FROM hypopg_create_index({quote_literal(create_sql)});\n"
+        f"EXPLAIN ({options}) {statement}\n;\n"
+        "\\o /dev/null\n"
+        "SELECT hypopg_reset();\n"
+    )
+
+
+def validate_with_hypopg(args, example, create_sql):
+    """
+    Возвращает (стоимость без индекса, стоимость с индексом, используется ли индекс)
+    или None, если запрос проверить нельзя.
+    """
+    if not example or len(example) >= MAX_EXAMPLE_LENGTH:
+        return None
+    # Пример должен быть одним оператором: ';' вне литералов недопустима
+    if ';' in normalize_query(example):
+        return None
+    try:
+        output = run_script(args, explain_script(example, create_sql), timeout=EXPLAIN_TIMEOUT)
+    except PsqlError:
+        # Временные таблицы 1С (tt1, tt2...) в другом сеансе недоступны
+        return None
+
+    before_text, _, after_text = output.partition('---hypopg---')
+    index_name, _, after_plan = after_text.strip().partition('\n')
+    try:
+        before = json.loads(before_text)[0]['Plan']['Total Cost']
+        after = json.loads(after_plan)[0]['Plan']['Total Cost']
+    except (ValueError, LookupError):
+        return None
+    return before, after, index_name.strip() in after_plan
+
+
+# ==============================
+# Анализ
+# ==============================
+def load_fingerprints(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return data.get('queries', [])
+
+
+def find_index_candidates(args, fingerprints, tables, indexes, columns, use_hypopg):
+    """Кандидаты в новые индексы по медленным запросам"""
+    by_name = {}
+    for table in tables:
+        by_name[table['table']] = table
+        by_name[f"{table['schema']}.{table['table']}"] = table
+
+    indexes_by_table = {}
+    for index in indexes:
+        indexes_by_table.setdefault(index['relid'], []).append(index)
+
+    candidates = {}
+    for fp in fingerprints:
+        if args.database_filter and fp.get('databases') and args.dbname not in fp['databases']:
+            continue
+        for table_name, predicates in extract_predicates(fp['query']).items():
+            table = by_name.get(table_name)
+            if table is None:
+                continue
+            known = columns.get(table['relid'], set())
+            predicates = [(c, op) for c, op in predicates if c in known]
+            cols = candidate_columns(predicates)
+            if not cols or is_covered(cols, indexes_by_table.get(table['relid'], [])):
+                continue
+
+            key = (table['relid'], tuple(cols))
+            candidate = candidates.get(key)
+            if candidate is None:
+                qualified = f"{quote_ident(table['schema'])}.{quote_ident(table['table'])}"
+                column_list = ', '.join(quote_ident(c) for c in cols)
+                candidate = candidates[key] = {
+                    'action': 'create',
+                    'table': f"{table['schema']}.{table['table']}",
+                    'columns': cols,
+                    'sql': f'CREATE INDEX CONCURRENTLY ON {qualified} ({column_list});',
+                    'create_sql': f'CREATE INDEX ON {qualified} ({column_list})',
+                    'queries': [],
+                    'query_ms': 0.0,
+                    'saved_ms': 0.0,
+                    'validated': False,
+                    'seq_ratio': table['seq_scan'] / max(table['seq_scan'] + table['idx_scan'], 1),
+                }
+            candidate['queries'].append(fp['fingerprint'])
+            candidate['query_ms'] += fp['total_ms']
+
+            check = validate_with_hypopg(args, fp.get('example', ''), candidate['create_sql']) if use_hypopg else None
+            if check is not None:
+                before, after, used = check
+                candidate['validated'] = True
+                if used and before > 0 and after < before:
+                    candidate['saved_ms'] += fp['total_ms'] * (1 - after / before)
+                    candidate.setdefault('cost', []).append([round(before, 2), round(after, 2)])
+            elif not candidate['validated']:
+                # Без hypopg: доля последовательных чтений таблицы как грубая оценка
+                candidate['saved_ms'] += fp['total_ms'] * 0.5 * candidate['seq_ratio']
+
+    result = []
+    for candidate in candidates.values():
+        if candidate['validated'] and not candidate.get('cost'):
+            # Планировщик не выбрал гипотетический индекс
+            continue
+        candidate['benefit_ms'] = round(candidate.pop('saved_ms'), 1)
+        candidate['query_ms'] = round(candidate['query_ms'], 1)
+        candidate.pop('create_sql')
+        candidate.pop('seq_ratio')
+        result.append(candidate)
+    return result
+
+
+def find_redundant_indexes(tables, indexes):
+    """Дубликаты, индексы-префиксы и неиспользуемые индексы"""
+    writes = {t['relid']: t['writes'] for t in tables}
+    findings = []
+    reported = set()
+
+    def drop(index, reason, kind):
+        if index['indexrelid'] in reported:
+            return
+        reported.add(index['indexrelid'])
+        findings.append({
+            'action': 'drop',
+            'kind': kind,
+            'table': f"{index['schema']}.{index['table']}",
+            'index': index['index'],
+            'size': index['size'],
+            'idx_scan': index['idx_scan'],
+            'reason': reason,
+            'definition': index['definition'],
+            'sql': f"DROP INDEX CONCURRENTLY {quote_ident(index['schema'])}.{quote_ident(index['index'])};",
+            'benefit_ms': round(writes.get(index['relid'], 0) * INDEX_MAINTENANCE_MS, 1),
+        })
+
+    def removable(index):
+        return not (index['is_primary'] or index['is_constraint'])
+
+    by_table = {}
+    for index in indexes:
+        by_table.setdefault(index['relid'], []).append(index)
+
+    for table_indexes in by_table.values():
+        # Точные дубликаты
+        groups = {}
+        for index in table_indexes:
+            key = (index['indkey'], index['indclass'], index['expressions'], index['predicate'], index['method'])
+            groups.setdefault(key, []).append(index)
+        for group in groups.values():
+            if len(group) < 2:
+                continue
+            # Оставляем ограничение или самый используемый индекс
+            group.sort(key=lambda i: (removable(i), -i['idx_scan']))
+            keeper = group[0]
+            for index in group[1:]:
+                if removable(index):
+                    drop(index, f"дубликат индекса {keeper['index']}", 'duplicate')
+
+        # Индекс, колонки которого - префикс другого btree-индекса
+        for index in table_indexes:
+            if not removable(index) or index['is_unique'] or index['expressions'] or index['predicate']:
+                continue
+            if index['method'] != 'btree':
+                continue
+            for other in table_indexes:
+                if other is index or other['method'] != 'btree' or other['predicate']:
+                    continue
+                cols, other_cols = index['columns'], other['columns']
+                if len(cols) < len(other_cols) and other_cols[:len(cols)] == cols:
+                    drop(index, f"колонки являются префиксом индекса {other['index']}", 'redundant')
+                    break
+
+    # Неиспользуемые индексы
+    for index in indexes:
+        if index['idx_scan'] == 0 and removable(index) and not index['is_unique'] \
+                and index['size'] >= MIN_UNUSED_INDEX_SIZE:
+            drop(index, "не использовался с момента сброса статистики", 'unused')
+
+    # Невалидные индексы (прерванный CREATE INDEX CONCURRENTLY)
+    for index in indexes:
+        if not index['is_valid'] and removable(index):
+            drop(index, "индекс невалиден (прерванное построение)", 'invalid')
+
+    return findings
+
+
+def find_seq_scan_tables(tables):
+    """Большие таблицы, которые в основном читаются последовательно"""
+    result = []
+    for table in tables:
+        if table['n_live_tup'] < MIN_TABLE_ROWS or not table['seq_scan']:
+            continue
+        rows_per_scan = table['seq_tup_read'] / table['seq_scan']
+        if rows_per_scan < MIN_ROWS_PER_SEQ_SCAN or table['seq_scan'] <= table['idx_scan']:
+            continue
+        result.append({
+            'table': f"{table['schema']}.{table['table']}",
+            'seq_scan': table['seq_scan'],
+            'idx_scan': table['idx_scan'],
+            'seq_tup_read': table['seq_tup_read'],
+            'rows_per_scan': round(rows_per_scan),
+            'n_live_tup': table['n_live_tup'],
+            'size': table['size'],
+        })
+    result.sort(key=lambda t: t['seq_tup_read'], reverse=True)
+    return result
+
+
+# ==============================
+# Отчёт
+# ==============================
+def print_report(recommendations, seq_tables, stats_reset, use_hypopg, limit):
+    print("=" * 60)
+    print("РЕКОМЕНДАЦИИ ПО ИНДЕКСАМ")
+    print("=" * 60)
+    print(f"Статистика собирается с: {stats_reset or 'неизвестно'}")
+    if not use_hypopg:
+        print("ℹ️  Расширение hypopg не установлено - кандидаты не проверены EXPLAIN,")
+        print("   выигрыш оценён по доле последовательных чтений таблицы.")
+    print()
+
+    if not recommendations:
+        print("✓ Рекомендаций нет")
+    for number, item in enumerate(recommendations[:limit], 1):
+        if item['action'] == 'create':
+            mark = "✅ проверено EXPLAIN" if item['validated'] else "≈ оценка"
+            print(f"{number}. ➕ {item['table']} ({', '.join(item['columns'])})  "
+                  f"выигрыш ~{item['benefit_ms']:.0f} мс [{mark}]")
+            print(f"   запросов: {len(item['queries'])}, их суммарное время: {item['query_ms']:.0f} мс")
+        else:
+            print(f"{number}. ➖ {item['table']}.{item['index']}  "
+                  f"размер {format_bytes(item['size'])}, выигрыш на записи ~{item['benefit_ms']:.0f} мс")
+            print(f"   причина: {item['reason']}")
+        print(f"   {item['sql']}")
+        print()
+
+    if seq_tables:
+        print("Таблицы с тяжёлыми последовательными чтениями:")
+        for table in seq_tables[:limit]:
+            print(f"  {table['table']:<50} seq_scan={table['seq_scan']:<8} idx_scan={table['idx_scan']:<8} "
+                  f"строк за скан≈{table['rows_per_scan']:<8} размер {format_bytes(table['size'])}")
+
+
+def write_sql(recommendations, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("-- Рекомендации pg_index_advisor.py. Перед применением проверьте каждую команду.\n")
+        f.write("-- CONCURRENTLY нельзя выполнять внутри транзакции.\n\n")
+        for item in recommendations:
+            if item['action'] == 'create':
+                f.write(f"-- выигрыш ~{item['benefit_ms']:.0f} мс, запросы: {', '.join(item['queries'])}\n")
+            else:
+                f.write(f"-- {item['reason']}: {item['definition']}\n")
+            f.write(f"{item['sql']}\n\n")
+
+
+# ==============================
+# Основной скрипт
+# ==============================
+def main():
+    parser = argparse.ArgumentParser(description="Советник по индексам на основе статистики нагрузки")
+    add_connection_arguments(parser)
+    parser.add_argument('--queries', metavar='FILE', help="JSON с отпечатками запросов (pg_log_analyzer.py --json)")
+    parser.add_argument('--all-databases', dest='database_filter', action='store_false',
+                        help="учитывать запросы из журналов всех баз, а не только --dbname")
+    parser.add_argument('--no-hypopg', action='store_true', help="не проверять кандидатов через hypopg")
+    parser.add_argument('--top', type=int, default=30, help="сколько рекомендаций показать")
+    parser.add_argument('--json', metavar='FILE', help="сохранить рекомендации в JSON")
+    parser.add_argument('--sql', metavar='FILE', help="сохранить команды в SQL-скрипт")
+    args = parser.parse_args()
+
+    try:
+        tables = query(args, TABLES_SQL)
+        indexes = query(args, INDEXES_SQL)
+        stats_reset = (query(args, STATS_RESET_SQL) or [{}])[0].get('stats_reset')
+        use_hypopg = not args.no_hypopg and bool(query(args, HYPOPG_SQL))
+
+        recommendations = []
+        if args.queries:
+            columns = {}
+            for row in query(args, COLUMNS_SQL):
+                columns.setdefault(row['relid'], set()).add(row['column'])
+            fingerprints = load_fingerprints(args.queries)
+            recommendations += find_index_candidates(args, fingerprints, tables, indexes, columns, use_hypopg)
+    except PsqlError as e:
+        print(f"❌ Ошибка запроса к базе: {e}", file=sys.stderr)
+        return 1
+
+    recommendations += find_redundant_indexes(tables, indexes)
+    recommendations.sort(key=lambda item: item['benefit_ms'], reverse=True)
+    seq_tables = find_seq_scan_tables(tables)
+
+    print_report(recommendations, seq_tables, stats_reset, use_hypopg, args.top)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'stats_reset': stats_reset, 'recommendations': recommendations,
+                       'seq_scan_tables': seq_tables}, f, ensure_ascii=False, indent=2)
+        print(f"\n📄 Рекомендации сохранены: {args.json}")
+    if args.sql:
+        write_sql(recommendations, args.sql)
+        print(f"📄 SQL-скрипт сохранён: {args.sql}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,504 @@
+#!/usr/bin/env python3
+"""
+Потоковый анализатор журналов PostgreSQL (csvlog или stderr).
+
+Нормализует SQL (литералы заменяются на ?), группирует запросы по отпечатку
+и строит гистограмму длительностей (p50/p95/max). Файл читается построчно,
+поэтому расход памяти зависит от числа различных запросов, а не от размера
+журнала. Умеет следить за растущим журналом (--follow), в том числе за
+каталогом log/ с ротацией файлов.
+
+Примеры:
+    python3 pg_log_analyzer.py /var/lib/postgresql/data/log/*.csv
+    python3 pg_log_analyzer.py --follow /var/lib/postgresql/data/log --top 20
+    python3 pg_log_analyzer.py postgresql.log --json slow_queries.json
+"""
+
+import argparse
+import csv
+import gzip
+import hashlib
+import json
+import math
+import os
+import re
+import sys
+import time
+from pathlib import Path
+
+# ==============================
+# Настройки
+# ==============================
+# Номера колонок csvlog (PostgreSQL 13+)
+CSV_SEVERITY = 11
+CSV_MESSAGE = 13
+CSV_DATABASE = 2
+
+# Максимальная длина сохраняемого примера запроса
+MAX_EXAMPLE_LENGTH = 4000
+
+# Шаг гистограммы: 8 корзин на каждое удвоение (погрешность квантилей ~9%)
+BUCKETS_PER_OCTAVE = 8
+
+SORT_KEYS = ('total', 'count', 'mean', 'p95', 'max')
+
+# ==============================
+# Регулярные выражения
+# ==============================
+DURATION_RE = re.compile(
+    r'^duration: ([\d.]+) ms\s+'
+    r'(?:statement|execute [^:]*|parse [^:]*|bind [^:]*|fastpath function call): ?(.*)$',
+    re.S
+)
+AUTOVACUUM_RE = re.compile(
+    r'^automatic (?:aggressive )?(vacuum|analyze)(?: to prevent wraparound)? of table "([^"]+)"'
+)
+ELAPSED_RE = re.compile(r'elapsed: ([\d.]+) s')
+CHECKPOINT_RE = re.compile(r'^(?:checkpoint|restartpoint) complete: wrote (\d+) buffers')
+CHECKPOINT_TOTAL_RE = re.compile(r'total=([\d.]+) s')
+
+# Начало записи в stderr-журнале: "<префикс> LOG:  сообщение"
+STDERR_ENTRY_RE = re.compile(
+    r'^(?P<prefix>.*?)\b(?P<severity>LOG|ERROR|WARNING|FATAL|PANIC|DETAIL|HINT|'
+    r'STATEMENT|CONTEXT|NOTICE|INFO|DEBUG\d?):  (?P<message>.*)$',
+    re.S
+)
+# "%u@%d" из log_line_prefix
+STDERR_DATABASE_RE = re.compile(r'\S*@(\S+)\s*$')
+
+TOKEN_RE = re.compile(r"""
+    (?P<comment>--[^\n]*|/\*.*?\*/)
+  | (?P<dollar>\$(?P<tag>(?:[A-Za-z_]\w*)?)\$.*?\$(?P=tag)\$)
+  | (?P<estring>(?<!\w)[Ee]'(?:[^'\\]|\\.|'')*')
+  | (?P<string>(?<!\w)[BbXxNn]?'(?:[^']|'')*')
+  | (?P<ident>"(?:[^"]|"")*")
+  | (?P<param>\$\d+)
+  | (?P<word>[^\W\d][\w$]*)
+  | (?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+  | (?P<operator>[<>=!~+\-*/%^|&#@:]+)
+  | (?P<space>\s+)
+  | (?P<other>.)
+""", re.S | re.X)
+
+IN_LIST_RE = re.compile(r'\bin \(\?(?:, \?)*\)')
+VALUES_RE = re.compile(r'\bvalues \(\?(?:, \?)*\)(?:, \(\?(?:, \?)*\))*')
+
+
+# ==============================
+# Нормализация SQL
+# ==============================
+def normalize_query(sql):
+    """Убирает из SQL литералы, комментарии и форматирование"""
+    tokens = []
+    for match in TOKEN_RE.finditer(sql):
+        kind = match.lastgroup
+        if kind in ('comment', 'space'):
+            continue
+        if kind in ('dollar', 'estring', 'string', 'param', 'number'):
+            tokens.append('?')
+        elif kind == 'word':
+            tokens.append(match.group().lower())
+        else:
+            tokens.append(match.group())
+
+    normalized = ' '.join(tokens)
+    normalized = normalized.replace('( ', '(').replace(' )', ')')
+    normalized = normalized.replace(' ,', ',').replace(' . ', '.')
+    normalized = normalized.rstrip('; ')
+    normalized = IN_LIST_RE.sub('in (...)', normalized)
+    normalized = VALUES_RE.sub('values (...)', normalized)
+    return normalized
+
+
+def fingerprint(normalized):
+    """Короткий отпечаток нормализованного запроса"""
+    return hashlib.md5(normalized.encode('utf-8')).hexdigest()[:16]
+
+
+# ==============================
+# Статистика
+# ==============================
+class DurationHistogram:
+    """Логарифмическая гистограмма длительностей с ограниченным числом корзин"""
+
+    __slots__ = ('buckets', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        index = math.floor(math.log2(value) * BUCKETS_PER_OCTAVE) if value > 0 else None
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """Оценка квантиля по серединам корзин"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index in sorted(self.buckets, key=lambda i: -math.inf if i is None else i):
+            seen += self.buckets[index]
+            if seen >= rank:
+                if index is None:
+                    return 0.0
+                middle = 2 ** ((index + 0.5) / BUCKETS_PER_OCTAVE)
+                return min(middle, self.max)
+        return self.max
+
+
+class QueryStats:
+    """Накопленная статистика по одной форме запроса"""
+
+    __slots__ = ('query', 'example', 'example_ms', 'histogram', 'databases')
+
+    def __init__(self, query):
+        self.query = query
+        self.example = ''
+        self.example_ms = -1.0
+        self.histogram = DurationHistogram()
+        self.databases = {}
+
+    def add(self, duration, sql, database):
+        self.histogram.add(duration)
+        # Храним самый медленный пример - его удобно передавать в EXPLAIN
+        if duration > self.example_ms:
+            self.example_ms = duration
+            self.example = sql[:MAX_EXAMPLE_LENGTH]
+        if database:
+            self.databases[database] = self.databases.get(database, 0) + 1
+
+    def to_dict(self, fp):
+        h = self.histogram
+        return {
+            'fingerprint': fp,
+            'query': self.query,
+            'example': self.example,
+            'calls': h.count,
+            'total_ms': round(h.total, 3),
+            'mean_ms': round(h.total / h.count, 3) if h.count else 0.0,
+            'p50_ms': round(h.quantile(0.50), 3),
+            'p95_ms': round(h.quantile(0.95), 3),
+            'max_ms': round(h.max, 3),
+            'databases': self.databases,
+        }
+
+
+class LogAnalyzer:
+    """Агрегатор событий журнала"""
+
+    def __init__(self, min_duration=0.0):
+        self.min_duration = min_duration
+        self.queries = {}
+        self.autovacuum = {}
+        self.checkpoints = DurationHistogram()
+        self.checkpoint_buffers = 0
+        self.entries = 0
+
+    def feed(self, severity, message, database=''):
+        """Обрабатывает одну запись журнала"""
+        self.entries += 1
+        if severity != 'LOG':
+            return
+
+        match = DURATION_RE.match(message)
+        if match:
+            duration = float(match.group(1))
+            if duration < self.min_duration:
+                return
+            sql = match.group(2).strip()
+            normalized = normalize_query(sql)
+            fp = fingerprint(normalized)
+            stats = self.queries.get(fp)
+            if stats is None:
+                stats = self.queries[fp] = QueryStats(normalized)
+            stats.add(duration, sql, database)
+            return
+
+        match = AUTOVACUUM_RE.match(message)
+        if match:
+            kind, table = match.groups()
+            elapsed = ELAPSED_RE.search(message)
+            key = (table, kind)
+            if key not in self.autovacuum:
+                self.autovacuum[key] = DurationHistogram()
+            self.autovacuum[key].add(float(elapsed.group(1)) if elapsed else 0.0)
+            return
+
+        match = CHECKPOINT_RE.match(message)
+        if match:
+            total = CHECKPOINT_TOTAL_RE.search(message)
+            self.checkpoints.add(float(total.group(1)) if total else 0.0)
+            self.checkpoint_buffers += int(match.group(1))
+
+    def top(self, sort='total', limit=20):
+        """Возвращает самые тяжёлые запросы"""
+        keys = {
+            'total': lambda s: s.histogram.total,
+            'count': lambda s: s.histogram.count,
+            'mean': lambda s: s.histogram.total / s.histogram.count,
+            'p95': lambda s: s.histogram.quantile(0.95),
+            'max': lambda s: s.histogram.max,
+        }
+        items = sorted(self.queries.items(), key=lambda kv: keys[sort](kv[1]), reverse=True)
+        return items[:limit] if limit else items
+
+    def to_dict(self, sort='total', limit=0):
+        return {
+            'generated': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'entries': self.entries,
+            'queries': [stats.to_dict(fp) for fp, stats in self.top(sort, limit)],
+            'autovacuum': [
+                {
+                    'table': table,
+                    'kind': kind,
+                    'runs': h.count,
+                    'total_s': round(h.total, 3),
+                    'max_s': round(h.max, 3),
+                }
+                for (table, kind), h in sorted(self.autovacuum.items())
+            ],
+            'checkpoints': {
+                'count': self.checkpoints.count,
+                'buffers_written': self.checkpoint_buffers,
+                'total_s': round(self.checkpoints.total, 3),
+                'max_s': round(self.checkpoints.max, 3),
+            },
+        }
+
+
+# ==============================
+# Чтение журналов
+# ==============================
+def open_log(path):
+    """Открывает журнал (в том числе сжатый gzip) для построчного чтения"""
+    if path == '-':
+        return sys.stdin
+    if str(path).endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', errors='replace', newline='')
+    return open(path, 'r', encoding='utf-8', errors='replace', newline='')
+
+
+def detect_format(path):
+    """Определяет формат журнала по расширению"""
+    name = str(path)
+    if name.endswith('.gz'):
+        name = name[:-3]
+    return 'csv' if name.endswith('.csv') else 'stderr'
+
+
+def parse_csvlog(lines):
+    """Разбирает csvlog; многострочные записи обрабатывает модуль csv"""
+    for row in csv.reader(lines):
+        if len(row) <= CSV_MESSAGE:
+            continue
+        yield row[CSV_SEVERITY], row[CSV_MESSAGE], row[CSV_DATABASE]
+
+
+def parse_stderr(lines):
+    """Разбирает stderr-журнал; строки продолжения начинаются с табуляции"""
+    severity = message = database = None
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if line.startswith('\t') and severity is not None:
+            message += '\n' + line[1:]
+            continue
+        match = STDERR_ENTRY_RE.match(line)
+        if not match:
+            continue
+        if severity is not None:
+            yield severity, message, database
+        severity = match.group('severity')
+        message = match.group('message')
+        prefix_db = STDERR_DATABASE_RE.search(match.group('prefix'))
+        database = prefix_db.group(1) if prefix_db else ''
+    if severity is not None:
+        yield severity, message, database
+
+
+def parse_lines(lines, log_format):
+    if log_format == 'csv':
+        return parse_csvlog(lines)
+    return parse_stderr(lines)
+
+
+def newest_log(directory, log_format):
+    """Последний по времени изменения журнал в каталоге"""
+    patterns = ('*.csv',) if log_format == 'csv' else ('*.log',)
+    if log_format == 'auto':
+        patterns = ('*.csv', '*.log')
+    for pattern in patterns:
+        files = sorted(Path(directory).glob(pattern), key=lambda p: p.stat().st_mtime)
+        if files:
+            return files[-1]
+    return None
+
+
+def follow_lines(path, log_format, interval=1.0, from_start=False, on_idle=None):
+    """
+    Бесконечный генератор строк растущего журнала (аналог tail -F).
+    Отслеживает ротацию: усечение, замену файла и появление нового
+    файла в каталоге журналов. on_idle вызывается после каждой паузы
+    без новых строк: генератор в это время ничего не выдаёт.
+    """
+    directory = path if os.path.isdir(path) else None
+    current = newest_log(directory, log_format) if directory else Path(path)
+    while current is None or not current.exists():
+        time.sleep(interval)
+        if on_idle:
+            on_idle()
+        current = newest_log(directory, log_format) if directory else Path(path)
+
+    handle = open_log(current)
+    if not from_start:
+        handle.seek(0, os.SEEK_END)
+    inode = os.fstat(handle.fileno()).st_ino
+    pending = ''
+
+    while True:
+        chunk = handle.readline()
+        if chunk:
+            pending += chunk
+            if pending.endswith('\n'):
+                yield pending
+                pending = ''
+            continue
+
+        time.sleep(interval)
+        if on_idle:
+            on_idle()
+
+        # Проверяем ротацию
+        replacement = None
+        if directory:
+            newest = newest_log(directory, log_format)
+            if newest is not None and newest != current:
+                replacement = newest
+        else:
+            try:
+                stat = os.stat(current)
+                if stat.st_ino != inode or stat.st_size < handle.tell():
+                    replacement = current
+            except FileNotFoundError:
+                continue
+
+        if replacement is not None:
+            handle.close()
+            current = replacement
+            handle = open_log(current)
+            inode = os.fstat(handle.fileno()).st_ino
+            pending = ''
+
+
+# ==============================
+# Отчёт
+# ==============================
+def format_report(analyzer, sort='total', limit=20, width=100):
+    lines = []
+    lines.append(f"Записей журнала: {analyzer.entries}, различных запросов: {len(analyzer.queries)}")
+    lines.append("")
+    lines.append(f"{'отпечаток':<16} {'вызовов':>8} {'всего, мс':>12} {'p50':>9} {'p95':>9} {'max':>9}  запрос")
+    for fp, stats in analyzer.top(sort, limit):
+        h = stats.histogram
+        query = stats.query if len(stats.query) <= width else stats.query[:width - 3] + '...'
+        lines.append(
+            f"{fp:<16} {h.count:>8} {h.total:>12.1f} {h.quantile(0.5):>9.1f} "
+            f"{h.quantile(0.95):>9.1f} {h.max:>9.1f}  {query}"
+        )
+
+    if analyzer.autovacuum:
+        lines.append("")
+        lines.append("Автовакуум:")
+        busiest = sorted(analyzer.autovacuum.items(), key=lambda kv: kv[1].total, reverse=True)
+        for (table, kind), h in busiest[:limit]:
+            lines.append(f"  {kind:<8} {table:<50} запусков: {h.count:>5}  всего: {h.total:.1f} с  max: {h.max:.1f} с")
+
+    if analyzer.checkpoints.count:
+        cp = analyzer.checkpoints
+        lines.append("")
+        lines.append(
+            f"Контрольные точки: {cp.count}, записано буферов: {analyzer.checkpoint_buffers}, "
+            f"среднее время: {cp.total / cp.count:.1f} с, max: {cp.max:.1f} с"
+        )
+    return '\n'.join(lines)
+
+
+def write_json(analyzer, path, sort):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(analyzer.to_dict(sort), f, ensure_ascii=False, indent=2)
+
+
+# ==============================
+# Основной скрипт
+# ==============================
+def main():
+    parser = argparse.ArgumentParser(description="Анализ медленных запросов в журналах PostgreSQL")
+    parser.add_argument('paths', nargs='+', help="файлы журналов, '-' для stdin или каталог для --follow")
+    parser.add_argument('--format', choices=('auto', 'csv', 'stderr'), default='auto',
+                        help="формат журнала (по умолчанию - по расширению)")
+    parser.add_argument('--top', type=int, default=20, help="сколько запросов показать")
+    parser.add_argument('--sort', choices=SORT_KEYS, default='total', help="порядок сортировки")
+    parser.add_argument('--min-duration', type=float, default=0.0, help="порог длительности, мс")
+    parser.add_argument('--json', metavar='FILE', help="сохранить результат в JSON")
+    parser.add_argument('--follow', action='store_true', help="следить за растущим журналом")
+    parser.add_argument('--from-start', action='store_true', help="в режиме --follow читать файл с начала")
+    parser.add_argument('--interval', type=float, default=1.0, help="период опроса файла, с")
+    parser.add_argument('--report-every', type=float, default=30.0, help="период вывода отчёта в --follow, с")
+    args = parser.parse_args()
+
+    # Запросы 1С бывают очень длинными
+    csv.field_size_limit(min(sys.maxsize, 2 ** 31 - 1))
+    analyzer = LogAnalyzer(min_duration=args.min_duration)
+
+    if args.follow:
+        if len(args.paths) != 1:
+            parser.error("--follow принимает один файл или каталог")
+        path = args.paths[0]
+        log_format = args.format
+        if log_format == 'auto' and not os.path.isdir(path):
+            log_format = detect_format(path)
+        # В каталоге csvlog пишет .csv, а stderr - .log
+        parse_format = log_format if log_format != 'auto' else 'csv'
+        if log_format == 'auto' and newest_log(path, 'csv') is None:
+            parse_format = 'stderr'
+
+        print(f"Слежение за {path} (Ctrl+C для остановки)...")
+        last_report = time.monotonic()
+
+        def report_if_due():
+            # Вызывается и после записей, и в паузах: тихий журнал тоже получает отчёт
+            nonlocal last_report
+            if time.monotonic() - last_report >= args.report_every:
+                print(format_report(analyzer, args.sort, args.top))
+                print(flush=True)
+                last_report = time.monotonic()
+
+        try:
+            lines = follow_lines(path, log_format, args.interval, args.from_start, on_idle=report_if_due)
+            for severity, message, database in parse_lines(lines, parse_format):
+                analyzer.feed(severity, message, database)
+                report_if_due()
+        except KeyboardInterrupt:
+            pass
+    else:
+        for path in args.paths:
+            log_format = args.format if args.format != 'auto' else detect_format(path)
+            with open_log(path) as f:
+                for severity, message, database in parse_lines(f, log_format):
+                    analyzer.feed(severity, message, database)
+
+    print(format_report(analyzer, args.sort, args.top))
+    if args.json:
+        write_json(analyzer, args.json, args.sort)
+        print(f"\n📄 Результат сохранён: {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Мониторинг отставания реплики postgres-1c-replica.
+
+С основного сервера читается pg_stat_replication (отставание записи,
+сброса на диск и применения WAL в байтах и секундах) и pg_replication_slots
+(сколько WAL удерживает слот). Если задано подключение к реплике, с неё
+дополнительно читается позиция приёма и применения WAL.
+
+Код возврата 2 означает превышение порогов --max-lag-bytes/--max-lag-seconds,
+поэтому скрипт можно вызывать из cron или системы мониторинга.
+
+Примеры:
+    python3 pg_replication_lag.py --container --replica-container
+    python3 pg_replication_lag.py -H localhost --replica-port 5433 --watch 5
+"""
+
+import argparse
+import copy
+import json
+import sys
+import time
+
+from pg_common import PsqlError, add_connection_arguments, query, format_bytes
+
+# ==============================
+# Настройки
+# ==============================
+DEFAULT_REPLICA_CONTAINER = "postgres-1c-replica"
+MAX_LAG_BYTES = 64 * 1024 * 1024
+MAX_LAG_SECONDS = 60.0
+
+# ==============================
+# SQL
+# ==============================
+PRIMARY_SQL = """
+SELECT application_name,
+       client_addr::text AS client_addr,
+       state,
+       sync_state,
+       pg_wal_lsn_diff(pg_current_wal_lsn(), sent_lsn)::bigint AS sent_lag_bytes,
+       pg_wal_lsn_diff(pg_current_wal_lsn(), write_lsn)::bigint AS write_lag_bytes,
+       pg_wal_lsn_diff(pg_current_wal_lsn(), flush_lsn)::bigint AS flush_lag_bytes,
+       pg_wal_lsn_diff(pg_current_wal_lsn(), replay_lsn)::bigint AS replay_lag_bytes,
+       extract(epoch FROM write_lag) AS write_lag_seconds,
+       extract(epoch FROM flush_lag) AS flush_lag_seconds,
+       extract(epoch FROM replay_lag) AS replay_lag_seconds
+FROM pg_stat_replication
+ORDER BY application_name
+"""
+
+SLOTS_SQL = """
+SELECT slot_name,
+       active,
+       wal_status,
+       pg_wal_lsn_diff(pg_current_wal_lsn(), restart_lsn)::bigint AS retained_bytes
+FROM pg_replication_slots
+ORDER BY slot_name
+"""
+
+REPLICA_SQL = """
+SELECT pg_is_in_recovery() AS in_recovery,
+       pg_wal_lsn_diff(pg_last_wal_receive_lsn(), pg_last_wal_replay_lsn())::bigint AS replay_lag_bytes,
+       CASE
+           WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+           ELSE extract(epoch FROM now() - pg_last_xact_replay_timestamp())
+       END AS replay_lag_seconds,
+       pg_last_xact_replay_timestamp()::text AS last_replay,
+       (SELECT status FROM pg_stat_wal_receiver) AS receiver_status
+"""
+
+
+def collect(args, replica_args):
+    """Снимает показатели с основного сервера и реплики"""
+    result = {
+        'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'standbys': query(args, PRIMARY_SQL),
+        'slots': query(args, SLOTS_SQL),
+        'replica': None,
+    }
+    if replica_args is not None:
+        try:
+            result['replica'] = query(replica_args, REPLICA_SQL)[0]
+        except PsqlError as e:
+            result['replica'] = {'error': str(e)}
+    return result
+
+
+def check_thresholds(snapshot, max_bytes, max_seconds):
+    """Список нарушений порогов"""
+    problems = []
+    if not snapshot['standbys']:
+        problems.append("к основному серверу не подключена ни одна реплика")
+    for standby in snapshot['standbys']:
+        name = standby['application_name'] or standby['client_addr']
+        if (standby['replay_lag_bytes'] or 0) > max_bytes:
+            problems.append(f"{name}: отставание {format_bytes(standby['replay_lag_bytes'])}")
+        if (standby['replay_lag_seconds'] or 0) > max_seconds:
+            problems.append(f"{name}: отставание {standby['replay_lag_seconds']:.1f} с")
+    for slot in snapshot['slots']:
+        if not slot['active']:
+            problems.append(f"слот {slot['slot_name']} неактивен, удерживает "
+                            f"{format_bytes(slot['retained_bytes'])} WAL")
+    replica = snapshot['replica']
+    if replica:
+        if 'error' in replica:
+            problems.append(f"реплика недоступна: {replica['error']}")
+        elif not replica['in_recovery']:
+            problems.append("реплика не в режиме восстановления (была повышена?)")
+        elif (replica['replay_lag_seconds'] or 0) > max_seconds:
+            problems.append(f"реплика: применение WAL отстаёт на {replica['replay_lag_seconds']:.1f} с")
+    return problems
+
+
+def print_snapshot(snapshot, problems):
+    print(f"[{snapshot['time']}]")
+    for standby in snapshot['standbys']:
+        seconds = standby['replay_lag_seconds']
+        print(f"  {standby['application_name'] or '-':<20} {standby['client_addr'] or 'local':<16} "
+              f"{standby['state']:<10} применение: {format_bytes(standby['replay_lag_bytes']):>10}"
+              f"{'' if seconds is None else f' / {seconds:.2f} с'}")
+    for slot in snapshot['slots']:
+        print(f"  слот {slot['slot_name']:<20} {'активен' if slot['active'] else 'неактивен':<10} "
+              f"удерживает WAL: {format_bytes(slot['retained_bytes'])}")
+    replica = snapshot['replica']
+    if replica and 'error' not in replica:
+        print(f"  реплика: приём/применение {format_bytes(replica['replay_lag_bytes'])}, "
+              f"{replica['replay_lag_seconds'] or 0:.2f} с, wal receiver: {replica['receiver_status']}")
+    for problem in problems:
+        print(f"  ⚠️  {problem}")
+    if not problems:
+        print("  ✅ Отставание в пределах нормы")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Отставание потоковой реплики")
+    add_connection_arguments(parser)
+    parser.set_defaults(dbname='postgres')
+    replica = parser.add_argument_group("реплика")
+    replica.add_argument('--replica-host', help="адрес реплики")
+    replica.add_argument('--replica-port', type=int, help="порт реплики (в docker-compose - 5433)")
+    replica.add_argument('--replica-container', nargs='?', const=DEFAULT_REPLICA_CONTAINER,
+                         help=f"контейнер реплики (по умолчанию {DEFAULT_REPLICA_CONTAINER})")
+    parser.add_argument('--max-lag-bytes', type=int, default=MAX_LAG_BYTES, help="порог отставания, байт")
+    parser.add_argument('--max-lag-seconds', type=float, default=MAX_LAG_SECONDS, help="порог отставания, с")
+    parser.add_argument('--watch', type=float, metavar='SECONDS', help="повторять замер с интервалом")
+    parser.add_argument('--json', action='store_true', help="выводить JSON (одна строка на замер)")
+    args = parser.parse_args()
+
+    replica_args = None
+    if args.replica_host or args.replica_port or args.replica_container:
+        replica_args = copy.copy(args)
+        replica_args.host = args.replica_host or args.host
+        replica_args.port = args.replica_port or args.port
+        replica_args.container = args.replica_container
+
+    status = 0
+    while True:
+        try:
+            snapshot = collect(args, replica_args)
+        except PsqlError as e:
+            print(f"❌ Ошибка запроса к основному серверу: {e}", file=sys.stderr)
+            status = 1
+        else:
+            problems = check_thresholds(snapshot, args.max_lag_bytes, args.max_lag_seconds)
+            status = 2 if problems else 0
+            if args.json:
+                snapshot['problems'] = problems
+                print(json.dumps(snapshot, ensure_ascii=False), flush=True)
+            else:
+                print_snapshot(snapshot, problems)
+        if not args.watch:
+            return status
+        try:
+            time.sleep(args.watch)
+        except KeyboardInterrupt:
+            return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
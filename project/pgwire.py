@@ -0,0 +1,591 @@
+#!/usr/bin/env python3
+"""
+Асинхронный клиент протокола PostgreSQL (frontend/backend, версия 3.0)
+на чистом asyncio, без psql и сторонних библиотек.
+
+Поддерживается:
+  - аутентификация trust, password, md5 и SCRAM-SHA-256 (как в pg_hba.conf);
+  - простой протокол (query) - несколько команд в одной строке;
+  - расширенный протокол (execute/fetch) - параметры $1, $2... без
+    подстановки в текст запроса;
+  - конвейер: одновременные вызовы execute() на одном соединении
+    отправляются без ожидания ответа на предыдущий, а pipeline()
+    отправляет пачку команд с одним Sync (одна неявная транзакция);
+  - время ответа каждой команды (Result.elapsed) и CancelRequest.
+SSL не поддерживается: сервер в docker-compose слушает без SSL.
+
+Пример:
+    async with await connect(host='localhost', user='postgres', password='...') as conn:
+        await conn.execute("CREATE TABLE t (id int, name text)")
+        await conn.execute("INSERT INTO t VALUES ($1, $2)", 1, 'один')
+        rows = await conn.fetch("SELECT * FROM t WHERE id = $1", 1)
+
+Из командной строки - замер задержки запросов:
+    PGPASSWORD=... python3 pgwire.py -H localhost -c "SELECT 1" -n 1000 --concurrency 16
+"""
+
+import argparse
+import asyncio
+import base64
+import collections
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import statistics
+import struct
+import sys
+import time
+from decimal import Decimal
+
+# ==============================
+# Константы протокола
+# ==============================
+PROTOCOL_VERSION = 196608  # 3.0
+CANCEL_REQUEST_CODE = 80877102
+
+AUTH_OK = 0
+AUTH_CLEARTEXT = 3
+AUTH_MD5 = 5
+AUTH_SASL = 10
+AUTH_SASL_CONTINUE = 11
+AUTH_SASL_FINAL = 12
+
+SCRAM_MECHANISM = 'SCRAM-SHA-256'
+
+# Преобразование значений в текстовом формате по OID типа
+DECODERS = {
+    16: lambda v: v == 't',                     # bool
+    17: lambda v: bytes.fromhex(v[2:]),         # bytea (формат hex)
+    20: int, 21: int, 23: int, 26: int,         # int8, int2, int4, oid
+    700: float, 701: float,                     # float4, float8
+    1700: Decimal,                              # numeric
+}
+
+
+class PgError(Exception):
+    """Ошибка, которую вернул сервер (ErrorResponse)"""
+
+    def __init__(self, fields):
+        self.fields = fields
+        self.severity = fields.get('V') or fields.get('S')
+        self.code = fields.get('C')
+        self.message = fields.get('M', '')
+        self.detail = fields.get('D')
+        super().__init__(f"{self.severity}: {self.message} ({self.code})")
+
+
+class ProtocolError(Exception):
+    """Нарушение протокола, неподдерживаемый метод входа или обрыв соединения"""
+
+
+class Result:
+    """Результат одной команды"""
+
+    # elapsed - время выполнения на сервере с задержкой сети, без ожидания
+    # за предыдущими командами конвейера
+    __slots__ = ('columns', 'types', 'rows', 'status', 'elapsed')
+
+    def __init__(self, columns=(), types=()):
+        self.columns = list(columns)
+        self.types = list(types)
+        self.rows = []
+        self.status = ''
+        self.elapsed = None
+
+    @property
+    def rowcount(self):
+        """Число строк из тега команды (INSERT 0 5 -> 5)"""
+        tail = self.status.rsplit(' ', 1)[-1]
+        return int(tail) if tail.isdigit() else None
+
+    def __repr__(self):
+        return f"<Result {self.status!r} rows={len(self.rows)}>"
+
+
+# ==============================
+# Сообщения
+# ==============================
+def _message(kind, payload=b''):
+    return kind + struct.pack('!I', len(payload) + 4) + payload
+
+
+def _cstr(value):
+    return value.encode('utf-8') + b'\0'
+
+
+def _fields(payload):
+    """Поля ErrorResponse/NoticeResponse: {'S': 'ERROR', 'C': '42P01', ...}"""
+    fields = {}
+    for item in payload.split(b'\0'):
+        if item:
+            fields[chr(item[0])] = item[1:].decode('utf-8', 'replace')
+    return fields
+
+
+def _encode_param(value):
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return b't' if value else b'f'
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return b'\\x' + bytes(value).hex().encode()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False).encode('utf-8')
+    return str(value).encode('utf-8')
+
+
+def _extended(sql, params):
+    """Parse/Bind/Describe/Execute для безымянного оператора и портала"""
+    parts = [_message(b'P', b'\0' + _cstr(sql) + struct.pack('!H', 0))]
+    bind = [b'\0\0', struct.pack('!HH', 0, len(params))]
+    for value in params:
+        data = _encode_param(value)
+        if data is None:
+            bind.append(struct.pack('!i', -1))
+        else:
+            bind.append(struct.pack('!i', len(data)) + data)
+    bind.append(struct.pack('!H', 0))
+    parts.append(_message(b'B', b''.join(bind)))
+    parts.append(_message(b'D', b'P\0'))
+    parts.append(_message(b'E', b'\0' + struct.pack('!I', 0)))
+    return b''.join(parts)
+
+
+SYNC = _message(b'S')
+TERMINATE = _message(b'X')
+
+
+async def _read_message(reader):
+    header = await reader.readexactly(5)
+    kind = header[:1]
+    length = struct.unpack('!I', header[1:])[0]
+    return kind, await reader.readexactly(length - 4)
+
+
+# ==============================
+# Аутентификация
+# ==============================
+def md5_password(user, password, salt):
+    """Ответ на AuthenticationMD5Password"""
+    inner = hashlib.md5((password + user).encode('utf-8')).hexdigest()
+    return 'md5' + hashlib.md5(inner.encode('ascii') + salt).hexdigest()
+
+
+def _hmac(key, data):
+    return hmac.new(key, data, hashlib.sha256).digest()
+
+
+class ScramClient:
+    """Клиентская сторона SCRAM-SHA-256 (RFC 5802/7677) без привязки к каналу"""
+
+    def __init__(self, password):
+        self.password = password.encode('utf-8')
+        self.nonce = base64.b64encode(secrets.token_bytes(18)).decode('ascii')
+        # Имя пользователя PostgreSQL берёт из стартового сообщения, здесь оно пустое
+        self.first_bare = f"n=,r={self.nonce}"
+        self.server_signature = None
+
+    def first_message(self):
+        return ('n,,' + self.first_bare).encode('ascii')
+
+    def final_message(self, server_first):
+        server_first = server_first.decode('ascii')
+        attrs = dict(item.split('=', 1) for item in server_first.split(','))
+        if not attrs['r'].startswith(self.nonce):
+            raise ProtocolError("SCRAM: сервер вернул чужой nonce")
+        salted = hashlib.pbkdf2_hmac('sha256', self.password, base64.b64decode(attrs['s']), int(attrs['i']))
+        client_key = _hmac(salted, b'Client Key')
+        final_bare = f"c=biws,r={attrs['r']}"
+        auth_message = f"{self.first_bare},{server_first},{final_bare}".encode('ascii')
+        signature = _hmac(hashlib.sha256(client_key).digest(), auth_message)
+        proof = bytes(a ^ b for a, b in zip(client_key, signature))
+        self.server_signature = _hmac(_hmac(salted, b'Server Key'), auth_message)
+        return f"{final_bare},p={base64.b64encode(proof).decode('ascii')}".encode('ascii')
+
+    def verify(self, server_final):
+        attrs = dict(item.split('=', 1) for item in server_final.decode('ascii').split(','))
+        if 'e' in attrs:
+            raise ProtocolError(f"SCRAM: {attrs['e']}")
+        if not hmac.compare_digest(base64.b64decode(attrs.get('v', '')), self.server_signature or b''):
+            raise ProtocolError("SCRAM: неверная подпись сервера")
+
+
+# ==============================
+# Соединение
+# ==============================
+class _Request:
+    """
+    Команда, отправленная серверу и ждущая ReadyForQuery.
+    started - начало её очереди на сервере: отправка или ReadyForQuery
+    предыдущей команды конвейера, если та ещё выполнялась
+    """
+
+    __slots__ = ('future', 'results', 'current', 'error', 'started')
+
+    def __init__(self, future):
+        self.future = future
+        self.results = []
+        self.current = None
+        self.error = None
+        self.started = time.perf_counter()
+
+
+class Connection:
+    """Соединение с сервером; создаётся через connect()"""
+
+    def __init__(self, reader, writer, host, port):
+        self._reader = reader
+        self._writer = writer
+        self._host = host
+        self._port = port
+        self._pending = collections.deque()
+        self._reader_task = None
+        self._closed = False
+        self.parameters = {}
+        self.backend_pid = None
+        self.secret_key = None
+        self.transaction_status = None
+        self.notices = collections.deque(maxlen=100)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    @property
+    def closed(self):
+        return self._closed
+
+    # ----- запуск -----
+    async def _startup(self, user, password, database, application_name, timeout):
+        params = {'user': user, 'database': database, 'client_encoding': 'UTF8',
+                  'application_name': application_name}
+        payload = struct.pack('!I', PROTOCOL_VERSION)
+        payload += b''.join(_cstr(k) + _cstr(v) for k, v in params.items() if v) + b'\0'
+        self._writer.write(struct.pack('!I', len(payload) + 4) + payload)
+        await asyncio.wait_for(self._authenticate(user, password), timeout)
+        self._reader_task = asyncio.ensure_future(self._read_loop())
+
+    async def _authenticate(self, user, password):
+        scram = None
+        while True:
+            kind, payload = await _read_message(self._reader)
+            if kind == b'R':
+                code = struct.unpack('!I', payload[:4])[0]
+                if code == AUTH_OK:
+                    continue
+                if code in (AUTH_CLEARTEXT, AUTH_MD5, AUTH_SASL) and password is None:
+                    raise ProtocolError("сервер требует пароль, а он не задан")
+                if code == AUTH_CLEARTEXT:
+                    self._writer.write(_message(b'p', _cstr(password)))
+                elif code == AUTH_MD5:
+                    self._writer.write(_message(b'p', _cstr(md5_password(user, password, payload[4:8]))))
+                elif code == AUTH_SASL:
+                    mechanisms = [m.decode() for m in payload[4:].split(b'\0') if m]
+                    if SCRAM_MECHANISM not in mechanisms:
+                        raise ProtocolError(f"нет поддерживаемого механизма SASL: {mechanisms}")
+                    scram = ScramClient(password)
+                    first = scram.first_message()
+                    self._writer.write(_message(b'p', _cstr(SCRAM_MECHANISM) + struct.pack('!I', len(first)) + first))
+                elif code == AUTH_SASL_CONTINUE and scram:
+                    self._writer.write(_message(b'p', scram.final_message(payload[4:])))
+                elif code == AUTH_SASL_FINAL and scram:
+                    scram.verify(payload[4:])
+                else:
+                    raise ProtocolError(f"неподдерживаемый метод аутентификации: {code}")
+                await self._writer.drain()
+            elif kind == b'E':
+                raise PgError(_fields(payload))
+            elif kind == b'Z':
+                self.transaction_status = payload.decode('ascii')
+                return
+            else:
+                self._handle_async(kind, payload)
+
+    # ----- приём ответов -----
+    def _handle_async(self, kind, payload):
+        """Сообщения, которые сервер может прислать в любой момент"""
+        if kind == b'S':
+            name, value = payload.split(b'\0')[:2]
+            self.parameters[name.decode()] = value.decode()
+        elif kind == b'K':
+            self.backend_pid, self.secret_key = struct.unpack('!Ii', payload)
+        elif kind == b'N':
+            self.notices.append(_fields(payload))
+        elif kind == b'A':
+            pass  # NOTIFY: LISTEN этим клиентом не используется
+        else:
+            raise ProtocolError(f"неожиданное сообщение {kind!r}")
+
+    async def _read_loop(self):
+        error = None
+        try:
+            while True:
+                kind, payload = await _read_message(self._reader)
+                if kind in (b'S', b'K', b'N', b'A'):
+                    self._handle_async(kind, payload)
+                    continue
+                if not self._pending:
+                    raise ProtocolError(f"сообщение {kind!r} без запроса")
+                self._dispatch(self._pending[0], kind, payload)
+        except (asyncio.IncompleteReadError, ConnectionError) as e:
+            error = ProtocolError(f"соединение разорвано: {e}")
+        except ProtocolError as e:
+            error = e
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            error = ProtocolError(f"ошибка разбора ответа сервера: {e!r}")
+        finally:
+            self._shutdown(error)
+
+    def _shutdown(self, error=None):
+        """Закрывает сокет и завершает ожидающие запросы ошибкой"""
+        self._closed = True
+        while self._pending:
+            request = self._pending.popleft()
+            if not request.future.done():
+                request.future.set_exception(error or ProtocolError("соединение закрыто"))
+        self._writer.close()
+
+    def _dispatch(self, request, kind, payload):
+        if kind == b'T':
+            count = struct.unpack('!H', payload[:2])[0]
+            names, types, pos = [], [], 2
+            for _ in range(count):
+                end = payload.index(b'\0', pos)
+                names.append(payload[pos:end].decode('utf-8'))
+                types.append(struct.unpack('!I', payload[end + 7:end + 11])[0])
+                pos = end + 19
+            request.current = Result(names, types)
+        elif kind == b'D':
+            if request.current is None:
+                request.current = Result()
+            request.current.rows.append(self._decode_row(payload, request.current.types))
+        elif kind in (b'C', b'I', b's'):
+            result = request.current or Result()
+            result.status = payload.rstrip(b'\0').decode('utf-8') if kind == b'C' else ''
+            request.results.append(result)
+            request.current = None
+        elif kind == b'E':
+            if request.error is None:
+                request.error = PgError(_fields(payload))
+            request.current = None
+        elif kind == b'Z':
+            self._pending.popleft()
+            self.transaction_status = payload.decode('ascii')
+            now = time.perf_counter()
+            elapsed = now - request.started
+            for result in request.results:
+                result.elapsed = elapsed
+            if self._pending:
+                # Следующая команда конвейера до этого момента ждала в очереди
+                following = self._pending[0]
+                following.started = max(following.started, now)
+            if request.future.done():
+                return
+            if request.error:
+                request.future.set_exception(request.error)
+            else:
+                request.future.set_result(request.results)
+        elif kind not in (b'1', b'2', b'3', b'n', b't'):
+            raise ProtocolError(f"неожиданное сообщение {kind!r}")
+
+    @staticmethod
+    def _decode_row(payload, types):
+        count = struct.unpack('!H', payload[:2])[0]
+        row, pos = [], 2
+        for i in range(count):
+            length = struct.unpack('!i', payload[pos:pos + 4])[0]
+            pos += 4
+            if length < 0:
+                row.append(None)
+                continue
+            value = payload[pos:pos + length].decode('utf-8')
+            pos += length
+            decoder = DECODERS.get(types[i]) if i < len(types) else None
+            row.append(decoder(value) if decoder else value)
+        return tuple(row)
+
+    # ----- отправка -----
+    async def _request(self, data):
+        if self._closed:
+            raise ProtocolError("соединение закрыто")
+        request = _Request(asyncio.get_running_loop().create_future())
+        # Между постановкой в очередь и записью нет await: порядок ответов совпадает с порядком запросов
+        self._pending.append(request)
+        self._writer.write(data)
+        await self._writer.drain()
+        return await request.future
+
+    async def query(self, sql):
+        """Простой протокол: одна или несколько команд через ';', список Result"""
+        return await self._request(_message(b'Q', _cstr(sql)))
+
+    async def execute(self, sql, *params):
+        """Расширенный протокол: одна команда с параметрами $1, $2..."""
+        results = await self._request(_extended(sql, params) + SYNC)
+        return results[0] if results else Result()
+
+    async def fetch(self, sql, *params):
+        """Строки результата"""
+        return (await self.execute(sql, *params)).rows
+
+    async def fetchval(self, sql, *params):
+        """Первое значение первой строки"""
+        rows = await self.fetch(sql, *params)
+        return rows[0][0] if rows and rows[0] else None
+
+    async def pipeline(self, statements):
+        """
+        Пачка команд одним пакетом с общим Sync: [sql или (sql, params), ...].
+        Команды выполняются в одной неявной транзакции; при ошибке
+        остальные пропускаются и всё откатывается.
+        """
+        data = []
+        for statement in statements:
+            sql, params = (statement, ()) if isinstance(statement, str) else statement
+            data.append(_extended(sql, tuple(params)))
+        return await self._request(b''.join(data) + SYNC)
+
+    async def cancel(self):
+        """Отменяет выполняемую команду (CancelRequest по отдельному соединению)"""
+        if self.backend_pid is None:
+            return
+        reader, writer = await asyncio.open_connection(self._host, self._port)
+        writer.write(struct.pack('!IIIi', 16, CANCEL_REQUEST_CODE, self.backend_pid, self.secret_key))
+        await writer.drain()
+        # Сервер закрывает соединение, ничего не отвечая
+        await reader.read()
+        writer.close()
+
+    async def close(self):
+        if not self._closed:
+            self._closed = True
+            try:
+                self._writer.write(TERMINATE)
+                await self._writer.drain()
+            except ConnectionError:
+                pass
+        if self._reader_task:
+            self._reader_task.cancel()
+            try:
+                await self._reader_task
+            except asyncio.CancelledError:
+                pass
+        # Задача чтения, отменённая до первого запуска, не выполняет свой finally
+        self._shutdown()
+
+
+async def connect(host='localhost', port=5432, user='postgres', password=None,
+                  database=None, application_name='pgwire', timeout=10.0):
+    """Открывает соединение и проходит аутентификацию"""
+    if password is None:
+        password = os.environ.get('PGPASSWORD')
+    try:
+        if host.startswith('/'):
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_unix_connection(os.path.join(host, f'.s.PGSQL.{port}')), timeout)
+        else:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    except (OSError, asyncio.TimeoutError) as e:
+        raise ProtocolError(f"не удалось подключиться к {host}:{port}: {e}") from e
+    conn = Connection(reader, writer, host, port)
+    try:
+        await conn._startup(user, password, database or user, application_name, timeout)
+    except (asyncio.IncompleteReadError, ConnectionError) as e:
+        # Например, сервер ещё запускается или уже останавливается
+        writer.close()
+        raise ProtocolError(f"соединение разорвано при подключении: {e}") from e
+    except BaseException:
+        writer.close()
+        raise
+    return conn
+
+
+# ==============================
+# Замер задержки
+# ==============================
+def percentile(values, share):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+
+async def benchmark(args):
+    conns = [await connect(args.host, args.port, args.user, database=args.dbname)
+             for _ in range(args.connections)]
+    latencies = []
+    counter = iter(range(args.count))
+
+    async def worker(conn):
+        for _ in counter:
+            started = time.perf_counter()
+            if args.simple:
+                await conn.query(args.command)
+            else:
+                await conn.execute(args.command)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    try:
+        # concurrency запросов в полёте на каждом соединении
+        await asyncio.gather(*(worker(conn) for conn in conns for _ in range(args.concurrency)))
+    finally:
+        for conn in conns:
+            await conn.close()
+    total = time.perf_counter() - started
+    return {
+        'command': args.command,
+        'protocol': 'simple' if args.simple else 'extended',
+        'connections': args.connections,
+        'concurrency': args.concurrency,
+        'count': len(latencies),
+        'seconds': round(total, 6),
+        'per_second': round(len(latencies) / total, 1) if total else None,
+        'latency_ms': {
+            'min': round(min(latencies) * 1000, 3),
+            'p50': round(statistics.median(latencies) * 1000, 3),
+            'p95': round(percentile(latencies, 0.95) * 1000, 3),
+            'p99': round(percentile(latencies, 0.99) * 1000, 3),
+            'max': round(max(latencies) * 1000, 3),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замер задержки запросов по протоколу PostgreSQL")
+    parser.add_argument('-H', '--host', default='localhost', help="адрес сервера или каталог сокета")
+    parser.add_argument('-p', '--port', type=int, default=5432, help="порт сервера")
+    parser.add_argument('-U', '--user', default=os.environ.get('PGUSER', 'postgres'), help="пользователь")
+    parser.add_argument('-d', '--dbname', default='postgres', help="имя базы данных")
+    parser.add_argument('-c', '--command', default='SELECT 1', help="запрос")
+    parser.add_argument('-n', '--count', type=int, default=1000, help="число запросов")
+    parser.add_argument('--concurrency', type=int, default=1,
+                        help="запросов в полёте на соединение (конвейер)")
+    parser.add_argument('--connections', type=int, default=1, help="число соединений")
+    parser.add_argument('--simple', action='store_true', help="простой протокол вместо расширенного")
+    parser.add_argument('--json', action='store_true', help="вывести результат в JSON")
+    args = parser.parse_args()
+
+    try:
+        report = asyncio.run(benchmark(args))
+    except (PgError, ProtocolError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return 0
+    latency = report['latency_ms']
+    print(f"📊 {report['count']} запросов за {report['seconds']:.3f} с "
+          f"({report['per_second']} в секунду), протокол {report['protocol']}, "
+          f"соединений {report['connections']}, в полёте {report['concurrency']}")
+    print(f"   задержка, мс: min {latency['min']}  p50 {latency['p50']}  p95 {latency['p95']}  "
+          f"p99 {latency['p99']}  max {latency['max']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
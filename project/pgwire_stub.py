@@ -0,0 +1,573 @@
+#!/usr/bin/env python3
+"""
+Заглушка сервера PostgreSQL для проверки pgwire.py без Docker.
+
+Говорит на протоколе 3.0 (простой и расширенный протокол, Sync,
+пропуск сообщений после ошибки до Sync), проверяет пароль методами
+trust, password, md5 и scram-sha-256 и понимает небольшое подмножество
+SQL - ровно то, что нужно проверкам спринта D2:
+  SELECT 1, 'текст', $1::int, NULL, true, version(), pg_sleep(0.1), 1/0
+  CREATE TABLE / DROP TABLE [IF [NOT] EXISTS]
+  INSERT INTO t [(колонки)] VALUES (...), (...)
+  SELECT * | count(*) | колонки FROM t
+  BEGIN / COMMIT / ROLLBACK
+Таблицы хранятся в памяти и общие для всех соединений.
+
+Пример:
+    python3 pgwire_stub.py --port 5439 --auth md5 &
+    PGPASSWORD=postgres python3 pgwire.py -H 127.0.0.1 -p 5439 -n 10000 --concurrency 32
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import hmac
+import re
+import secrets
+import struct
+import sys
+
+from pgwire import (AUTH_CLEARTEXT, AUTH_MD5, AUTH_OK, AUTH_SASL, AUTH_SASL_CONTINUE,
+                    AUTH_SASL_FINAL, CANCEL_REQUEST_CODE, PROTOCOL_VERSION, SCRAM_MECHANISM,
+                    _cstr, _hmac, _message, md5_password)
+
+# ==============================
+# Настройки
+# ==============================
+SSL_REQUEST_CODE = 80877103
+AUTH_METHODS = ('trust', 'password', 'md5', 'scram-sha-256')
+SCRAM_ITERATIONS = 4096
+SERVER_VERSION = '17.6'
+
+# OID типов для RowDescription
+TYPE_OIDS = {'bool': 16, 'int8': 20, 'bigint': 20, 'int2': 21, 'smallint': 21, 'int4': 23,
+             'int': 23, 'integer': 23, 'serial': 23, 'text': 25, 'float8': 701, 'numeric': 1700,
+             'varchar': 1043, 'void': 2278}
+
+STARTUP_PARAMETERS = {
+    'server_version': SERVER_VERSION,
+    'server_encoding': 'UTF8',
+    'client_encoding': 'UTF8',
+    'DateStyle': 'ISO, DMY',
+    'integer_datetimes': 'on',
+    'standard_conforming_strings': 'on',
+}
+
+
+class StubError(Exception):
+    """Ошибка выполнения команды: уходит клиенту как ErrorResponse"""
+
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+# ==============================
+# Разбор SQL
+# ==============================
+LITERAL_RE = re.compile(r"""
+    \s*(?:
+        (?P<null>NULL) |
+        (?P<bool>true|false) |
+        (?P<num>-?\d+(?:\.\d+)?) |
+        '(?P<str>(?:[^']|'')*)' |
+        \$(?P<param>\d+)
+    )(?:::(?P<cast>\w+))?(?:\s+AS\s+(?P<alias>\w+))?\s*$
+""", re.IGNORECASE | re.VERBOSE)
+
+
+def split_list(text):
+    """Разбивает по запятым вне кавычек и скобок"""
+    items, depth, quoted, start = [], 0, False, 0
+    for i, ch in enumerate(text):
+        if ch == "'":
+            quoted = not quoted
+        elif not quoted and ch == '(':
+            depth += 1
+        elif not quoted and ch == ')':
+            depth -= 1
+        elif not quoted and depth == 0 and ch == ',':
+            items.append(text[start:i].strip())
+            start = i + 1
+    if text[start:].strip():
+        items.append(text[start:].strip())
+    return items
+
+
+def to_text(value):
+    """Значение в текстовом формате протокола"""
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    return str(value)
+
+
+def literal(expr, params):
+    """(значение, тип, имя колонки) для литерала или параметра"""
+    m = LITERAL_RE.match(expr)
+    if not m:
+        raise StubError('0A000', f"заглушка не поддерживает выражение: {expr}")
+    if m['null']:
+        value, kind = None, 'text'
+    elif m['bool']:
+        value, kind = m['bool'].lower() == 'true', 'bool'
+    elif m['num']:
+        value, kind = (m['num'], 'numeric') if '.' in m['num'] else (int(m['num']), 'int4')
+    elif m['str'] is not None:
+        value, kind = m['str'].replace("''", "'"), 'text'
+    else:
+        index = int(m['param']) - 1
+        if index >= len(params):
+            raise StubError('08P01', f"нет значения для параметра ${index + 1}")
+        value, kind = params[index], 'text'
+    if m['cast']:
+        kind = m['cast'].lower()
+        if value is not None and TYPE_OIDS.get(kind) in (20, 21, 23):
+            try:
+                value = int(value)
+            except ValueError:
+                raise StubError('22P02', f"неверный синтаксис для типа {kind}: \"{value}\"")
+        elif value is not None and kind == 'bool':
+            value = str(value).lower() in ('t', 'true', '1', 'on', 'yes')
+    return value, kind, m['alias'] or '?column?'
+
+
+class Database:
+    """Таблицы в памяти: {имя: {'columns': [(имя, тип)], 'rows': [...]}}"""
+
+    def __init__(self):
+        self.tables = {}
+
+    async def execute(self, sql, params=()):
+        """(колонки [(имя, тип)], строки, тег) или None для пустого запроса"""
+        sql = sql.strip().rstrip(';').strip()
+        if not sql:
+            return None
+        head = sql.split(None, 1)[0].upper()
+        if head in ('BEGIN', 'START', 'COMMIT', 'END', 'ROLLBACK'):
+            tag = {'START': 'BEGIN', 'END': 'COMMIT'}.get(head, head)
+            return [], [], tag
+        if head == 'CREATE':
+            return self._create(sql)
+        if head == 'DROP':
+            return self._drop(sql)
+        if head == 'INSERT':
+            return self._insert(sql, params)
+        if head == 'SELECT':
+            return await self._select(sql, params)
+        raise StubError('42601', f"синтаксическая ошибка (ошибка) в или около \"{head}\"")
+
+    def _table(self, name):
+        table = self.tables.get(name.lower())
+        if table is None:
+            raise StubError('42P01', f"отношение \"{name}\" не существует")
+        return table
+
+    def _create(self, sql):
+        m = re.match(r'CREATE\s+TABLE\s+(IF\s+NOT\s+EXISTS\s+)?(\w+)\s*\((.*)\)$', sql, re.I | re.S)
+        if not m:
+            raise StubError('0A000', "заглушка поддерживает только CREATE TABLE")
+        name = m[2].lower()
+        if name in self.tables:
+            if m[1]:
+                return [], [], 'CREATE TABLE'
+            raise StubError('42P07', f"отношение \"{name}\" уже существует")
+        columns = []
+        for item in split_list(m[3]):
+            parts = item.split()
+            if parts[0].upper() in ('PRIMARY', 'UNIQUE', 'CONSTRAINT', 'CHECK', 'FOREIGN'):
+                continue
+            columns.append((parts[0].lower(), parts[1].lower().split('(')[0] if len(parts) > 1 else 'text'))
+        self.tables[name] = {'columns': columns, 'rows': []}
+        return [], [], 'CREATE TABLE'
+
+    def _drop(self, sql):
+        m = re.match(r'DROP\s+TABLE\s+(IF\s+EXISTS\s+)?(\w+)$', sql, re.I)
+        if not m:
+            raise StubError('0A000', "заглушка поддерживает только DROP TABLE")
+        if self.tables.pop(m[2].lower(), None) is None and not m[1]:
+            raise StubError('42P01', f"таблица \"{m[2]}\" не существует")
+        return [], [], 'DROP TABLE'
+
+    def _insert(self, sql, params):
+        m = re.match(r'INSERT\s+INTO\s+(\w+)\s*(?:\(([^)]*)\))?\s*VALUES\s*(.*)$', sql, re.I | re.S)
+        if not m:
+            raise StubError('0A000', "заглушка поддерживает только INSERT ... VALUES")
+        table = self._table(m[1])
+        names = [c for c, _ in table['columns']]
+        target = [c.strip().lower() for c in m[2].split(',')] if m[2] else names
+        count = 0
+        for group in split_list(m[3]):
+            values = [literal(v, params)[0] for v in split_list(group.strip()[1:-1])]
+            if len(values) != len(target):
+                raise StubError('42601', "число значений не совпадает с числом колонок")
+            row = dict(zip(target, values))
+            table['rows'].append(tuple(row.get(c) for c in names))
+            count += 1
+        return [], [], f'INSERT 0 {count}'
+
+    async def _select(self, sql, params):
+        m = re.match(r'SELECT\s+(.*?)\s+FROM\s+(\w+)$', sql, re.I | re.S)
+        if m:
+            table = self._table(m[2])
+            what = m[1].strip()
+            if what.lower() == 'count(*)':
+                return [('count', 'int8')], [(len(table['rows']),)], 'SELECT 1'
+            names = [c for c, _ in table['columns']]
+            wanted = names if what == '*' else [c.strip().lower() for c in what.split(',')]
+            for c in wanted:
+                if c not in names:
+                    raise StubError('42703', f"столбец \"{c}\" не существует")
+            idx = [names.index(c) for c in wanted]
+            rows = [tuple(row[i] for i in idx) for row in table['rows']]
+            return [table['columns'][i] for i in idx], rows, f'SELECT {len(rows)}'
+
+        columns, row = [], []
+        for expr in split_list(sql[len('SELECT'):]):
+            lowered = expr.lower().replace(' ', '')
+            if lowered == 'version()':
+                columns.append(('version', 'text'))
+                row.append(f'PostgreSQL {SERVER_VERSION} (pgwire stub)')
+            elif lowered.startswith('pg_sleep('):
+                await asyncio.sleep(float(lowered[len('pg_sleep('):-1]))
+                columns.append(('pg_sleep', 'void'))
+                row.append('')
+            elif re.fullmatch(r'-?\d+/0', lowered):
+                raise StubError('22012', "деление на ноль")
+            else:
+                value, kind, name = literal(expr, params)
+                columns.append((name, kind))
+                row.append(value)
+        return columns, [tuple(row)], 'SELECT 1'
+
+
+# ==============================
+# Протокол
+# ==============================
+def error_message(code, message, severity='ERROR'):
+    payload = b''.join(k + _cstr(v) for k, v in
+                       ((b'S', severity), (b'V', severity), (b'C', code), (b'M', message)))
+    return _message(b'E', payload + b'\0')
+
+
+def row_description(columns):
+    payload = [struct.pack('!H', len(columns))]
+    for name, kind in columns:
+        payload.append(_cstr(name) + struct.pack('!IhIhih', 0, 0, TYPE_OIDS.get(kind, 25), -1, -1, 0))
+    return _message(b'T', b''.join(payload))
+
+
+def data_row(row):
+    payload = [struct.pack('!H', len(row))]
+    for value in row:
+        text = to_text(value)
+        if text is None:
+            payload.append(struct.pack('!i', -1))
+        else:
+            data = text.encode('utf-8')
+            payload.append(struct.pack('!i', len(data)) + data)
+    return _message(b'D', b''.join(payload))
+
+
+def ready(status):
+    return _message(b'Z', status.encode('ascii'))
+
+
+class ScramServer:
+    """Серверная сторона SCRAM-SHA-256"""
+
+    def __init__(self, password):
+        self.salt = secrets.token_bytes(16)
+        salted = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), self.salt, SCRAM_ITERATIONS)
+        self.stored_key = hashlib.sha256(_hmac(salted, b'Client Key')).digest()
+        self.server_key = _hmac(salted, b'Server Key')
+        self.nonce = base64.b64encode(secrets.token_bytes(18)).decode('ascii')
+
+    def first(self, client_first):
+        # gs2-заголовок "n,," - без привязки к каналу
+        self.client_first_bare = client_first.decode('ascii').split(',', 2)[2]
+        client_nonce = dict(i.split('=', 1) for i in self.client_first_bare.split(','))['r']
+        self.combined = client_nonce + self.nonce
+        salt = base64.b64encode(self.salt).decode('ascii')
+        self.server_first = f"r={self.combined},s={salt},i={SCRAM_ITERATIONS}"
+        return self.server_first.encode('ascii')
+
+    def final(self, client_final):
+        text = client_final.decode('ascii')
+        without_proof, proof = text.rsplit(',p=', 1)
+        attrs = dict(i.split('=', 1) for i in without_proof.split(','))
+        if attrs.get('r') != self.combined:
+            return None
+        auth_message = f"{self.client_first_bare},{self.server_first},{without_proof}".encode('ascii')
+        signature = _hmac(self.stored_key, auth_message)
+        client_key = bytes(a ^ b for a, b in zip(base64.b64decode(proof), signature))
+        if not hmac.compare_digest(hashlib.sha256(client_key).digest(), self.stored_key):
+            return None
+        server_signature = base64.b64encode(_hmac(self.server_key, auth_message)).decode('ascii')
+        return f"v={server_signature}".encode('ascii')
+
+
+class StubServer:
+    """
+    Заглушка сервера на asyncio.
+
+        async with StubServer(auth='scram-sha-256', password='secret') as server:
+            conn = await pgwire.connect('127.0.0.1', server.port, password='secret')
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, user='postgres', password='postgres', auth='scram-sha-256'):
+        if auth not in AUTH_METHODS:
+            raise ValueError(f"неизвестный метод аутентификации: {auth}")
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.auth = auth
+        self.database = Database()
+        self.connections = 0
+        self._server = None
+        self._next_pid = 1000
+        self._sessions = {}
+        self._handlers = {}
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def close(self):
+        self._server.close()
+        # wait_closed() не ждёт открытые соединения: закрываем их сами
+        for writer in self._handlers.values():
+            writer.close()
+        if self._handlers:
+            await asyncio.gather(*self._handlers, return_exceptions=True)
+        await self._server.wait_closed()
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def serve_forever(self):
+        async with self._server:
+            await self._server.serve_forever()
+
+    # ----- соединение -----
+    async def _handle(self, reader, writer):
+        pid = None
+        self._handlers[asyncio.current_task()] = writer
+        try:
+            params = await self._startup(reader, writer)
+            if params is None:
+                return
+            if not await self._authenticate(reader, writer, params.get('user', '')):
+                return
+            pid, key = self._next_pid, secrets.randbits(31)
+            self._next_pid += 1
+            session = {'key': key, 'running': None}
+            self._sessions[pid] = session
+            self.connections += 1
+            out = [_message(b'R', struct.pack('!I', AUTH_OK))]
+            out += [_message(b'S', _cstr(k) + _cstr(v)) for k, v in STARTUP_PARAMETERS.items()]
+            out.append(_message(b'K', struct.pack('!Ii', pid, key)))
+            out.append(ready('I'))
+            writer.write(b''.join(out))
+            await self._session(reader, writer, session)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._sessions.pop(pid, None)
+            self._handlers.pop(asyncio.current_task(), None)
+            writer.close()
+
+    async def _startup(self, reader, writer):
+        while True:
+            length = struct.unpack('!I', await reader.readexactly(4))[0]
+            payload = await reader.readexactly(length - 4)
+            code = struct.unpack('!I', payload[:4])[0]
+            if code == SSL_REQUEST_CODE:
+                writer.write(b'N')
+                continue
+            if code == CANCEL_REQUEST_CODE:
+                pid, key = struct.unpack('!Ii', payload[4:12])
+                session = self._sessions.get(pid)
+                if session and session['key'] == key and session['running']:
+                    session['running'].cancel()
+                return None
+            if code != PROTOCOL_VERSION:
+                writer.write(error_message('0A000', f"неподдерживаемый протокол {code >> 16}.{code & 0xffff}", 'FATAL'))
+                return None
+            items = payload[4:].split(b'\0')
+            return {items[i].decode(): items[i + 1].decode() for i in range(0, len(items) - 2, 2)}
+
+    async def _read_password(self, reader):
+        header = await reader.readexactly(5)
+        if header[:1] != b'p':
+            raise ConnectionError("ожидался ответ с паролем")
+        return await reader.readexactly(struct.unpack('!I', header[1:])[0] - 4)
+
+    async def _authenticate(self, reader, writer, user):
+        def fail():
+            writer.write(error_message('28P01', f"пользователь \"{user}\" не прошёл проверку подлинности (по паролю)", 'FATAL'))
+            return False
+
+        if user != self.user:
+            return fail()
+        if self.auth == 'trust':
+            return True
+        if self.auth == 'password':
+            writer.write(_message(b'R', struct.pack('!I', AUTH_CLEARTEXT)))
+            answer = (await self._read_password(reader)).rstrip(b'\0').decode('utf-8')
+            return answer == self.password or fail()
+        if self.auth == 'md5':
+            salt = secrets.token_bytes(4)
+            writer.write(_message(b'R', struct.pack('!I', AUTH_MD5) + salt))
+            answer = (await self._read_password(reader)).rstrip(b'\0').decode('ascii')
+            return answer == md5_password(user, self.password, salt) or fail()
+
+        writer.write(_message(b'R', struct.pack('!I', AUTH_SASL) + _cstr(SCRAM_MECHANISM) + b'\0'))
+        payload = await self._read_password(reader)
+        mechanism, rest = payload.split(b'\0', 1)
+        if mechanism.decode() != SCRAM_MECHANISM:
+            return fail()
+        scram = ScramServer(self.password)
+        length = struct.unpack('!i', rest[:4])[0]
+        writer.write(_message(b'R', struct.pack('!I', AUTH_SASL_CONTINUE) + scram.first(rest[4:4 + length])))
+        server_final = scram.final(await self._read_password(reader))
+        if server_final is None:
+            return fail()
+        writer.write(_message(b'R', struct.pack('!I', AUTH_SASL_FINAL) + server_final))
+        return True
+
+    async def _session(self, reader, writer, session):
+        status = 'I'
+        params = ()
+        sql = ''
+        skipping = False
+        while True:
+            header = await reader.readexactly(5)
+            kind = header[:1]
+            payload = await reader.readexactly(struct.unpack('!I', header[1:])[0] - 4)
+            if kind == b'X':
+                return
+            if kind == b'S':
+                skipping = False
+                writer.write(ready(status))
+                await writer.drain()
+                continue
+            if skipping:
+                continue
+            try:
+                if kind == b'Q':
+                    text = payload.rstrip(b'\0').decode('utf-8')
+                    statements = [s for s in text.split(';') if s.strip()] or ['']
+                    try:
+                        for statement in statements:
+                            status = await self._run(writer, session, statement, (), status)
+                    except StubError as e:
+                        writer.write(error_message(e.code, e.message))
+                        status = 'E' if status in ('T', 'E') else 'I'
+                    writer.write(ready(status))
+                    await writer.drain()
+                elif kind == b'P':
+                    _, rest = payload.split(b'\0', 1)
+                    sql = rest.split(b'\0', 1)[0].decode('utf-8')
+                    writer.write(_message(b'1'))
+                elif kind == b'B':
+                    params = self._bind_params(payload)
+                    writer.write(_message(b'2'))
+                elif kind == b'D':
+                    pass  # RowDescription отправляется вместе с результатом Execute
+                elif kind == b'E':
+                    status = await self._run(writer, session, sql, params, status, extended=True)
+                elif kind in (b'H', b'C'):
+                    if kind == b'C':
+                        writer.write(_message(b'3'))
+                    await writer.drain()
+                else:
+                    raise StubError('08P01', f"неподдерживаемое сообщение {kind!r}")
+            except StubError as e:
+                writer.write(error_message(e.code, e.message))
+                status = 'E' if status in ('T', 'E') else 'I'
+                skipping = True
+
+    @staticmethod
+    def _bind_params(payload):
+        pos = payload.index(b'\0') + 1
+        pos = payload.index(b'\0', pos) + 1
+        formats = struct.unpack('!H', payload[pos:pos + 2])[0]
+        pos += 2 + 2 * formats
+        count = struct.unpack('!H', payload[pos:pos + 2])[0]
+        pos += 2
+        params = []
+        for _ in range(count):
+            length = struct.unpack('!i', payload[pos:pos + 4])[0]
+            pos += 4
+            if length < 0:
+                params.append(None)
+            else:
+                params.append(payload[pos:pos + length].decode('utf-8'))
+                pos += length
+        return tuple(params)
+
+    async def _run(self, writer, session, sql, params, status, extended=False):
+        """Выполняет одну команду и возвращает новый статус транзакции"""
+        if status == 'E' and not re.match(r'\s*(ROLLBACK|COMMIT|END)\b', sql, re.I):
+            raise StubError('25P02', "текущая транзакция прервана, команды до конца блока транзакции игнорируются")
+        # Команда выполняется отдельной задачей, чтобы CancelRequest мог её прервать
+        running = session['running'] = asyncio.ensure_future(self.database.execute(sql, params))
+        try:
+            result = await running
+        except asyncio.CancelledError:
+            if not running.cancelled():
+                raise
+            raise StubError('57014', "выполнение оператора отменено по запросу пользователя")
+        finally:
+            session['running'] = None
+        if result is None:
+            writer.write(_message(b'I'))
+            return status
+        columns, rows, tag = result
+        if columns:
+            writer.write(row_description(columns))
+        elif extended:
+            writer.write(_message(b'n'))
+        for row in rows:
+            writer.write(data_row(row))
+        writer.write(_message(b'C', _cstr(tag)))
+        if tag == 'BEGIN':
+            return 'T'
+        if tag in ('COMMIT', 'ROLLBACK'):
+            return 'I'
+        return status
+
+
+async def serve(args):
+    server = await StubServer(args.host, args.port, args.user, args.password, args.auth).start()
+    print(f"🧪 Заглушка PostgreSQL слушает {args.host}:{server.port} (вход: {args.auth}, "
+          f"пользователь {args.user}), Ctrl+C для остановки", flush=True)
+    await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Заглушка сервера PostgreSQL для проверки pgwire.py")
+    parser.add_argument('-H', '--host', default='127.0.0.1', help="адрес")
+    parser.add_argument('-p', '--port', type=int, default=5439, help="порт")
+    parser.add_argument('-U', '--user', default='postgres', help="пользователь")
+    parser.add_argument('--password', default='postgres', help="пароль")
+    parser.add_argument('--auth', choices=AUTH_METHODS, default='scram-sha-256', help="метод аутентификации")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,52 @@
+#!/bin/bash
+# Запуск реплики: при первом старте данные копируются с основного сервера
+# через pg_basebackup, затем сервер стартует в режиме hot standby.
+set -euo pipefail
+
+PRIMARY_HOST="${PRIMARY_HOST:-postgres-1c}"
+PRIMARY_PORT="${PRIMARY_PORT:-5432}"
+REPLICATION_USER="${REPLICATION_USER:-replicator}"
+REPLICATION_SLOT="${REPLICATION_SLOT:-replica_1}"
+PGDATA="${PGDATA:-/var/lib/postgresql/data}"
+
+. "$(dirname "$0")/pg-functions.sh"
+
+pg_find_bin
+
+if [ ! -s "$PGDATA/PG_VERSION" ]; then
+    echo "Ожидание основного сервера $PRIMARY_HOST:$PRIMARY_PORT..."
+    until pg_isready -q -h "$PRIMARY_HOST" -p "$PRIMARY_PORT"; do
+        sleep 2
+    done
+
+    export PGPASSWORD="${REPLICATION_PASSWORD:-}"
+    # Роль replicator создаётся init-scripts/replication.sql только при первом
+    # запуске основного сервера: на томе, созданном раньше, её нет
+    if ! error="$(psql -X -A -t -c "IDENTIFY_SYSTEM" \
+            "host=$PRIMARY_HOST port=$PRIMARY_PORT user=$REPLICATION_USER replication=true" 2>&1)"; then
+        echo "Нет доступа к репликации на $PRIMARY_HOST:$PRIMARY_PORT для $REPLICATION_USER:" >&2
+        echo "  $error" >&2
+        echo "Если том основного сервера создан до появления роли репликации, выполните один раз:" >&2
+        echo "  docker exec -i $PRIMARY_HOST psql -U postgres < init-scripts/replication.sql" >&2
+        echo "  docker exec $PRIMARY_HOST psql -U postgres -c 'SELECT pg_reload_conf()'" >&2
+        exit 1
+    fi
+
+    echo "Копирование данных с основного сервера (pg_basebackup)..."
+    rm -rf "${PGDATA:?}"/*
+    # -C создаёт слот репликации; если слот уже есть (том реплики пересоздан), используем его
+    if ! pg_basebackup -h "$PRIMARY_HOST" -p "$PRIMARY_PORT" -U "$REPLICATION_USER" \
+            -D "$PGDATA" -X stream -R -C -S "$REPLICATION_SLOT" --checkpoint=fast -P; then
+        rm -rf "${PGDATA:?}"/*
+        pg_basebackup -h "$PRIMARY_HOST" -p "$PRIMARY_PORT" -U "$REPLICATION_USER" \
+            -D "$PGDATA" -X stream -R -S "$REPLICATION_SLOT" --checkpoint=fast -P
+    fi
+    unset PGPASSWORD
+    chmod 700 "$PGDATA"
+    echo "Реплика инициализирована"
+fi
+
+exec postgres -D "$PGDATA" \
+    -c config_file=/etc/postgresql/postgresql.conf \
+    -c hba_file=/etc/postgresql/pg_hba.conf \
+    -c hot_standby=on
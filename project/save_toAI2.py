@@ -2,11 +2,20 @@
 """
 Скрипт для сбора содержимого файлов и каталогов в один файл toAI.md
 Игнорирует архивные файлы, ограничивает вывод 1000 строк
+С флагом --watch продолжает работать и обновляет toAI.md при изменениях файлов
+С флагами --batch/--manifest собирает по файлу на каждый из нескольких проектов
+параллельно, с общим кэшем классификации и сводным индексом
 """
 
+import argparse
+import errno
+import json
 import os
 import mimetypes
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import nullcontext
 from pathlib import Path
 
 # Расширения архивных файлов для игнорирования
@@ -26,36 +35,249 @@ BINARY_EXTENSIONS = {
 IGNORED_ITEMS = {
     '.git', '.svn', '.hg', '__pycache__', 'node_modules',
     'venv', '.venv', 'env', '.env', 'toAI.md', '.DS_Store',
-    'Thumbs.db', 'desktop.ini', 'save_toAI.py', 'save_toAI2.py', 'toAI.md'
+    'Thumbs.db', 'desktop.ini', 'save_toAI.py', 'save_toAI2.py', 'toAI.md',
+    'toAI.md.tmp', 'toAI_bundles'
 }
 
+# Фазы для --stats, в порядке вывода в отчёте
+PHASES = ('walk', 'mime', 'sniff', 'open', 'read', 'render', 'write')
+
+PHASE_TITLES = {
+    'walk': 'обход каталогов',
+    'mime': 'определение MIME-типа',
+    'sniff': 'проверка на NUL-байты',
+    'open': 'открытие файлов',
+    'read': 'чтение и декодирование',
+    'render': 'формирование markdown',
+    'write': 'запись toAI.md',
+}
+
+COUNTER_TITLES = {
+    'walk_passes': 'проходов по дереву',
+    'dirs_visited': 'каталогов посещено',
+    'dirs_pruned': 'каталогов отсечено',
+    'files_visited': 'файлов просмотрено',
+    'files_ignored': 'файлов пропущено по имени',
+    'binary_by_extension': 'бинарных по расширению',
+    'binary_by_mime': 'бинарных по MIME-типу',
+    'binary_by_content': 'бинарных по содержимому',
+    'files_read': 'файлов прочитано',
+    'bytes_read': 'байт прочитано с диска',
+    'bytes_emitted': 'байт записано в toAI.md',
+    'classify_cache_hits': 'классификаций из кэша',
+}
+
+
+class PhaseTimer:
+    """Накапливает время одной фазы; объект переиспользуется для каждого файла"""
+
+    __slots__ = ('timings', 'name', 'started')
+
+    def __init__(self, timings, name):
+        self.timings = timings
+        self.name = name
+        self.started = 0.0
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.timings[self.name] += time.perf_counter() - self.started
+
+
+# Фаза без замера, когда статистика не нужна
+NO_PHASE = nullcontext()
+
+
+class RunStats:
+    """
+    Счётчики и время фаз для отчёта --stats. Выключенная статистика
+    (обычный запуск) ничего не замеряет, чтобы не замедлять сбор.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.timings = dict.fromkeys(PHASES, 0.0)
+        self.counters = dict.fromkeys(COUNTER_TITLES, 0)
+        self.total = 0.0
+        self._timers = {name: PhaseTimer(self.timings, name) for name in PHASES}
+
+    def phase(self, name):
+        return self._timers[name] if self.enabled else NO_PHASE
+
+    def add(self, name, value=1):
+        if self.enabled:
+            self.counters[name] += value
+
+    def to_dict(self):
+        return {
+            'total_seconds': round(self.total, 6),
+            'phases': {name: round(value, 6) for name, value in self.timings.items()},
+            'counters': dict(self.counters),
+        }
+
+    def report(self):
+        lines = ["\n📈 Статистика выполнения:"]
+        for name in PHASES:
+            seconds = self.timings[name]
+            share = seconds / self.total * 100 if self.total else 0
+            lines.append(f"   {PHASE_TITLES[name]:<26} {seconds:>9.4f} с  {share:>5.1f}%")
+        lines.append(f"   {'всего':<26} {self.total:>9.4f} с")
+        lines.append("")
+        for name, title in COUNTER_TITLES.items():
+            lines.append(f"   {title:<26} {self.counters[name]:>12}")
+        return '\n'.join(lines)
+
+
+STATS = RunStats(enabled=False)
+
+
+def join_path(base, name):
+    """
+    То же, что str(Path(base) / name) для base = os.path.normpath(root),
+    но без объектов Path: вызывается для каждого файла дерева
+    """
+    return name if base == '.' else os.path.join(base, name)
+
+
+def walk_tree(top, exclude=None):
+    """
+    os.walk с учётом времени обхода и отсечением игнорируемых каталогов.
+    exclude - реальные пути каталогов и файлов, которые не попадают в обход
+    (каталог снимков и кэш классификации в режиме --batch)
+    """
+    STATS.add('walk_passes')
+    # realpath считаем только для совпавших имён, остальные проверяются по множеству
+    excluded_names = {os.path.basename(p) for p in exclude} if exclude else set()
+    walker = os.walk(top)
+    while True:
+        with STATS.phase('walk'):
+            try:
+                root, dirs, files = next(walker)
+            except StopIteration:
+                return
+        STATS.add('dirs_visited')
+        STATS.add('files_visited', len(files))
+        kept = [d for d in dirs if d not in IGNORED_ITEMS]
+        if excluded_names:
+            kept = [d for d in kept if not is_excluded(root, d, excluded_names, exclude)]
+            files[:] = [f for f in files if not is_excluded(root, f, excluded_names, exclude)]
+        pruned = len(dirs) - len(kept)
+        STATS.add('dirs_pruned', pruned)
+        # Ссылка на тот же список, чтобы os.walk не спускался в отсечённые каталоги
+        dirs[:] = kept
+        yield root, dirs, files, pruned
+
+
+def is_excluded(root, name, excluded_names, exclude):
+    return name in excluded_names and os.path.realpath(os.path.join(root, name)) in exclude
+
+
+class SnapshotCache:
+    """
+    Кэш обхода дерева, классификации файлов и готовых секций markdown.
+    За один запуск каждый файл классифицируется и читается один раз,
+    а в режиме --watch пересчитываются только изменившиеся файлы.
+    """
+
+    def __init__(self, top='.', known=None, exclude=None):
+        self.top = top
+        self.exclude = exclude
+        self.listing = None
+        self.entries = {}
+        # Классификация из прошлых запусков (--batch): ключ - путь, размер и mtime
+        self.known = known
+        self.classified = {}
+
+    def walk(self):
+        """Результат обхода дерева: [(root, dirs, files, pruned), ...]"""
+        if self.listing is None:
+            self.listing = [(root, list(dirs), list(files), pruned)
+                            for root, dirs, files, pruned in walk_tree(self.top, self.exclude)]
+            # Забываем файлы, которых больше нет в дереве
+            present = set()
+            for root, _, files, _ in self.listing:
+                base = os.path.normpath(root)
+                present.update(join_path(base, f) for f in files)
+            for key in [k for k in self.entries if k not in present]:
+                del self.entries[key]
+        return self.listing
+
+    def _entry(self, filepath):
+        return self.entries.setdefault(os.fspath(filepath), {})
+
+    def is_binary(self, filepath):
+        entry = self._entry(filepath)
+        if 'binary' not in entry:
+            entry['binary'] = self._classify(filepath)
+        return entry['binary']
+
+    def _classify(self, filepath):
+        if self.known is None:
+            return is_archive_or_binary(filepath)
+        try:
+            st = os.stat(filepath)
+        except OSError:
+            return is_archive_or_binary(filepath)
+        key = f"{os.path.realpath(filepath)}|{st.st_size}|{st.st_mtime_ns}"
+        binary = self.known.get(key)
+        if binary is None:
+            binary = is_archive_or_binary(filepath)
+        else:
+            STATS.add('classify_cache_hits')
+        self.classified[key] = binary
+        return binary
+
+    def section(self, filepath, filename):
+        entry = self._entry(filepath)
+        if 'section' not in entry:
+            entry['section'] = render_file_section(filepath, filename, self.top)
+        return entry['section']
+
+    def invalidate(self, paths):
+        """Сбрасывает кэш для изменённых файлов"""
+        for path in paths:
+            self.entries.pop(str(Path(path)), None)
+
+    def invalidate_listing(self):
+        """Сбрасывает обход дерева (файлы или каталоги появились/исчезли)"""
+        self.listing = None
+
+
 def is_archive_or_binary(filepath):
     """Проверяет, является ли файл архивом или бинарным файлом"""
-    ext = Path(filepath).suffix.lower()
+    ext = os.path.splitext(filepath)[1].lower()
     
     # Проверка по расширению
     if ext in ARCHIVE_EXTENSIONS or ext in BINARY_EXTENSIONS:
+        STATS.add('binary_by_extension')
         return True
     
     # Проверка по MIME-типу
     try:
-        mime_type, _ = mimetypes.guess_type(filepath)
+        with STATS.phase('mime'):
+            mime_type, _ = mimetypes.guess_type(filepath)
         if mime_type:
             if mime_type.startswith('application/') and any(
                 archive in mime_type for archive in ['zip', 'rar', '7z', 'tar', 'gzip']
             ):
+                STATS.add('binary_by_mime')
                 return True
             if mime_type.startswith('application/octet-stream'):
+                STATS.add('binary_by_mime')
                 return True
     except:
         pass
     
     # Эвристическая проверка на бинарный файл
     try:
-        with open(filepath, 'rb') as f:
-            chunk = f.read(1024)
-            if b'\x00' in chunk:  # Нулевые байты часто встречаются в бинарных файлах
-                return True
+        with STATS.phase('sniff'):
+            with open(filepath, 'rb') as f:
+                chunk = f.read(1024)
+        STATS.add('bytes_read', len(chunk))
+        if b'\x00' in chunk:  # Нулевые байты часто встречаются в бинарных файлах
+            STATS.add('binary_by_content')
+            return True
     except:
         pass
     
@@ -64,13 +286,18 @@ def is_archive_or_binary(filepath):
 def read_file_content(filepath, max_lines=500):
     """Читает содержимое файла с ограничением по количеству строк"""
     try:
-        with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
+        with STATS.phase('open'):
+            f = open(filepath, 'r', encoding='utf-8', errors='ignore')
+        with f, STATS.phase('read'):
             lines = []
             for i, line in enumerate(f):
                 if i >= max_lines:
                     lines.append(f"\n... [файл обрезан, показано {max_lines} из ... строк]\n")
                     break
                 lines.append(line)
+            STATS.add('files_read')
+            # Позиция в файле учитывает и упреждающее чтение буфера
+            STATS.add('bytes_read', f.buffer.raw.tell())
             return ''.join(lines)
     except UnicodeDecodeError:
         try:
@@ -88,30 +315,30 @@ def read_file_content(filepath, max_lines=500):
     except Exception as e:
         return f"[Ошибка при чтении файла: {str(e)}]\n"
 
-def get_directory_structure():
+def get_directory_structure(cache=None):
     """Возвращает структуру каталогов и файлов в виде markdown"""
+    if cache is None:
+        cache = SnapshotCache()
     structure_lines = []
     
     # Собираем все элементы для отображения
     all_items = []
     ignored_count = 0
     
-    for root, dirs, files in os.walk('.'):
-        # Фильтруем игнорируемые каталоги
-        original_dirs = dirs.copy()
-        dirs[:] = [d for d in dirs if d not in IGNORED_ITEMS]
-        ignored_count += len([d for d in original_dirs if d in IGNORED_ITEMS])
-        
+    for root, dirs, files, pruned in cache.walk():
+        ignored_count += pruned
+        base = os.path.normpath(root)
+
         # Относительный путь
-        rel_root = Path(root).relative_to('.') if root != '.' else Path('.')
+        rel_root = Path(root).relative_to(cache.top) if root != cache.top else Path('.')
         
         # Добавляем текущую директорию как заголовок
-        if root == '.':
+        if root == cache.top:
             structure_lines.append("## Структура проекта\n\n")
             structure_lines.append("```\n")
         
         # Вычисляем отступ для текущего уровня
-        level = 0 if root == '.' else len(rel_root.parts)
+        level = 0 if root == cache.top else len(rel_root.parts)
         indent = "  " * level
         
         # Добавляем каталоги
@@ -122,10 +349,10 @@ def get_directory_structure():
         for f in sorted(files):
             if f in IGNORED_ITEMS:
                 ignored_count += 1
+                STATS.add('files_ignored')
                 continue
             
-            filepath = Path(root) / f
-            if is_archive_or_binary(filepath):
+            if cache.is_binary(join_path(base, f)):
                 ignored_count += 1
                 continue
             
@@ -134,7 +361,7 @@ def get_directory_structure():
                 continue
             
             # Определяем иконку по типу файла
-            ext = Path(f).suffix.lower()
+            ext = os.path.splitext(f)[1].lower()
             icon = "📄"  # обычный файл
             
             if ext in ['.py', '.js', '.ts', '.java', '.cpp', '.c', '.h', '.go', '.rs']:
@@ -161,9 +388,30 @@ def get_directory_structure():
     
     return ''.join(structure_lines)
 
-def collect_files():
+def render_file_section(filepath, filename, top='.'):
+    """Секция markdown для одного файла: (элементы вывода, число строк)"""
+    rel_path = filepath.relative_to(top)
+    content = read_file_content(filepath)
+    content_lines = content.count('\n') + 1
+    
+    # Добавляем разделитель и информацию о файле
+    items = [f"\n{'='*60}\n", f"### Файл: `{rel_path}`\n\n"]
+    
+    # Добавляем содержимое файла в блок кода с указанием расширения
+    ext = Path(filename).suffix
+    lang = ext[1:] if ext else 'text'
+    items.append(f"```{lang}\n")
+    items.append(content)
+    if not content.endswith('\n'):
+        items.append('\n')
+    items.append("```\n\n")
+    return items, content_lines
+
+def collect_files(cache=None):
     """Собирает все файлы и их содержимое"""
-    current_dir = Path('.')
+    if cache is None:
+        cache = SnapshotCache()
+    current_dir = Path(cache.top)
     all_content = []
     total_lines = 0
     
@@ -172,37 +420,36 @@ def collect_files():
     all_content.append(f"**Текущий каталог:** `{current_dir.absolute()}`\n\n")
     
     # Добавляем структуру каталогов
-    all_content.append(get_directory_structure())
+    all_content.append(get_directory_structure(cache))
     
     # Заголовок для содержимого файлов
     all_content.append("## Содержимое файлов\n\n")
     
     # Рекурсивный обход каталогов для сбора содержимого файлов
-    for root, dirs, files in os.walk('.'):
-        # Игнорируем служебные каталоги
-        dirs[:] = [d for d in dirs if d not in IGNORED_ITEMS]
-        
+    for root, dirs, files, _ in cache.walk():
+        base = os.path.normpath(root)
+        # Служебные каталоги отсекает walk_tree
         for filename in files:
             # Пропускаем игнорируемые файлы
             if filename in IGNORED_ITEMS:
+                STATS.add('files_ignored')
                 continue
             
-            filepath = Path(root) / filename
-            
             # Пропускаем архивные и бинарные файлы
-            if is_archive_or_binary(filepath):
+            if cache.is_binary(join_path(base, filename)):
                 continue
             
             # Пропускаем сам файл toAI.md
             if filename == 'toAI.md':
                 continue
             
-            # Читаем содержимое файла
-            rel_path = filepath.relative_to('.')
-            content = read_file_content(filepath)
+            filepath = Path(root) / filename
+            
+            # Читаем содержимое файла (или берём готовую секцию из кэша)
+            rel_path = filepath.relative_to(cache.top)
+            section, content_lines = cache.section(filepath, filename)
             
             # Подсчитываем строки
-            content_lines = content.count('\n') + 1
             total_lines += content_lines
             
             # Проверяем ограничение в 1000 строк
@@ -212,36 +459,527 @@ def collect_files():
                 all_content.append(f"Сбор данных остановлен на файле: `{rel_path}`\n")
                 return '\n'.join(all_content), total_lines, True
             
-            # Добавляем разделитель и информацию о файле
-            all_content.append(f"\n{'='*60}\n")
-            all_content.append(f"### Файл: `{rel_path}`\n\n")
-            
-            # Добавляем содержимое файла в блок кода с указанием расширения
-            ext = Path(filename).suffix
-            lang = ext[1:] if ext else 'text'
-            all_content.append(f"```{lang}\n")
-            all_content.append(content)
-            if not content.endswith('\n'):
-                all_content.append('\n')
-            all_content.append("```\n\n")
+            all_content.extend(section)
     
     return '\n'.join(all_content), total_lines, False
 
+
+def timed_collect(cache):
+    """collect_files() с учётом времени формирования markdown в фазе render"""
+    started = time.perf_counter()
+    inner_before = sum(STATS.timings.values())
+    result = collect_files(cache)
+    # Всё, что не ушло на обход и чтение, - формирование markdown
+    STATS.timings['render'] += (time.perf_counter() - started) - (sum(STATS.timings.values()) - inner_before)
+    return result
+
+# ==============================
+# Режим --watch
+# ==============================
+# Флаги inotify из <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+              IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+# События, после которых нужно заново обойти дерево
+STRUCTURE_EVENTS = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE_SELF | IN_MOVE_SELF
+
+
+class Changes:
+    """Накопленные изменения в дереве"""
+
+    def __init__(self):
+        self.files = set()
+        self.structure = False
+
+    def __bool__(self):
+        return bool(self.files) or self.structure
+
+    def update(self, other):
+        self.files |= other.files
+        self.structure = self.structure or other.structure
+
+
+class InotifyWatcher:
+    """Подписка на события файловой системы через inotify (Linux)"""
+
+    def __init__(self, top):
+        import ctypes
+        import ctypes.util
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1")
+        self.dirs = {}
+        # Ошибка подписки на новый каталог во время слежения (ENOSPC и т.п.)
+        self.failed = None
+        try:
+            self.add_tree(top)
+        except OSError:
+            os.close(self.fd)
+            raise
+
+    def add_watch(self, path):
+        import ctypes
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            error = ctypes.get_errno()
+            if error in (errno.ENOENT, errno.ENOTDIR):
+                # Каталог успели удалить или заменить файлом - следить не за чем
+                return
+            # ENOSPC - исчерпан fs.inotify.max_user_watches
+            raise OSError(error, f"inotify_add_watch {path}: {os.strerror(error)}")
+        self.dirs[wd] = path
+
+    def add_tree(self, top):
+        for root, dirs, _ in os.walk(top):
+            dirs[:] = [d for d in dirs if d not in IGNORED_ITEMS]
+            self.add_watch(root)
+
+    def wait(self, timeout):
+        """Ждёт события не дольше timeout секунд (None - бесконечно)"""
+        import select
+        import struct
+        changes = Changes()
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return changes
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return changes
+
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = struct.unpack_from('iIII', data, offset)
+            raw_name = data[offset + 16:offset + 16 + length].rstrip(b'\0')
+            offset += 16 + length
+
+            if mask & IN_Q_OVERFLOW:
+                # Очередь переполнена: события потеряны, пересобираем всё
+                changes.structure = True
+                changes.files.add('*')
+                continue
+            if mask & IN_IGNORED:
+                self.dirs.pop(wd, None)
+                continue
+            directory = self.dirs.get(wd)
+            if directory is None:
+                continue
+            name = os.fsdecode(raw_name)
+            if name in IGNORED_ITEMS:
+                continue
+            path = str(Path(directory) / name) if name else directory
+
+            if mask & STRUCTURE_EVENTS:
+                changes.structure = True
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    # Новый каталог (в том числе перенесённый целиком) тоже отслеживаем
+                    try:
+                        self.add_tree(path)
+                    except OSError as e:
+                        # Изменения в каталоге без подписки не увидим: пересобираем всё,
+                        # а watch() переключится на опрос
+                        self.failed = e
+                        changes.structure = True
+                        changes.files.add('*')
+            elif name:
+                changes.files.add(path)
+        return changes
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """Запасной вариант: периодическое сравнение mtime и размеров файлов"""
+
+    def __init__(self, top, interval):
+        self.top = top
+        self.interval = interval
+        self.state = self.scan()
+
+    def scan(self):
+        state = {}
+        for root, dirs, files in os.walk(self.top):
+            dirs[:] = [d for d in dirs if d not in IGNORED_ITEMS]
+            for filename in files:
+                if filename in IGNORED_ITEMS:
+                    continue
+                path = str(Path(root) / filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                state[path] = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        return state
+
+    def wait(self, timeout):
+        changes = Changes()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            pause = self.interval if deadline is None else min(self.interval, max(deadline - time.monotonic(), 0))
+            time.sleep(pause)
+            state = self.scan()
+            if state.keys() != self.state.keys():
+                changes.structure = True
+            changes.files = {p for p in state.keys() | self.state.keys() if state.get(p) != self.state.get(p)}
+            self.state = state
+            if changes or (deadline is not None and time.monotonic() >= deadline):
+                return changes
+
+    def close(self):
+        pass
+
+
+def create_watcher(top, poll, interval):
+    """inotify, если доступен, иначе опрос"""
+    if not poll and sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(top), 'inotify'
+        except (OSError, AttributeError) as e:
+            print(f"⚠️  inotify недоступен ({e}), используется опрос каждые {interval} с")
+    return PollingWatcher(top, interval), 'опрос'
+
+
+def write_snapshot(content, previous=None):
+    """Записывает toAI.md, только если содержимое изменилось"""
+    if content == previous:
+        return False
+    # Запись через временный файл: читатель не увидит наполовину записанный toAI.md
+    with STATS.phase('write'):
+        with open('toAI.md.tmp', 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace('toAI.md.tmp', 'toAI.md')
+    return True
+
+
+def watch(cache, content, debounce, max_delay, poll, interval):
+    """Следит за деревом и пересобирает toAI.md при изменениях"""
+    watcher, mode = create_watcher('.', poll, interval)
+    print(f"\n👀 Слежение за изменениями ({mode}), Ctrl+C для остановки...")
+    try:
+        while True:
+            changes = watcher.wait(None)
+            if not changes:
+                continue
+            # Пачки событий (сохранение в редакторе, git checkout) объединяем
+            deadline = time.monotonic() + max_delay
+            while time.monotonic() < deadline:
+                more = watcher.wait(debounce)
+                if not more:
+                    break
+                changes.update(more)
+
+            if getattr(watcher, 'failed', None):
+                print(f"⚠️  inotify: {watcher.failed}; дальше используется опрос каждые {interval} с"
+                      f" (лимит: sysctl fs.inotify.max_user_watches)", flush=True)
+                watcher.close()
+                watcher = PollingWatcher('.', interval)
+
+            started = time.perf_counter()
+            if '*' in changes.files:
+                cache.entries.clear()
+            cache.invalidate(changes.files - {'*'})
+            if changes.structure:
+                cache.invalidate_listing()
+            new_content, total_lines, exceeded = timed_collect(cache)
+            written = write_snapshot(new_content, content)
+            content = new_content
+            elapsed = time.perf_counter() - started
+            status = "обновлён" if written else "без изменений"
+            limit = " ⚠️ превышен лимит строк" if exceeded else ""
+            print(f"[{time.strftime('%H:%M:%S')}] toAI.md {status}: файлов изменено {len(changes.files)}, "
+                  f"строк {total_lines}, {elapsed * 1000:.0f} мс{limit}", flush=True)
+    except KeyboardInterrupt:
+        print("\nСлежение остановлено")
+    finally:
+        watcher.close()
+
+# ==============================
+# Пакетный режим --batch/--manifest
+# ==============================
+DEFAULT_BUNDLE_DIR = 'toAI_bundles'
+DEFAULT_CLASSIFY_CACHE = os.path.join(os.path.expanduser('~'), '.cache', 'save_toAI', 'classify.json')
+
+# Классификация из кэша и исключённые пути, передаются в рабочие процессы при их запуске
+_KNOWN = None
+_EXCLUDE = None
+
+
+def read_manifest(path):
+    """Корни проектов из файла: по одному на строку, # - комментарий"""
+    base = os.path.dirname(os.path.abspath(path))
+    roots = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            if line:
+                # Относительные пути считаются от каталога манифеста
+                roots.append(os.path.join(base, os.path.expanduser(line)))
+    return roots
+
+
+def load_classify_cache(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_classify_cache(path, known, results):
+    """Сливает классификации из рабочих процессов с кэшем и атомарно сохраняет его"""
+    # Записи обработанных корней заменяются свежими, чтобы кэш не рос бесконечно
+    prefixes = tuple(os.path.join(os.path.realpath(r['root']), '') for r in results if 'error' not in r)
+    merged = {key: value for key, value in known.items() if not key.startswith(prefixes)}
+    for result in results:
+        merged.update(result.get('classified', {}))
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(merged, f, separators=(',', ':'))
+    os.replace(tmp, path)
+    return len(merged)
+
+
+def bundle_names(roots):
+    """Имя файла для каждого корня: имя каталога, при совпадении - с номером"""
+    names, used = [], set()
+    for root in roots:
+        stem = os.path.basename(os.path.abspath(root)) or 'root'
+        name, n = f"{stem}.md", 2
+        while name in used:
+            name, n = f"{stem}-{n}.md", n + 1
+        used.add(name)
+        names.append(name)
+    return names
+
+
+def _init_worker(known, exclude):
+    global _KNOWN, _EXCLUDE
+    _KNOWN = known
+    _EXCLUDE = exclude
+
+
+def snapshot_root(root, bundle_path):
+    """Собирает один проект в рабочем процессе и возвращает сводку"""
+    global STATS
+    # Статистика своя для каждого корня, процесс обрабатывает их несколько
+    STATS = RunStats()
+    started = time.perf_counter()
+    try:
+        cache = SnapshotCache(root, known=_KNOWN, exclude=_EXCLUDE)
+        content, total_lines, exceeded = timed_collect(cache)
+        with STATS.phase('write'):
+            with open(bundle_path, 'w', encoding='utf-8') as f:
+                f.write(content)
+    except Exception as e:
+        return {'root': root, 'bundle': bundle_path, 'error': str(e)}
+    STATS.add('bytes_emitted', len(content.encode('utf-8')))
+    STATS.total = time.perf_counter() - started
+    return {
+        'root': root,
+        'bundle': bundle_path,
+        'lines': total_lines,
+        'exceeded': exceeded,
+        'files': sum(1 for entry in cache.entries.values() if 'section' in entry),
+        'seconds': round(STATS.total, 6),
+        'stats': STATS.to_dict(),
+        'classified': cache.classified,
+    }
+
+
+def write_index(output_dir, results, summary):
+    """index.md для чтения и index.json для скриптов"""
+    lines = ["# Снимки проектов\n\n",
+             f"Собрано: {summary['created']}, проектов: {len(results)}, "
+             f"процессов: {summary['jobs']}, время: {summary['wall_seconds']:.2f} с\n\n",
+             "| Проект | Файл | Строк | Файлов | Время, с | Примечание |\n",
+             "|---|---|---:|---:|---:|---|\n"]
+    for r in results:
+        bundle = os.path.basename(r['bundle'])
+        if 'error' in r:
+            lines.append(f"| `{r['root']}` | - | - | - | - | ❌ {r['error']} |\n")
+            continue
+        note = "⚠️ превышен лимит 1000 строк" if r['exceeded'] else ""
+        lines.append(f"| `{r['root']}` | [{bundle}]({bundle}) | {r['lines']} | {r['files']} | "
+                     f"{r['seconds']:.2f} | {note} |\n")
+    with open(os.path.join(output_dir, 'index.md'), 'w', encoding='utf-8') as f:
+        f.write(''.join(lines))
+    data = dict(summary)
+    data['projects'] = [{k: v for k, v in r.items() if k != 'classified'} for r in results]
+    with open(os.path.join(output_dir, 'index.json'), 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def run_batch(roots, output_dir, jobs, cache_path):
+    """Собирает снимки нескольких проектов пулом процессов"""
+    started = time.perf_counter()
+    missing = [r for r in roots if not os.path.isdir(r)]
+    for root in missing:
+        print(f"⚠️  Каталог не найден, пропущен: {root}")
+    roots = [r for r in roots if os.path.isdir(r)]
+    if not roots:
+        print("❌ Нет ни одного каталога для сбора")
+        return 1
+
+    os.makedirs(output_dir, exist_ok=True)
+    known = load_classify_cache(cache_path) if cache_path else None
+    jobs = max(1, min(jobs or os.cpu_count() or 1, len(roots)))
+    # Свои результаты не собираем, даже если они лежат внутри одного из корней
+    exclude = {os.path.realpath(output_dir)}
+    if cache_path:
+        exclude.update(os.path.realpath(p) for p in (cache_path, cache_path + '.tmp'))
+    print(f"Собираю {len(roots)} проектов в {output_dir}, процессов: {jobs}...")
+
+    bundles = [os.path.join(output_dir, name) for name in bundle_names(roots)]
+    results = [None] * len(roots)
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(known, exclude)) as pool:
+        futures = {pool.submit(snapshot_root, os.path.normpath(root), bundle): i
+                   for i, (root, bundle) in enumerate(zip(roots, bundles))}
+        for future in as_completed(futures):
+            result = future.result()
+            results[futures[future]] = result
+            if 'error' in result:
+                print(f"   ❌ {result['root']}: {result['error']}")
+            else:
+                limit = " ⚠️ превышен лимит строк" if result['exceeded'] else ""
+                print(f"   ✅ {result['root']}: строк {result['lines']}, "
+                      f"{result['seconds']:.2f} с{limit}", flush=True)
+    results += [{'root': root, 'bundle': '', 'error': "каталог не найден"} for root in missing]
+
+    summary = {
+        'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'jobs': jobs,
+        'wall_seconds': round(time.perf_counter() - started, 6),
+        'cpu_seconds': round(sum(r.get('seconds', 0) for r in results), 6),
+        'classify_cache_hits': sum(r['stats']['counters']['classify_cache_hits']
+                                   for r in results if 'stats' in r),
+    }
+    if cache_path:
+        summary['classify_cache_size'] = save_classify_cache(cache_path, known, results)
+    write_index(output_dir, results, summary)
+
+    print(f"\n📄 Индекс: {os.path.abspath(os.path.join(output_dir, 'index.md'))}")
+    print(f"⏱  {summary['wall_seconds']:.2f} с (сумма по проектам {summary['cpu_seconds']:.2f} с), "
+          f"из кэша классификации: {summary['classify_cache_hits']}")
+    return 1 if any('error' in r for r in results) else 0
+
 def main():
     """Основная функция"""
+    parser = argparse.ArgumentParser(description="Сбор файлов проекта в toAI.md для отправки в ИИ")
+    parser.add_argument('--stats', action='store_true',
+                        help="вывести время по фазам и счётчики файлов")
+    parser.add_argument('--stats-json', metavar='FILE',
+                        help="сохранить статистику в JSON ('-' - вывести в stdout)")
+    parser.add_argument('--profile', metavar='FILE',
+                        help="снять профиль cProfile и сохранить его в FILE")
+    parser.add_argument('--tracemalloc', action='store_true',
+                        help="отследить пиковое потребление памяти (замедляет работу)")
+    parser.add_argument('--watch', action='store_true',
+                        help="после сборки следить за изменениями и обновлять toAI.md")
+    parser.add_argument('--debounce', type=float, default=0.3,
+                        help="пауза без событий перед пересборкой в --watch, с")
+    parser.add_argument('--max-delay', type=float, default=2.0,
+                        help="максимальная задержка пересборки при непрерывных событиях, с")
+    parser.add_argument('--poll', action='store_true',
+                        help="не использовать inotify, опрашивать файлы")
+    parser.add_argument('--poll-interval', type=float, default=1.0,
+                        help="период опроса файлов без inotify, с")
+    batch = parser.add_argument_group("пакетный режим")
+    batch.add_argument('--batch', nargs='+', metavar='ROOT',
+                       help="собрать несколько проектов, по файлу на каждый")
+    batch.add_argument('--manifest', metavar='FILE',
+                       help="файл со списком каталогов проектов (по одному на строку)")
+    batch.add_argument('--output-dir', default=DEFAULT_BUNDLE_DIR,
+                       help=f"каталог для снимков и индекса (по умолчанию {DEFAULT_BUNDLE_DIR})")
+    batch.add_argument('-j', '--jobs', type=int,
+                       help="число процессов (по умолчанию - по числу ядер)")
+    batch.add_argument('--classify-cache', default=DEFAULT_CLASSIFY_CACHE, metavar='FILE',
+                       help="файл кэша классификации файлов между запусками")
+    batch.add_argument('--no-classify-cache', action='store_true',
+                       help="не использовать кэш классификации")
+    args = parser.parse_args()
+
+    if args.batch or args.manifest:
+        roots = list(args.batch or [])
+        if args.manifest:
+            roots += read_manifest(args.manifest)
+        cache_path = None if args.no_classify_cache else args.classify_cache
+        return run_batch(roots, args.output_dir, args.jobs, cache_path)
+
+    # Время фаз и счётчики замеряются, только если их кто-то увидит
+    STATS.enabled = bool(args.stats or args.stats_json or args.profile)
+
+    json_stream = sys.stdout
+    if args.stats_json == '-':
+        # В stdout - только JSON, сообщения уходят в stderr
+        sys.stdout = sys.stderr
+    try:
+        return snapshot(args, json_stream)
+    finally:
+        sys.stdout = json_stream
+
+
+def snapshot(args, json_stream):
+    """Один снимок текущего каталога в toAI.md (и --watch, если задан)"""
     print("Начинаю сбор файлов для анализа...")
+
+    profiler = None
+    if args.profile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    if args.tracemalloc:
+        import tracemalloc
+        tracemalloc.start(10)
+    started = time.perf_counter()
     
     # Создаем новый файл (перезаписываем, если существует)
     # Это автоматически очищает файл при создании
-    with open('toAI.md', 'w', encoding='utf-8') as f:
-        f.write('')  # Создаем пустой файл
+    with STATS.phase('write'):
+        with open('toAI.md', 'w', encoding='utf-8') as f:
+            f.write('')  # Создаем пустой файл
     
     # Собираем содержимое
-    content, total_lines, exceeded = collect_files()
+    cache = SnapshotCache()
+    content, total_lines, exceeded = timed_collect(cache)
     
     # Записываем результат (полная перезапись)
-    with open('toAI.md', 'w', encoding='utf-8') as f:
-        f.write(content)
+    with STATS.phase('write'):
+        with open('toAI.md', 'w', encoding='utf-8') as f:
+            f.write(content)
+    STATS.add('bytes_emitted', len(content.encode('utf-8')))
+    STATS.total = time.perf_counter() - started
+
+    if profiler:
+        profiler.disable()
+        profiler.dump_stats(args.profile)
+
+    memory = None
+    if args.tracemalloc:
+        current, peak = tracemalloc.get_traced_memory()
+        top = tracemalloc.take_snapshot().statistics('lineno')[:10]
+        tracemalloc.stop()
+        memory = {
+            'current_bytes': current,
+            'peak_bytes': peak,
+            'top': [{'location': str(stat.traceback), 'bytes': stat.size, 'count': stat.count} for stat in top],
+        }
     
     print(f"\n✅ Файл toAI.md успешно создан/перезаписан!")
     print(f"📊 Количество строк: {total_lines}")
@@ -253,5 +991,31 @@ def main():
     
     print(f"\n📄 Файл готов для отправки в ИИ: {os.path.abspath('toAI.md')}")
 
+    if args.stats:
+        print(STATS.report())
+        if memory:
+            print(f"\n🧠 Пик памяти (tracemalloc): {memory['peak_bytes'] / 1024 / 1024:.1f} МБ")
+            for item in memory['top'][:5]:
+                print(f"   {item['bytes'] / 1024:>10.1f} КБ  {item['location']}")
+        if profiler:
+            import pstats
+            print(f"\n🔬 Профиль сохранён в {args.profile}, самые затратные функции:")
+            pstats.Stats(args.profile, stream=sys.stdout).sort_stats('cumulative').print_stats(15)
+
+    if args.stats_json:
+        data = STATS.to_dict()
+        data['total_lines'] = total_lines
+        data['exceeded'] = exceeded
+        if memory:
+            data['memory'] = memory
+        if args.stats_json == '-':
+            print(json.dumps(data, ensure_ascii=False, indent=2), file=json_stream)
+        else:
+            with open(args.stats_json, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+
+    if args.watch:
+        watch(cache, content, args.debounce, args.max_delay, args.poll, args.poll_interval)
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
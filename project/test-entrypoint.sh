@@ -0,0 +1,49 @@
+#!/bin/bash
+# Запуск тестового сервера (профиль test в docker-compose.yml).
+# PGDATA находится в tmpfs. При первом запуске выполняются initdb и
+# init-scripts, результат сохраняется как шаблон в томе
+# postgres-1c-test-template. Следующие запуски только копируют шаблон.
+set -euo pipefail
+
+PGDATA="${PGDATA:-/var/lib/postgresql/data}"
+TEMPLATE_DIR="${TEMPLATE_DIR:-/var/lib/postgresql/template}"
+INIT_DIR="${INIT_DIR:-/docker-entrypoint-initdb.d}"
+CONFIG_FILE="${CONFIG_FILE:-/etc/postgresql/postgresql.test.conf}"
+HBA_FILE="${HBA_FILE:-/etc/postgresql/pg_hba.conf}"
+POSTGRES_USER="${POSTGRES_USER:-postgres}"
+POSTGRES_DB="${POSTGRES_DB:-postgres}"
+
+. "$(dirname "$0")/pg-functions.sh"
+
+# tmpfs и том шаблона создаются от root: отдаём их postgres и перезапускаемся от него
+if [ "$(id -u)" = "0" ]; then
+    mkdir -p "$PGDATA" "$TEMPLATE_DIR" /var/run/postgresql
+    chown postgres:postgres "$PGDATA" "$TEMPLATE_DIR" /var/run/postgresql
+    chmod 700 "$PGDATA"
+    exec setpriv --reuid=postgres --regid=postgres --init-groups /bin/bash "$0" "$@"
+fi
+
+pg_find_bin
+
+# Шаблон пересоздаётся при изменении init-scripts, версии сервера или
+# параметров initdb (пользователь, пароль, локаль, база). Пароль попадает
+# в файл только в составе хеша
+stamp="$( (postgres --version
+           printf '%s\n' "$POSTGRES_USER" "${POSTGRES_PASSWORD:-postgres}" "${LANG:-ru_RU.UTF-8}" "$POSTGRES_DB"
+           cat "$INIT_DIR"/* 2>/dev/null) | sha256sum | cut -d' ' -f1)"
+
+if [ -s "$TEMPLATE_DIR/data/PG_VERSION" ] && [ "$(cat "$TEMPLATE_DIR/stamp" 2>/dev/null)" = "$stamp" ]; then
+    echo "Восстановление PGDATA из шаблона..."
+    cp -a "$TEMPLATE_DIR/data/." "$PGDATA/"
+else
+    echo "Шаблон отсутствует или устарел: initdb и init-scripts..."
+    rm -rf "${PGDATA:?}"/*
+    pg_init_cluster -c "config_file=$CONFIG_FILE" -c "hba_file=$HBA_FILE"
+
+    rm -rf "$TEMPLATE_DIR/data" "$TEMPLATE_DIR/stamp"
+    cp -a "$PGDATA" "$TEMPLATE_DIR/data"
+    echo "$stamp" > "$TEMPLATE_DIR/stamp"
+    echo "Шаблон сохранён в $TEMPLATE_DIR"
+fi
+
+exec postgres -D "$PGDATA" -c config_file="$CONFIG_FILE" -c hba_file="$HBA_FILE"
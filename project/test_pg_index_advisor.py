@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Тесты разбора запросов и поиска лишних индексов pg_index_advisor.py
+
+Запуск: python3 -m pytest -q project/test_pg_index_advisor.py
+"""
+
+import zlib
+
+import pytest
+
+from pg_index_advisor import (MIN_UNUSED_INDEX_SIZE, candidate_columns, extract_predicates,
+                              find_redundant_indexes, is_covered)
+from pg_log_analyzer import normalize_query
+
+
+def make_index(name, columns, relid=1, **overrides):
+    """Строка INDEXES_SQL с разумными значениями по умолчанию"""
+    index = {
+        'indexrelid': zlib.crc32(name.encode()),
+        'relid': relid,
+        'schema': 'public',
+        'table': 't',
+        'index': name,
+        'idx_scan': 10,
+        'size': 8192,
+        'is_unique': False,
+        'is_primary': False,
+        'is_valid': True,
+        'is_constraint': False,
+        'columns': columns,
+        'indkey': ' '.join(str(ord(c[0])) for c in columns),
+        'indclass': ' '.join('1978' for _ in columns),
+        'expressions': None,
+        'predicate': None,
+        'method': 'btree',
+        'definition': f"CREATE INDEX {name} ON public.t USING btree ({', '.join(columns)})",
+    }
+    index.update(overrides)
+    return index
+
+
+# ==============================
+# Предикаты
+# ==============================
+@pytest.mark.parametrize('sql, expected', [
+    # Присваивание SET - не условие: записываемая колонка в индекс не попадает
+    ("UPDATE _InfoRg5 SET _Fld1 = 5 WHERE _Fld2 = 7",
+     {'_inforg5': [('_fld2', '=')]}),
+    ("UPDATE _InfoRg5 SET _Fld1 = 5, _Fld3 = 6", {}),
+    ("INSERT INTO t (a) VALUES (1) ON CONFLICT (a) DO UPDATE SET b = 2 WHERE t.c = 3",
+     {'t': [('c', '=')]}),
+    # Выражения списка выборки игнорируются, IN и диапазоны распознаются
+    ("SELECT CASE WHEN a = 1 THEN 2 END FROM t WHERE b IN (1, 2) AND (c = 3 OR d > 4) ORDER BY e",
+     {'t': [('b', 'in'), ('c', '='), ('d', '>')]}),
+    # Алиасы, JOIN ... ON и подзапрос в WHERE
+    ("SELECT * FROM _Document1 d JOIN _Reference2 AS r ON r._IDRRef = d._Fld3 AND r._Fld4 = 0 "
+     "WHERE d._Date >= $1 AND d._Fld5 IN (SELECT x FROM _InfoRg9 i WHERE i._Fld9 = 1) AND d._Fld6 = 2",
+     {'_reference2': [('_fld4', '=')],
+      '_document1': [('_date', '>='), ('_fld6', '=')],
+      '_inforg9': [('_fld9', '=')]}),
+    # Без алиаса колонка относится к таблице, только если таблица одна
+    ("SELECT * FROM a JOIN b ON a.id = b.id WHERE x = 1", {}),
+    ('SELECT * FROM "Order" o WHERE o."Where" = 1 LIMIT 10', {'Order': [('Where', '=')]}),
+])
+def test_extract_predicates(sql, expected):
+    assert extract_predicates(normalize_query(sql)) == expected
+
+
+def test_extract_predicates_keeps_first_operator_per_column():
+    normalized = normalize_query("SELECT * FROM t WHERE a = 1 AND a > 0 AND b < 5")
+    assert extract_predicates(normalized) == {'t': [('a', '='), ('b', '<')]}
+
+
+# ==============================
+# Кандидаты и покрытие
+# ==============================
+@pytest.mark.parametrize('predicates, expected', [
+    ([('d', '>'), ('a', '='), ('b', 'in')], ['a', 'b', 'd']),
+    ([('a', '='), ('b', '='), ('c', '='), ('d', '=')], ['a', 'b', 'c']),
+    ([('d', '>'), ('e', '<')], ['d']),
+    ([], []),
+])
+def test_candidate_columns(predicates, expected):
+    assert candidate_columns(predicates) == expected
+
+
+def test_is_covered():
+    indexes = [make_index('t_b_a_d', ['b', 'a', 'd'])]
+    # Равенства в любом порядке, колонка диапазона - последней
+    assert is_covered(['a', 'b', 'd'], indexes)
+    assert is_covered(['b', 'a'], indexes)
+    assert is_covered(['b'], indexes)
+    assert not is_covered(['a'], indexes)
+    assert not is_covered(['a', 'd', 'b'], indexes)
+    assert not is_covered(['b', 'a', 'd', 'e'], indexes)
+
+
+@pytest.mark.parametrize('overrides', [
+    {'method': 'hash'},
+    {'expressions': 'lower(b)'},
+    {'predicate': '(a > 0)'},
+])
+def test_is_covered_ignores_special_indexes(overrides):
+    assert not is_covered(['b'], [make_index('t_b', ['b'], **overrides)])
+
+
+# ==============================
+# Лишние индексы
+# ==============================
+def test_find_redundant_indexes():
+    tables = [{'relid': 1, 'writes': 1000}]
+    indexes = [
+        make_index('t_pkey', ['id'], is_primary=True, is_unique=True, is_constraint=True),
+        make_index('t_id_copy', ['id'], idx_scan=50),
+        make_index('t_a', ['a'], idx_scan=500),
+        make_index('t_a_b', ['a', 'b'], idx_scan=5),
+        make_index('t_c_unused', ['c'], idx_scan=0, size=MIN_UNUSED_INDEX_SIZE),
+        make_index('t_e_small_unused', ['e'], idx_scan=0),
+        make_index('t_f_invalid', ['f'], is_valid=False),
+        make_index('t_g_unique', ['g'], is_unique=True, idx_scan=0, size=MIN_UNUSED_INDEX_SIZE),
+    ]
+    findings = {f['index']: f for f in find_redundant_indexes(tables, indexes)}
+
+    assert {name: f['kind'] for name, f in findings.items()} == {
+        't_id_copy': 'duplicate',
+        't_a': 'redundant',
+        't_c_unused': 'unused',
+        't_f_invalid': 'invalid',
+    }
+    # Дубликат ограничения удаляется, само ограничение - нет
+    assert 't_pkey' in findings['t_id_copy']['reason']
+    assert findings['t_a']['sql'] == 'DROP INDEX CONCURRENTLY "public"."t_a";'
+    assert findings['t_c_unused']['benefit_ms'] > 0
+
+
+def test_find_redundant_indexes_keeps_most_used_duplicate():
+    indexes = [make_index('t_a_1', ['a'], idx_scan=1), make_index('t_a_2', ['a'], idx_scan=100)]
+    findings = find_redundant_indexes([{'relid': 1, 'writes': 0}], indexes)
+    assert [f['index'] for f in findings] == ['t_a_1']
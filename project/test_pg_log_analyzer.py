@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Тесты pg_log_analyzer.py: нормализация, гистограмма, разбор журналов
+
+Запуск: python3 -m pytest -q project/test_pg_log_analyzer.py
+"""
+
+import csv
+import io
+import sys
+
+import pytest
+
+import pg_log_analyzer
+from pg_log_analyzer import (DurationHistogram, LogAnalyzer, fingerprint, normalize_query,
+                             parse_csvlog, parse_stderr)
+
+
+@pytest.mark.parametrize('sql, expected', [
+    # Dollar-строки без тега и с тегом, в том числе вложенные $$ внутри $fn$
+    ("SELECT $$a 'b' c$$, 1", "select ?, ?"),
+    ("SELECT $fn$ body $$ inner $$ $fn$", "select ?"),
+    ("DO $_x1$ BEGIN PERFORM 1; END $_x1$", "do ?"),
+    # E-строки с экранированием и обычные строки с удвоенной кавычкой
+    ("SELECT E'it\\'s', 'a''b'", "select ?, ?"),
+    ("SELECT e'\\n' || x'1F'", "select ? || ?"),
+    # Параметры подготовленных запросов
+    ("SELECT * FROM t WHERE a = $1 AND b = $12", "select * from t where a = ? and b = ?"),
+    # Числа: целые, дробные, экспоненциальные; идентификаторы с цифрами не трогаются
+    ("SELECT 1, 2.5, .5, 1e10, 3.0E-2 FROM _Reference42", "select ?, ?, ?, ?, ? from _reference42"),
+    # Списки IN и VALUES сворачиваются независимо от длины
+    ("SELECT * FROM t WHERE id IN (1, 2, 3)", "select * from t where id in (...)"),
+    ("SELECT * FROM t WHERE id in ($1,$2)", "select * from t where id in (...)"),
+    ("INSERT INTO t VALUES (1, 'a'), (2, 'b');", "insert into t values (...)"),
+    # Комментарии и форматирование
+    ("SELECT /* hint */ a  -- tail\n FROM\tt ;", "select a from t"),
+    ('SELECT "Поле" FROM "Таблица"', 'select "Поле" from "Таблица"'),
+])
+def test_normalize_query(sql, expected):
+    assert normalize_query(sql) == expected
+
+
+def test_same_fingerprint_for_different_literals():
+    first = normalize_query("SELECT * FROM t WHERE id IN (1, 2) AND s = $$x$$")
+    second = normalize_query("select *\nfrom t where id in (7,8,9) and s = $q$y$q$")
+    assert fingerprint(first) == fingerprint(second)
+
+
+def test_unterminated_dollar_quote_does_not_swallow_query():
+    assert normalize_query("SELECT $$abc") == "select $ $ abc"
+
+
+# ==============================
+# Гистограмма
+# ==============================
+@pytest.mark.parametrize('q', [0.5, 0.95])
+def test_histogram_quantile_within_bucket_error(q):
+    histogram = DurationHistogram()
+    values = [i / 10 for i in range(1, 10001)]
+    for value in values:
+        histogram.add(value)
+    exact = values[int(q * len(values)) - 1]
+    # Корзина - 1/8 октавы, середина отстоит от края не больше чем на ~4.4%
+    assert abs(histogram.quantile(q) - exact) / exact < 0.09
+
+
+def test_histogram_edge_cases():
+    histogram = DurationHistogram()
+    assert histogram.quantile(0.5) == 0.0
+    histogram.add(0.0)
+    histogram.add(7.0)
+    assert histogram.quantile(0.5) == 0.0
+    # Оценка не превышает реального максимума
+    assert histogram.quantile(1.0) == 7.0
+
+
+# ==============================
+# Разбор журналов
+# ==============================
+def test_parse_stderr_continuation_and_database():
+    lines = [
+        "2024-05-01 10:00:00.000 MSK [101] user1@base1 LOG:  duration: 12.5 ms  statement: SELECT a\n",
+        "\tFROM t\n",
+        "\tWHERE id = 1\n",
+        "2024-05-01 10:00:01.000 MSK [101] user1@base1 DETAIL:  parameters: $1 = '5'\n",
+        "2024-05-01 10:00:02.000 MSK [102] @ LOG:  checkpoint starting: time\n",
+        "мусор без префикса\n",
+        "2024-05-01 10:00:03.000 MSK [103] user2@base2 ERROR:  relation \"x\" does not exist\n",
+    ]
+    entries = list(parse_stderr(lines))
+    assert entries == [
+        ('LOG', 'duration: 12.5 ms  statement: SELECT a\nFROM t\nWHERE id = 1', 'base1'),
+        ('DETAIL', "parameters: $1 = '5'", 'base1'),
+        ('LOG', 'checkpoint starting: time', ''),
+        ('ERROR', 'relation "x" does not exist', 'base2'),
+    ]
+
+    # DETAIL и ERROR не попадают в статистику запросов
+    analyzer = LogAnalyzer()
+    for entry in entries:
+        analyzer.feed(*entry)
+    assert analyzer.entries == 4
+    [(_, stats)] = analyzer.top()
+    assert stats.query == 'select a from t where id = ?'
+    assert stats.databases == {'base1': 1}
+
+
+def test_parse_csvlog_multiline_message():
+    row = ['2024-05-01 10:00:00.000 MSK', 'user1', 'base1', '101', '[local]', 'sess', '1',
+           'SELECT', '2024-05-01 10:00:00 MSK', '3/4', '0', 'LOG', '00000',
+           'duration: 3.0 ms  statement: SELECT "a,b"\nFROM t\nWHERE x = \'y\'']
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(row)
+    csv.writer(buffer).writerow(row[:5])  # обрезанная строка пропускается
+    lines = buffer.getvalue().splitlines(keepends=True)
+    assert len(lines) > 3
+
+    entries = list(parse_csvlog(lines))
+    assert entries == [('LOG', row[13], 'base1')]
+
+
+# ==============================
+# Режим --follow
+# ==============================
+def test_follow_reports_on_quiet_log(tmp_path, monkeypatch, capsys):
+    log = tmp_path / 'postgresql.log'
+    log.write_text('')
+    idle_calls = []
+
+    def fake_sleep(_):
+        idle_calls.append(1)
+        # Третья пауза без новых строк - выходим, как по Ctrl+C
+        if len(idle_calls) >= 3:
+            raise KeyboardInterrupt
+
+    monkeypatch.setattr(pg_log_analyzer.time, 'sleep', fake_sleep)
+    monkeypatch.setattr(sys, 'argv', ['pg_log_analyzer.py', '--follow', str(log), '--report-every', '0'])
+    assert pg_log_analyzer.main() == 0
+    # Отчёт после каждой паузы и финальный при остановке
+    assert capsys.readouterr().out.count('Записей журнала: 0') >= 3
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Тесты клиента pgwire.py против заглушки сервера pgwire_stub.py
+
+Запуск: python3 -m pytest -q project/test_pgwire.py
+"""
+
+import asyncio
+import functools
+
+import pytest
+
+import pgwire
+from pgwire_stub import StubServer
+
+PASSWORD = 'secret'
+
+
+def run_async(test):
+    """Выполняет корутину-тест в своём цикле событий (без pytest-asyncio)"""
+    @functools.wraps(test)
+    def wrapper(*args, **kwargs):
+        return asyncio.run(test(*args, **kwargs))
+    return wrapper
+
+
+def with_connection(test):
+    """Тест получает соединение с новой заглушкой сервера"""
+    async def run():
+        async with StubServer(password=PASSWORD) as server:
+            conn = await pgwire.connect('127.0.0.1', server.port, password=PASSWORD)
+            try:
+                await test(conn)
+            finally:
+                await conn.close()
+
+    # Без functools.wraps: pytest принял бы параметр conn за фикстуру
+    def wrapper():
+        asyncio.run(run())
+    wrapper.__name__ = wrapper.__qualname__ = test.__name__
+    return wrapper
+
+
+# ==============================
+# Аутентификация
+# ==============================
+@pytest.mark.parametrize('auth', ['trust', 'password', 'md5', 'scram-sha-256'])
+@run_async
+async def test_auth(auth):
+    async with StubServer(auth=auth, password=PASSWORD) as server:
+        async with await pgwire.connect('127.0.0.1', server.port, password=PASSWORD) as conn:
+            assert await conn.fetchval("SELECT 1") == 1
+            assert conn.backend_pid is not None
+            assert 'server_version' in conn.parameters
+
+        if auth == 'trust':
+            conn = await pgwire.connect('127.0.0.1', server.port, password='wrong')
+            await conn.close()
+            return
+        with pytest.raises(pgwire.PgError) as excinfo:
+            await pgwire.connect('127.0.0.1', server.port, password='wrong')
+        assert excinfo.value.code == '28P01'
+
+
+# ==============================
+# Запросы, конвейер, отмена и транзакции
+# ==============================
+@with_connection
+async def test_simple_and_extended(conn):
+    results = await conn.query(
+        "CREATE TABLE t (id int, name text); INSERT INTO t VALUES (1, 'a'), (2, 'b''c'); SELECT * FROM t")
+    assert len(results) == 3
+    assert results[1].rowcount == 2
+    assert results[2].rows == [(1, 'a'), (2, "b'c")]
+
+    await conn.execute("INSERT INTO t (id, name) VALUES ($1, $2)", 3, None)
+    assert await conn.fetchval("SELECT count(*) FROM t") == 3
+    assert (await conn.fetch("SELECT * FROM t"))[-1] == (3, None)
+
+
+@with_connection
+async def test_pipelined_error_does_not_break_later_requests(conn):
+    requests = [conn.execute("SELECT $1::int", i) for i in range(50)]
+    requests.insert(25, conn.execute("SELECT * FROM missing"))
+    results = await asyncio.gather(*requests, return_exceptions=True)
+
+    error = results.pop(25)
+    assert isinstance(error, pgwire.PgError)
+    assert error.code == '42P01'
+    assert [r.rows[0][0] for r in results] == list(range(50))
+    assert await conn.fetchval("SELECT 'alive'") == 'alive'
+
+
+@with_connection
+async def test_elapsed_excludes_queue_wait(conn):
+    results = await asyncio.gather(*(conn.execute("SELECT pg_sleep(0.2)") for _ in range(3)))
+    # Последняя команда ждала две предыдущие, но её время - только своё
+    for result in results:
+        assert 0.15 < result.elapsed < 0.35
+
+
+@with_connection
+async def test_pipeline_with_shared_sync(conn):
+    with pytest.raises(pgwire.PgError) as excinfo:
+        await conn.pipeline(["SELECT 1", ("SELECT $1::int", [2]), "SELECT 1/0", "SELECT 3"])
+    assert excinfo.value.code == '22012'
+    assert conn.transaction_status == 'I'
+
+    results = await conn.pipeline(["SELECT 1", ("SELECT $1::int", [2])])
+    assert [r.rows for r in results] == [[(1,)], [(2,)]]
+
+
+@with_connection
+async def test_cancel(conn):
+    task = asyncio.ensure_future(conn.execute("SELECT pg_sleep(5)"))
+    await asyncio.sleep(0.1)
+    await conn.cancel()
+    with pytest.raises(pgwire.PgError) as excinfo:
+        await asyncio.wait_for(task, 2)
+    assert excinfo.value.code == '57014'
+    assert await conn.fetchval("SELECT 'alive'") == 'alive'
+
+
+@with_connection
+async def test_aborted_transaction(conn):
+    await conn.query("BEGIN")
+    assert conn.transaction_status == 'T'
+    with pytest.raises(pgwire.PgError):
+        await conn.query("SELECT 1/0")
+    assert conn.transaction_status == 'E'
+
+    for _ in range(2):
+        with pytest.raises(pgwire.PgError) as excinfo:
+            await conn.execute("SELECT 1")
+        assert excinfo.value.code == '25P02'
+
+    await conn.query("ROLLBACK")
+    assert conn.transaction_status == 'I'
+    assert await conn.fetchval("SELECT 1") == 1
+
+
+@with_connection
+async def test_closed_connection(conn):
+    await conn.close()
+    with pytest.raises(pgwire.ProtocolError):
+        await conn.execute("SELECT 1")
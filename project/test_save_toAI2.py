@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Тесты режима --watch save_toAI2.py: наблюдатели, кэш и пересборка toAI.md
+
+Запуск: python3 -m pytest -q project/test_save_toAI2.py
+"""
+
+import errno
+import os
+import sys
+
+import pytest
+
+import save_toAI2
+from save_toAI2 import (Changes, InotifyWatcher, PollingWatcher, SnapshotCache, collect_files,
+                        watch, write_snapshot)
+
+
+def make_changes(*files, structure=False):
+    changes = Changes()
+    changes.files = set(files)
+    changes.structure = structure
+    return changes
+
+
+class ScriptedWatcher:
+    """Отдаёт заданные пачки изменений, затем останавливает watch(), как Ctrl+C"""
+
+    def __init__(self, *batches, failed=None):
+        self.batches = list(batches)
+        self.failed = failed
+        self.closed = False
+
+    def wait(self, timeout):
+        if self.batches:
+            return self.batches.pop(0)
+        if timeout is not None:
+            return Changes()
+        raise KeyboardInterrupt
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    """Небольшое дерево в текущем каталоге: watch() и write_snapshot() работают с '.'"""
+    (tmp_path / 'a.txt').write_text('alpha\n')
+    (tmp_path / 'sub').mkdir()
+    (tmp_path / 'sub' / 'b.txt').write_text('beta\n')
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def start_watch(monkeypatch, watcher):
+    """Первая сборка, как в main(), и слежение с подменённым наблюдателем"""
+    monkeypatch.setattr(save_toAI2, 'create_watcher', lambda top, poll, interval: (watcher, 'тест'))
+    cache = SnapshotCache()
+    content, _, _ = collect_files(cache)
+    write_snapshot(content)
+    return cache, content
+
+
+# ==============================
+# Накопление изменений и кэш
+# ==============================
+def test_changes_update_merges_batches():
+    changes = make_changes('a.txt')
+    assert changes and not Changes()
+    changes.update(make_changes('b.txt', structure=True))
+    changes.update(make_changes('a.txt'))
+    assert changes.files == {'a.txt', 'b.txt'}
+    assert changes.structure
+
+
+def test_cache_invalidation(project):
+    cache = SnapshotCache()
+    content, _, _ = collect_files(cache)
+    assert 'alpha' in content
+
+    (project / 'a.txt').write_text('alpha2\n')
+    # Без сброса секция берётся из кэша
+    assert 'alpha2' not in collect_files(cache)[0]
+    cache.invalidate({'a.txt'})
+    assert 'alpha2' in collect_files(cache)[0]
+
+    (project / 'c.txt').write_text('gamma\n')
+    (project / 'sub' / 'b.txt').unlink()
+    assert 'gamma' not in collect_files(cache)[0]
+    cache.invalidate_listing()
+    content, _, _ = collect_files(cache)
+    assert 'gamma' in content and 'beta' not in content
+    # Запись об удалённом файле забыта
+    assert os.path.join('sub', 'b.txt') not in cache.entries
+
+
+def test_write_snapshot_replaces_atomically(project):
+    assert write_snapshot('first')
+    inode = os.stat('toAI.md').st_ino
+    assert not write_snapshot('first', 'first')
+    assert os.stat('toAI.md').st_ino == inode
+
+    assert write_snapshot('second', 'first')
+    assert (project / 'toAI.md').read_text(encoding='utf-8') == 'second'
+    assert not (project / 'toAI.md.tmp').exists()
+    # Новый файл переименован поверх старого, а не перезаписан на месте
+    assert os.stat('toAI.md').st_ino != inode
+
+
+# ==============================
+# Цикл watch()
+# ==============================
+def test_watch_merges_debounced_batches(project, monkeypatch, capsys):
+    watcher = ScriptedWatcher(make_changes('a.txt'), make_changes(os.path.join('sub', 'b.txt')))
+    cache, content = start_watch(monkeypatch, watcher)
+    (project / 'a.txt').write_text('alpha2\n')
+    (project / 'sub' / 'b.txt').write_text('beta2\n')
+
+    watch(cache, content, debounce=0.01, max_delay=1, poll=False, interval=0.01)
+    snapshot = (project / 'toAI.md').read_text(encoding='utf-8')
+    assert 'alpha2' in snapshot and 'beta2' in snapshot
+    # Две пачки событий - одна пересборка
+    out = capsys.readouterr().out
+    assert out.count('toAI.md обновлён') == 1
+    assert 'файлов изменено 2' in out
+    assert watcher.closed
+
+
+def test_watch_full_rebuild_sentinel(project, monkeypatch):
+    watcher = ScriptedWatcher(make_changes('*', structure=True))
+    cache, content = start_watch(monkeypatch, watcher)
+    (project / 'sub' / 'b.txt').write_text('beta2\n')
+    (project / 'c.txt').write_text('gamma\n')
+
+    watch(cache, content, debounce=0.01, max_delay=1, poll=False, interval=0.01)
+    snapshot = (project / 'toAI.md').read_text(encoding='utf-8')
+    # Путь изменённого файла неизвестен: '*' сбрасывает кэш целиком
+    assert 'beta2' in snapshot and 'gamma' in snapshot
+
+
+def test_watch_switches_to_polling_after_enospc(project, monkeypatch, capsys):
+    failed = OSError(errno.ENOSPC, 'inotify_add_watch sub: No space left on device')
+    watcher = ScriptedWatcher(make_changes('*', structure=True), failed=failed)
+    cache, content = start_watch(monkeypatch, watcher)
+    (project / 'sub' / 'new.txt').write_text('delta\n')
+
+    polling = []
+
+    class FakePolling(ScriptedWatcher):
+        def __init__(self, top, interval):
+            super().__init__()
+            polling.append((top, interval))
+
+    monkeypatch.setattr(save_toAI2, 'PollingWatcher', FakePolling)
+    watch(cache, content, debounce=0.01, max_delay=1, poll=False, interval=0.25)
+
+    assert watcher.closed
+    assert polling == [('.', 0.25)]
+    assert 'delta' in (project / 'toAI.md').read_text(encoding='utf-8')
+    assert 'используется опрос каждые 0.25 с' in capsys.readouterr().out
+
+
+# ==============================
+# Наблюдатели на временном каталоге
+# ==============================
+def test_polling_watcher_detects_changes(tmp_path):
+    (tmp_path / 'a.txt').write_text('alpha\n')
+    (tmp_path / 'toAI.md').write_text('snapshot\n')
+    watcher = PollingWatcher(str(tmp_path), interval=0.01)
+    a = str(tmp_path / 'a.txt')
+    b = str(tmp_path / 'b.txt')
+
+    assert not watcher.wait(0.03)
+
+    (tmp_path / 'a.txt').write_text('alpha, longer\n')
+    changes = watcher.wait(1)
+    assert (changes.files, changes.structure) == ({a}, False)
+
+    (tmp_path / 'b.txt').write_text('beta\n')
+    changes = watcher.wait(1)
+    assert (changes.files, changes.structure) == ({b}, True)
+
+    # Сохранение через временный файл и rename: меняется inode, набор файлов - нет
+    (tmp_path / 'b.txt.new').write_text('beta\n')
+    os.replace(tmp_path / 'b.txt.new', tmp_path / 'b.txt')
+    changes = watcher.wait(1)
+    assert (changes.files, changes.structure) == ({b}, False)
+
+    # Игнорируемые файлы не будят наблюдатель
+    (tmp_path / 'toAI.md').write_text('snapshot, updated\n')
+    assert not watcher.wait(0.03)
+
+    (tmp_path / 'a.txt').unlink()
+    changes = watcher.wait(1)
+    assert (changes.files, changes.structure) == ({a}, True)
+
+
+def wait_for(watcher, predicate, attempts=20):
+    """Собирает события, пока predicate не выполнится (inotify отдаёт их порциями)"""
+    changes = Changes()
+    for _ in range(attempts):
+        changes.update(watcher.wait(0.1))
+        if predicate(changes):
+            break
+    return changes
+
+
+linux_only = pytest.mark.skipif(not sys.platform.startswith('linux'), reason="inotify есть только в Linux")
+
+
+@linux_only
+def test_inotify_watcher_events(tmp_path):
+    (tmp_path / 'a.txt').write_text('alpha\n')
+    watcher = InotifyWatcher(str(tmp_path))
+    a = str(tmp_path / 'a.txt')
+    try:
+        (tmp_path / 'a.txt').write_text('alpha2\n')
+        changes = wait_for(watcher, lambda c: a in c.files)
+        assert changes.files == {a}
+        assert not changes.structure
+
+        # Новый каталог подписывается сразу, файлы в нём тоже видны
+        (tmp_path / 'sub').mkdir()
+        assert wait_for(watcher, lambda c: c.structure).structure
+        (tmp_path / 'sub' / 'c.txt').write_text('gamma\n')
+        c = str(tmp_path / 'sub' / 'c.txt')
+        assert c in wait_for(watcher, lambda ch: c in ch.files).files
+
+        # Сохранение через временный файл: IN_MOVED_TO с именем целевого файла
+        (tmp_path / 'a.txt.new').write_text('alpha3\n')
+        os.replace(tmp_path / 'a.txt.new', tmp_path / 'a.txt')
+        changes = wait_for(watcher, lambda ch: a in ch.files)
+        assert a in changes.files
+        assert changes.structure
+
+        # Свой вывод наблюдатель пропускает
+        (tmp_path / 'toAI.md').write_text('snapshot\n')
+        assert not wait_for(watcher, bool, attempts=2)
+        assert watcher.failed is None
+    finally:
+        watcher.close()
+
+
+@linux_only
+def test_inotify_watcher_reports_enospc(tmp_path, monkeypatch):
+    watcher = InotifyWatcher(str(tmp_path))
+    add_watch = InotifyWatcher.add_watch
+
+    def limited_add_watch(self, path):
+        if os.path.basename(path) == 'sub':
+            raise OSError(errno.ENOSPC, f"inotify_add_watch {path}: {os.strerror(errno.ENOSPC)}")
+        add_watch(self, path)
+
+    monkeypatch.setattr(InotifyWatcher, 'add_watch', limited_add_watch)
+    try:
+        (tmp_path / 'sub').mkdir()
+        changes = wait_for(watcher, lambda c: '*' in c.files)
+        # Каталог без подписки: полная пересборка и признак для перехода на опрос
+        assert '*' in changes.files and changes.structure
+        assert watcher.failed.errno == errno.ENOSPC
+    finally:
+        watcher.close()
+
+
+# ==============================
+# Пакетный режим
+# ==============================
+def test_batch_skips_own_output(project, monkeypatch):
+    argv = ['save_toAI2.py', '--batch', '.', '--output-dir', 'snaps', '-j', '1',
+            '--classify-cache', 'classify.json']
+    monkeypatch.setattr(sys, 'argv', argv)
+    assert save_toAI2.main() == 0
+    first = (project / 'snaps' / f'{project.name}.md').read_text(encoding='utf-8')
+    # Повторный запуск видит снимки и кэш первого, но не должен их собирать
+    assert save_toAI2.main() == 0
+    second = (project / 'snaps' / f'{project.name}.md').read_text(encoding='utf-8')
+
+    assert 'alpha' in second and 'beta' in second
+    for name in ('snaps', 'index.md', 'classify.json'):
+        assert name not in second
+    assert second == first